@@ -1,10 +1,41 @@
 import discord
+from discord import app_commands
 from discord.ext import commands
 import json
 import logging
+import math
 import os
 import asyncio
+import functools
+import io
 import subprocess
+import time
+import typing
+from datetime import datetime, timezone
+from utils.admission import AdmissionController, Overloaded
+from utils.audit import AuditJournal
+from utils.catalog import CommandCatalog
+from utils.executor import ExecutorService
+from utils.command_sync import sync_app_commands
+from utils.deadlines import DeadlineTracker
+from utils.cluster import ClusterClient, ClusterSupervisor, RecentLogHandler, worker_path, worker_settings, ENV_IPC_PORT, EXIT_FATAL, ENV_IPC_TOKEN
+from utils.gateway_profile import gateway_options
+from utils.gateway_replay import GatewayRecorder
+from utils.guild_config import GuildConfigCache, PrefixResolver, shard_for
+from utils.reminders import ReminderScheduler, ReminderStore
+from utils.jobs import JobLimitReached, JobManager
+from utils.loader import load_startup_extensions, watch_extensions
+from utils.loopmonitor import LoopMonitor
+from utils.memprofile import MemoryProfiler, cache_summary
+from utils.profiler import StartupProfiler
+from utils.ratelimit import RateLimited, RateLimiter
+from utils.sender import OutboundScheduler
+from utils.registry import CommandRegistry
+from utils.suggest import SuggestionIndex
+from utils.supervisor import attach_stats, is_fatal, run_forever
+from utils.tracing import Tracer, span
+
+profiler = StartupProfiler()
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -20,101 +51,198 @@ try:
             raise KeyError(f"Missing required config key: {key}")
 except FileNotFoundError:
     logger.error("config.json not found. Please create it with 'prefix' and 'token'.")
-    exit(1)
+    exit(EXIT_FATAL)
 except json.JSONDecodeError:
     logger.error("config.json is not a valid JSON file.")
-    exit(1)
-
-# Bot setup with intents
-intents = discord.Intents.default()
-intents.message_content = True
-intents.dm_messages = True
-bot = commands.Bot(command_prefix=config['prefix'], intents=intents, help_command=None)
+    exit(EXIT_FATAL)
+except KeyError as e:
+    logger.error(e.args[0])
+    exit(EXIT_FATAL)
+
+# Cluster mode is opt-in; when enabled, bot.py is started once per shard range by the cluster supervisor
+CLUSTER_ENABLED = config.get('cluster', {}).get('enabled', False)
+WORKER = worker_settings()
+
+# Bot setup with intents and caching from the runtime profile ("standard" or "lean")
+gateway = gateway_options(config.get('runtime_profile', 'standard'), config.get('max_messages'))
+# Outbound message queues; created first so the HTTP client can report rate limit headers back to them
+sender = OutboundScheduler(**config.get('sender', {}))
+gateway['http_trace'] = sender.trace_config()
+if WORKER:
+    cluster_id, shard_ids, shard_count = WORKER
+    bot = commands.AutoShardedBot(command_prefix=config['prefix'], help_command=None,
+                                  shard_ids=shard_ids, shard_count=shard_count, **gateway)
+    bot.ipc = ClusterClient(cluster_id, int(os.environ[ENV_IPC_PORT]), os.environ[ENV_IPC_TOKEN])
+    recent_logs = RecentLogHandler()
+    recent_logs.setFormatter(logging.Formatter(f'%(asctime)s - [cluster {cluster_id}] %(levelname)s - %(message)s'))
+    logging.getLogger().addHandler(recent_logs)
+else:
+    shard_count = 1
+    bot = commands.Bot(command_prefix=config['prefix'], help_command=None, **gateway)
+    bot.ipc = None
+attach_stats(bot)
+profiler.instrument(bot)
+loop_monitor = LoopMonitor(**config.get('loop_monitor', {}))
+memory_profiler = MemoryProfiler()
+guild_configs = GuildConfigCache(shard_count)
+bot.guild_configs = guild_configs
+# Per-guild prefixes; config.json's prefix is the default for new guilds and DMs
+prefixes = PrefixResolver(guild_configs, config['prefix'])
+bot.command_prefix = prefixes
+bot.catalog = CommandCatalog(bot)
+bot.registry = CommandRegistry('functions.json')
+watch_extensions(bot, bot.registry.on_extension_change(bot))
+watch_extensions(bot, bot.catalog.on_extension_change)
+bot.suggestions = SuggestionIndex(bot)
+watch_extensions(bot, bot.suggestions.on_extension_change)
+# Global checks run before before_invoke, so rate-limited invocations never load cogs or touch configs
+rate_limiter = RateLimiter(bot.registry, config.get('rate_limits'), config.get('max_rate_limit_buckets', 10000))
+bot.add_check(rate_limiter.check)
+bot.sender = sender
+sender.install(bot)
+# Thread and process pools for blocking and CPU-heavy work, so it never runs on the event loop
+bot.executor = ExecutorService(bot.registry, **config.get('executor', {}))
+watch_extensions(bot, bot.executor.on_extension_change)
+# Fair admission across guilds; a guild config's "admission_weight" gives it a bigger share under load
+admission = AdmissionController(bot.registry, lambda guild_id: guild_configs.get(guild_id).get('admission_weight', 1) if guild_id else 1,
+                                **config.get('admission', {}))
+# Every invocation runs under a deadline from the registry's "deadline" setting
+deadlines = DeadlineTracker(bot.registry, **config.get('deadlines', {}))
+# Per-invocation traces with spans for config loads, extension loads, REST calls and sends
+tracing_config = dict(config.get('tracing', {}))
+if WORKER:
+    tracing_config['path'] = worker_path(tracing_config.get('path', 'traces.jsonl'), cluster_id)
+tracer = Tracer(**tracing_config)
+tracer.instrument(bot)
+# Append-only journal of admin actions; each cluster worker keeps its own segments
+audit_config = dict(config.get('audit', {}))
+if WORKER:
+    audit_config['directory'] = os.path.join(audit_config.get('directory', 'audit'), f"cluster-{cluster_id}")
+bot.audit = AuditJournal(**audit_config)
+
+# Background jobs started with `execute --bg`; the channel that started one hears when it ends
+def report_job(job):
+    if job.channel is not None:
+        bot.sender.post(job.channel, f"Job #{job.id} {job.status} after {job.runtime:.0f}s (exit {job.returncode}). "
+                                     f"Use `job {job.id}` to see its output.")
+
+jobs_config = dict(config.get('jobs', {}))
+if WORKER:
+    jobs_config['directory'] = os.path.join(jobs_config.get('directory', 'jobs'), f"cluster-{cluster_id}")
+bot.jobs = JobManager(notify=report_job, **jobs_config)
+
+# Reminders are delivered by the bot rather than the time cog, so they fire while that cog isn't loaded.
+# In cluster mode each worker delivers the reminders of its own guilds (DMs go to shard 0's worker).
+def owns_reminder(reminder):
+    if not WORKER:
+        return True
+    return (0 if reminder.guild_id is None else shard_for(reminder.guild_id, shard_count)) in shard_ids
+
+async def deliver_reminder(reminder):
+    text = f"<@{reminder.user_id}> Reminder: {reminder.message}" if reminder.mention else reminder.message
+    destination = bot.get_channel(reminder.channel_id) if reminder.channel_id else None
+    if destination is None:
+        destination = bot.get_user(reminder.user_id) or await bot.fetch_user(reminder.user_id)
+    await bot.sender.send(destination, text)
+
+async def deliver_reminders(batch):
+    """Send a batch; returns the reminders worth retrying."""
+    # Sent concurrently; the outbound scheduler paces reminders that land in the same channel at once.
+    results = await asyncio.gather(*(deliver_reminder(r) for r in batch), return_exceptions=True)
+    failed = []
+    for reminder, result in zip(batch, results):
+        if isinstance(result, (discord.Forbidden, discord.NotFound)):
+            # The channel or user is gone or off limits; retrying won't help.
+            logger.error(f"Dropping reminder {reminder.id}, its destination is unavailable: {result}")
+        elif isinstance(result, Exception):
+            logger.warning(f"Failed to deliver reminder {reminder.id}, will retry: {result}")
+            failed.append(reminder)
+    logger.info(f"Delivered {len(batch) - len(failed)} of {len(batch)} reminder(s)")
+    return failed
+
+bot.reminders = ReminderScheduler(ReminderStore(), deliver_reminders, owns=owns_reminder)
+# Optional capture of raw gateway events for offline replay with `python -m utils.gateway_replay`;
+# each cluster worker records its own shards to its own file, and the supervisor has no gateway to record
+recording_config = dict(config.get('gateway_recording') or {})
+if WORKER and recording_config:
+    recording_config['path'] = worker_path(recording_config['path'], cluster_id)
+recorder = GatewayRecorder(**recording_config) if recording_config and (WORKER or not CLUSTER_ENABLED) else None
+if recorder:
+    recorder.attach(bot)
 
 # Your Discord user ID (replace with your actual user ID)
 ALLOWED_USER_ID = 123456789012345678  # Replace with your Discord user ID
 
-# Register bot-level commands in functions.json
-def register_bot_commands():
-    commands_to_register = {
-        "update": "Restarts the bot (admin).",
-        "add_function": "Adds a new cog via DM (admin).",
-        "enable_function": "Enables a cog for the server (admin).",
-        "disable_function": "Disables a cog for the server (admin).",
-        "logs": "Displays the odin.service logs up to the maximum allowable length (admin).",
-        "install_deps": "Installs dependencies from requirements.txt within the venv and restarts (admin).",
-        "rename": "Renames a command in functions.json (admin).",
-        "change_prefix": "Changes the bot's command prefix (admin).",
-        "generate_cog": "Placeholder for generating predefined cog files on the server (admin).",
-        "execute": "Executes a shell command on the server (admin, restricted)."
-    }
-    try:
-        try:
-            with open('functions.json', 'r') as f:
-                data = json.load(f)
-        except FileNotFoundError:
-            data = {"cogs": {}, "bot_commands": {}}
-
-        data["bot_commands"] = commands_to_register
-        with open('functions.json', 'w') as f:
-            json.dump(data, f, indent=4)
-    except Exception as e:
-        logger.error(f"Failed to register bot commands: {e}")
-
 # Ensure server_configs directory exists
 if not os.path.exists('./server_configs'):
     logger.warning("server_configs directory not found. Creating it.")
     os.makedirs('./server_configs')
 
-# Load server-specific cogs
-async def load_server_cogs(guild_id):
-    try:
-        with open('functions.json', 'r') as f:
-            functions_data = json.load(f)
-        available_cogs = functions_data.get("cogs", {}).keys()
-    except FileNotFoundError:
-        logger.error("functions.json not found. No cogs will be loaded.")
-        return
-    except json.JSONDecodeError:
-        logger.error("functions.json is invalid JSON. No cogs will be loaded.")
+# Extensions whose slash commands exist globally, loaded in this process or not
+def app_command_extensions():
+    return [f'cogs.{cog_name}' for cog_name in sorted(bot.registry.available_cogs())]
+
+# Load the cogs every guild has enabled before connecting, so the first commands don't pay for imports
+# discord.py calls setup_hook on every login, and run_forever logs in again after each failed
+# connection; registration, extension loading and the app command sync only happen once
+async def setup_hook():
+    if bot.setup_done:
         return
+    bot.setup_done = True
+    loop_monitor.start()
+    bot.reminders.start()
+    bot.registry.register_bot_commands({c.name: c.short_doc for c in bot.commands if c.cog is None and not c.hidden})
+    bot.suggestions.add_bot_commands()
+    available_cogs = bot.registry.available_cogs()
+    include = (lambda guild_id: shard_for(guild_id, shard_count) in shard_ids) if WORKER else None
+    bot.startup_report = await load_startup_extensions(bot, available_cogs, config.get('lazy_cogs', []), include=include)
+    profiler.mark('extensions_loaded')
+    # App commands are global, so only one process per application syncs them, for every available cog
+    # whether or not it is loaded here (lazy cogs, or cogs only enabled by guilds on other shards)
+    if not WORKER or 0 in shard_ids:
+        try:
+            await sync_app_commands(bot, app_command_extensions())
+        except discord.HTTPException:
+            pass  # Logged by sync_app_commands; prefix commands still work
+
+bot.setup_hook = setup_hook
+bot.setup_done = False
+bot.startup_report = {}
+
+# Load server-specific cogs; returns the extensions that were newly loaded
+@profiler.timed('load_server_cogs')
+async def load_server_cogs(guild_id):
+    available_cogs = bot.registry.available_cogs()
+    loaded = []
 
     if 'cogs.general' not in bot.extensions:
         try:
             await bot.load_extension('cogs.general')
+            loaded.append('cogs.general')
             logger.info("Loaded base cog: cogs.general")
         except Exception as e:
             logger.error(f"Failed to load base cog cogs.general: {e}")
 
-    config_path = f'./server_configs/{guild_id}.json'
-    try:
-        with open(config_path, 'r') as f:
-            data = json.load(f)
-        server_cogs = data.get('cogs', [])
-    except FileNotFoundError:
-        server_cogs = []
-        with open(config_path, 'w') as f:
-            json.dump({"cogs": server_cogs}, f, indent=4)
-    except json.JSONDecodeError:
-        logger.error(f"Invalid JSON in {config_path}. Skipping server-specific cogs.")
-        return
+    server_cogs = guild_configs.cogs(guild_id)
 
     for cog_name in server_cogs:
         if cog_name not in available_cogs:
-            logger.warning(f"Cog {cog_name} listed in server config but not in functions.json. Skipping.")
+            logger.warning(f"Cog {cog_name} listed in server config but not in the command registry. Skipping.")
             continue
         cog = f'cogs.{cog_name}'
         if cog != 'cogs.general' and cog not in bot.extensions:
             try:
                 await bot.load_extension(cog)
+                loaded.append(cog)
                 logger.info(f"Loaded server-specific cog for guild {guild_id}: {cog}")
             except Exception as e:
                 logger.error(f"Failed to load server-specific cog {cog} for guild {guild_id}: {e}")
+    return loaded
 
 @bot.event
 async def on_ready():
     logger.info(f'Logged in as {bot.user.name} ({bot.user.id})')
-    register_bot_commands()
+    profiler.mark('ready')
     if 'cogs.general' not in bot.extensions:
         try:
             await bot.load_extension('cogs.general')
@@ -124,21 +252,66 @@ async def on_ready():
 
 @bot.before_invoke
 async def before_invoke(ctx):
+    tracer.start(ctx)
+    with span("admission"):
+        await admission.acquire(ctx)
+    deadlines.start(ctx)
+    deadlines.add_cleanup(ctx, admission.release, ctx)
     if ctx.guild:
-        await load_server_cogs(ctx.guild.id)
+        with span("load_server_cogs"):
+            await load_server_cogs(ctx.guild.id)
+
+@bot.after_invoke
+async def after_invoke(ctx):
+    invocation = deadlines.finish(ctx)
+    if invocation and invocation.stopped:
+        tracer.finish(ctx, invocation.stopped)
+    else:
+        tracer.finish(ctx, 'failed' if ctx.command_failed else 'ok')
+    if invocation and invocation.stopped == 'deadline':
+        await ctx.send(f"`{ctx.invoked_with}` took longer than {invocation.deadline}s and was stopped.")
+    elif invocation and invocation.stopped == 'cancelled':
+        await ctx.send(f"`{ctx.invoked_with}` was cancelled by an administrator.")
+
+@bot.listen()
+async def on_command_completion(ctx):
+    profiler.mark('first_command')
 
 @bot.event
 async def on_command_error(ctx, error):
-    if isinstance(error, commands.CommandNotFound):
-        await ctx.send("Command not found. Use `!help` for a list of commands.")
+    # Errors raised after admission (e.g. in a subcommand's argument parsing) skip after_invoke
+    deadlines.finish(ctx)
+    admission.release(ctx)
+    tracer.finish(ctx, type(error).__name__)
+    if isinstance(error, Overloaded):
+        await ctx.send(f"Odin is busy right now, so `{ctx.invoked_with}` was not run. Please try again in a moment.")
+    elif isinstance(error, RateLimited):
+        await ctx.send(f"Slow down! Try `{ctx.invoked_with}` again in {error.retry_after:.1f}s.")
+    elif isinstance(error, commands.CommandNotFound):
+        # The command may belong to a lazily loaded cog this guild has enabled
+        if ctx.guild and await load_server_cogs(ctx.guild.id):
+            retry_ctx = await bot.get_context(ctx.message)
+            if retry_ctx.command:
+                await bot.invoke(retry_ctx)
+                return
+        server_cogs = guild_configs.cogs(ctx.guild.id) if ctx.guild else None
+        suggestions = bot.suggestions.suggest(ctx.invoked_with or "", server_cogs)
+        if suggestions:
+            options = ", ".join(f"`{ctx.prefix}{name}`" for name in suggestions)
+            await ctx.send(f"Command not found. Did you mean {options}? Use `{ctx.prefix}help` for a list of commands.")
+        else:
+            await ctx.send(f"Command not found. Use `{ctx.prefix}help` for a list of commands.")
     else:
         logger.error(f'Error in command {ctx.command}: {error}')
         await ctx.send("An error occurred while processing the command.")
 
-@bot.command()
+@bot.hybrid_command()
+@app_commands.default_permissions(administrator=True)
 @commands.has_permissions(administrator=True)
 async def enable_function(ctx, cog_name: str):
+    """Enables a cog for the server (admin)."""
     import re
+    await ctx.defer()
     if not ctx.guild:
         await ctx.send("This command can only be used in a server.")
         return
@@ -149,29 +322,12 @@ async def enable_function(ctx, cog_name: str):
         await ctx.send(f"No cog named '{cog_name}' exists in the cogs directory.")
         return
 
-    try:
-        with open('functions.json', 'r') as f:
-            functions_data = json.load(f)
-        available_cogs = functions_data.get("cogs", {}).keys()
-    except FileNotFoundError:
-        await ctx.send("Error: functions.json not found.")
-        return
-    except json.JSONDecodeError:
-        await ctx.send("Error: functions.json is invalid.")
+    if cog_name not in bot.registry.available_cogs():
+        await ctx.send(f"Cog '{cog_name}' is not listed in the command registry.")
         return
 
-    if cog_name not in available_cogs:
-        await ctx.send(f"Cog '{cog_name}' is not listed in functions.json.")
-        return
-
-    config_path = f'./server_configs/{ctx.guild.id}.json'
-    try:
-        with open(config_path, 'r') as f:
-            data = json.load(f)
-        server_cogs = data.get('cogs', [])
-    except FileNotFoundError:
-        server_cogs = []
-        data = {"cogs": server_cogs}
+    data = guild_configs.get(ctx.guild.id)
+    server_cogs = data['cogs']
 
     if cog_name == "general":
         await ctx.send("The 'general' cog is always enabled for all servers.")
@@ -181,10 +337,12 @@ async def enable_function(ctx, cog_name: str):
         return
 
     server_cogs.append(cog_name)
-    data['cogs'] = server_cogs
-    with open(config_path, 'w') as f:
-        json.dump(data, f, indent=4)
+    guild_configs.save(ctx.guild.id, data)
+    bot.catalog.invalidate_guild(ctx.guild.id)
+    if bot.ipc:
+        await bot.ipc.broadcast("cog_enabled", {"guild_id": ctx.guild.id, "cog": cog_name})
 
+    bot.audit.record(ctx.guild.id, ctx.author.id, "enable_function", cog_name)
     try:
         await bot.load_extension(f'cogs.{cog_name}')
         logger.info(f"Enabled and loaded cog for guild {ctx.guild.id}: cogs.{cog_name}")
@@ -193,9 +351,28 @@ async def enable_function(ctx, cog_name: str):
         logger.error(f"Failed to load cog {cog_name} for guild {ctx.guild.id}: {e}")
         await ctx.send(f"Failed to load cog '{cog_name}'. Check the code for errors.")
 
-@bot.command()
+@enable_function.autocomplete('cog_name')
+async def enable_function_autocomplete(interaction, current):
+    enabled = set(guild_configs.cogs(interaction.guild_id)) if interaction.guild_id else set()
+    names = sorted(bot.registry.available_cogs() - enabled - {'general'})
+    return [app_commands.Choice(name=name, value=name) for name in names if current.lower() in name.lower()][:25]
+
+# Unload a cog once none of this process's guilds have it enabled
+async def unload_if_unused(cog_name):
+    cog = f'cogs.{cog_name}'
+    still_in_use = any(cog_name in guild_configs.cogs(guild.id) for guild in bot.guilds)
+    if not still_in_use and cog in bot.extensions:
+        try:
+            await bot.unload_extension(cog)
+            logger.info(f"Unloaded cog {cog} as it is no longer in use by any server.")
+        except Exception as e:
+            logger.error(f"Failed to unload cog {cog}: {e}")
+
+@bot.hybrid_command()
+@app_commands.default_permissions(administrator=True)
 @commands.has_permissions(administrator=True)
 async def disable_function(ctx, cog_name: str):
+    """Disables a cog for the server (admin)."""
     import re
     if not ctx.guild:
         await ctx.send("This command can only be used in a server.")
@@ -207,49 +384,34 @@ async def disable_function(ctx, cog_name: str):
         await ctx.send("The 'general' cog cannot be disabled.")
         return
 
-    config_path = f'./server_configs/{ctx.guild.id}.json'
-    try:
-        with open(config_path, 'r') as f:
-            data = json.load(f)
-        server_cogs = data.get('cogs', [])
-    except FileNotFoundError:
-        await ctx.send(f"Cog '{cog_name}' is not enabled for this server.")
-        return
+    data = guild_configs.get(ctx.guild.id)
+    server_cogs = data['cogs']
 
     if cog_name not in server_cogs:
         await ctx.send(f"Cog '{cog_name}' is not enabled for this server.")
         return
 
     server_cogs.remove(cog_name)
-    data['cogs'] = server_cogs
-    with open(config_path, 'w') as f:
-        json.dump(data, f, indent=4)
+    guild_configs.save(ctx.guild.id, data)
+    bot.catalog.invalidate_guild(ctx.guild.id)
+    bot.audit.record(ctx.guild.id, ctx.author.id, "disable_function", cog_name)
 
-    cog = f'cogs.{cog_name}'
-    still_in_use = False
-    for guild in bot.guilds:
-        guild_config_path = f'./server_configs/{guild.id}.json'
-        try:
-            with open(guild_config_path, 'r') as f:
-                guild_data = json.load(f)
-            if cog_name in guild_data.get('cogs', []):
-                still_in_use = True
-                break
-        except FileNotFoundError:
-            continue
-
-    if not still_in_use and cog in bot.extensions:
-        try:
-            await bot.unload_extension(cog)
-            logger.info(f"Unloaded cog {cog} as it is no longer in use by any server.")
-        except Exception as e:
-            logger.error(f"Failed to unload cog {cog}: {e}")
+    await unload_if_unused(cog_name)
+    if bot.ipc:
+        await bot.ipc.broadcast("cog_disabled", {"guild_id": ctx.guild.id, "cog": cog_name})
 
     await ctx.send(f"Disabled cog '{cog_name}' for this server.")
 
-@bot.command()
+@disable_function.autocomplete('cog_name')
+async def disable_function_autocomplete(interaction, current):
+    names = guild_configs.cogs(interaction.guild_id) if interaction.guild_id else []
+    return [app_commands.Choice(name=name, value=name) for name in sorted(names) if current.lower() in name.lower()][:25]
+
+@bot.hybrid_command()
+@app_commands.default_permissions(administrator=True)
 @commands.has_permissions(administrator=True)
 async def add_function(ctx, cog_name: str):
+    """Adds a new cog via DM (admin)."""
     import re
     if not re.match(r'^[a-zAZ0-9_-]+$', cog_name) or cog_name.startswith('.'):
         await ctx.send("Cog name can only contain letters, numbers, underscores, or hyphens, and cannot start with a period.")
@@ -293,10 +455,13 @@ async def add_function(ctx, cog_name: str):
                 return
 
             logger.info(f"Attempting to write file for cog '{cog_name}' at ./cogs/{cog_name}.py")
+            existed = os.path.exists(f'./cogs/{cog_name}.py')
             try:
                 with open(f'./cogs/{cog_name}.py', 'w') as f:
                     f.write(code)
                 logger.info(f'Saved (or overwrote) cog file: cogs/{cog_name}.py')
+                bot.audit.record(ctx.guild.id if ctx.guild else None, ctx.author.id, "add_function", cog_name,
+                                 f"{'overwrote' if existed else 'added'} {len(code)} bytes")
                 await ctx.author.send(f"Cog '{cog_name}' has been added/overwritten. Use `!enable_function {cog_name}` in a server to enable it.")
             except Exception as e:
                 logger.error(f"Failed to write file cogs/{cog_name}.py: {str(e)}")
@@ -307,10 +472,20 @@ async def add_function(ctx, cog_name: str):
     except asyncio.TimeoutError:
         logger.warning(f"Timed out waiting for user {ctx.author.id} to reply for '{cog_name}'.")
         await ctx.author.send("Timed out waiting for your reply. Please use `!add_function` again.")
+    except asyncio.CancelledError:
+        # Stopped by its deadline or an admin before new code arrived: put the previous version back
+        if was_loaded and cog_path not in bot.extensions:
+            try:
+                await bot.load_extension(cog_path)
+            except Exception as e:
+                logger.error(f"Failed to reload cog {cog_path} after add_function was stopped: {e}")
+        raise
 
-@bot.command()
+@bot.hybrid_command()
+@app_commands.default_permissions(administrator=True)
 @commands.has_permissions(administrator=True)
 async def update(ctx):
+    """Restarts the bot (admin)."""
     await ctx.send("Restarting Odin...")
     logger.info("Initiating bot restart.")
 
@@ -320,17 +495,32 @@ async def update(ctx):
 
     import sys
     import os
+    bot.registry.flush()
+    bot.executor.shutdown()
+    bot.jobs.shutdown()
     os.execv(sys.executable, [sys.executable] + sys.argv)
 
-@bot.command()
+@bot.hybrid_command()
+@app_commands.default_permissions(administrator=True)
 @commands.has_permissions(administrator=True)
 async def logs(ctx):
+    """Displays the odin.service logs up to the maximum allowable length (admin)."""
+    await ctx.defer()
+    if bot.ipc:
+        results = await bot.ipc.request("logs", {"lines": 20})
+        lines = sorted(line for worker_lines in results.values() for line in worker_lines or [])[-20:]
+        logs = "\n".join(lines)
+        if len(logs) > 1900:
+            logs = "..." + logs[-1900:]
+        await ctx.send(f"**Odin Cluster Logs**:\n```\n{logs or 'No logs found.'}\n```")
+        return
     try:
-        result = subprocess.run(
+        result = await bot.executor.run_blocking(functools.partial(
+            subprocess.run,
             ['journalctl', '-u', 'odin.service', '-n', '20', '--no-pager'],
             capture_output=True,
             text=True
-        )
+        ))
         if result.returncode == 0:
             logs = result.stdout.strip()
             if not logs:
@@ -346,18 +536,21 @@ async def logs(ctx):
         logger.error(f"Error fetching logs: {e}")
         await ctx.send(f"Error fetching logs: {str(e)}")
 
-@bot.command()
+@bot.hybrid_command()
+@app_commands.default_permissions(administrator=True)
 @commands.has_permissions(administrator=True)
 async def install_deps(ctx):
+    """Installs dependencies from requirements.txt within the venv and restarts (admin)."""
     await ctx.send("Installing dependencies from requirements.txt within the virtual environment...")
     try:
         venv_pip = '/root/Discord-Bots/Odin/venv/bin/pip'
-        result = subprocess.run(
+        result = await bot.executor.run_blocking(functools.partial(
+            subprocess.run,
             [venv_pip, 'install', '-r', 'requirements.txt'],
             cwd='/root/Discord-Bots/Odin',
             capture_output=True,
             text=True
-        )
+        ), timeout=600)
         if result.returncode == 0:
             logger.info("Dependencies installed successfully.")
             await ctx.send(f"Dependencies installed successfully:\n```\n{result.stdout}\n```")
@@ -375,77 +568,46 @@ async def install_deps(ctx):
 
         import sys
         import os
+        bot.registry.flush()
+        bot.executor.shutdown()
+        bot.jobs.shutdown()
         os.execv(sys.executable, [sys.executable] + sys.argv)
     except Exception as e:
         logger.error(f"Error during dependency installation or restart: {e}")
         await ctx.send(f"Error during dependency installation or restart: {str(e)}")
 
-@bot.command()
+@bot.hybrid_command()
+@app_commands.default_permissions(administrator=True)
 @commands.has_permissions(administrator=True)
 async def rename(ctx, old_name: str, new_name: str):
+    """Renames a command in the command registry (admin)."""
     import re
     if not re.match(r'^[a-zA-Z0-9_-]+$', new_name):
         await ctx.send("New command name can only contain letters, numbers, underscores, or hyphens.")
         return
 
-    try:
-        with open('functions.json', 'r') as f:
-            data = json.load(f)
-    except FileNotFoundError:
-        await ctx.send("Error: functions.json not found.")
-        return
-    except json.JSONDecodeError:
-        await ctx.send("Error: functions.json is invalid.")
-        return
-
-    command_found = False
-    cog_name = None
-
-    bot_commands = data.get("bot_commands", {})
-    if old_name in bot_commands:
-        description = bot_commands.pop(old_name)
-        bot_commands[new_name] = description
-        data["bot_commands"] = bot_commands
-        command_found = True
-
-    if not command_found:
-        cogs = data.get("cogs", {})
-        for cog, cog_data in cogs.items():
-            commands = cog_data.get("commands", {})
-            if old_name in commands:
-                description = commands.pop(old_name)
-                commands[new_name] = description
-                cog_data["commands"] = commands
-                cogs[cog] = cog_data
-                cog_name = cog
-                command_found = True
-                break
-
-    if not command_found:
-        await ctx.send(f"Command '{old_name}' not found in functions.json.")
-        return
-
-    if old_name in ["ping", "info", "help", "cmd_bank"]:
-        cog_name = "general"
-    elif old_name in ["update", "add_function", "enable_function", "disable_function", "logs", "install_deps", "rename", "change_prefix", "generate_cog", "execute"]:
-        cog_name = None
-    elif old_name == "function_generator":
-        cog_name = "function_generator"
+    found = bot.registry.find(old_name)
+    if found is None:
+        await ctx.send(f"Command '{old_name}' not found in the command registry.")
+        return
+    cog_name = found[1]
 
     if cog_name and cog_name != "general":
         if new_name != cog_name:
             await ctx.send(f"Command name must match the cog file name '{cog_name}'.py for non-general cogs.")
             return
 
-    for section in [data.get("bot_commands", {})] + [cog_data.get("commands", {}) for cog_data in data.get("cogs", {}).values()]:
-        if new_name in section:
-            await ctx.send(f"Command '{new_name}' already exists in functions.json.")
-            return
-
-    data["cogs"] = cogs
+    if new_name in bot.registry.all_commands():
+        await ctx.send(f"Command '{new_name}' already exists in the command registry.")
+        return
 
-    with open('functions.json', 'w') as f:
-        json.dump(data, f, indent=4)
+    bot.registry.rename(old_name, new_name)
+    # Write now and tell the other workers, so they pick the rename up instead of waiting for a restart
+    bot.registry.flush()
+    bot.catalog.invalidate()
+    if bot.ipc:
+        await bot.ipc.broadcast("registry_changed")
+    bot.audit.record(ctx.guild.id if ctx.guild else None, ctx.author.id, "rename", old_name, f"to {new_name}")
 
     if cog_name and cog_name != "general":
         try:
@@ -460,46 +622,52 @@ async def rename(ctx, old_name: str, new_name: str):
     else:
         await ctx.send(f"Renamed command '{old_name}' to '{new_name}'. No cog reload needed.")
 
-@bot.command()
+@bot.hybrid_command()
+@app_commands.default_permissions(administrator=True)
 @commands.has_permissions(administrator=True)
-async def change_prefix(ctx):
-    prefix_options = ['!', '@', '#', '$', '%']
-    
-    options_message = "Please select a new command prefix by replying with the number:\n"
-    for i, prefix in enumerate(prefix_options, 1):
-        options_message += f"{i}. {prefix}\n"
-    options_message += f"\nCurrent prefix: {bot.command_prefix}"
+async def change_prefix(ctx, new_prefix: str = None):
+    """Changes this server's command prefix (admin). Usage: change_prefix [prefix]"""
+    if not ctx.guild:
+        await ctx.send("This command can only be used in a server.")
+        return
 
-    await ctx.send(options_message)
+    if new_prefix is None:
+        prefix_options = ['!', '@', '#', '$', '%']
 
-    def check(msg):
-        return msg.author == ctx.author and msg.channel == ctx.channel and msg.content.isdigit()
+        options_message = "Please select a new command prefix by replying with the number, or run `change_prefix <prefix>` to use any other prefix:\n"
+        for i, prefix in enumerate(prefix_options, 1):
+            options_message += f"{i}. {prefix}\n"
+        options_message += f"\nCurrent prefix: {prefixes.get(ctx.guild.id)}"
 
-    try:
-        response = await bot.wait_for('message', check=check, timeout=60)
-        choice = int(response.content)
+        await ctx.send(options_message)
 
-        if 1 <= choice <= len(prefix_options):
-            new_prefix = prefix_options[choice - 1]
-            
-            bot.command_prefix = new_prefix
-            
-            try:
-                with open('config.json', 'r') as f:
-                    config_data = json.load(f)
-                config_data['prefix'] = new_prefix
-                with open('config.json', 'w') as f:
-                    json.dump(config_data, f, indent=4)
-                await ctx.send(f"Command prefix changed to `{new_prefix}`. Use `{new_prefix}help` for commands.")
-            except Exception as e:
-                logger.error(f"Failed to update config.json with new prefix: {e}")
-                await ctx.send(f"Changed prefix to `{new_prefix}`, but failed to save to config.json: {str(e)}")
-        else:
+        def check(msg):
+            return msg.author == ctx.author and msg.channel == ctx.channel and msg.content.isdigit()
+
+        try:
+            response = await bot.wait_for('message', check=check, timeout=60)
+        except asyncio.TimeoutError:
+            await ctx.send("Timed out waiting for your selection. Please run the command again.")
+            return
+        choice = int(response.content)
+        if not 1 <= choice <= len(prefix_options):
             await ctx.send("Invalid selection. Please run the command again and choose a valid number.")
-    except asyncio.TimeoutError:
-        await ctx.send("Timed out waiting for your selection. Please run the command again.")
+            return
+        new_prefix = prefix_options[choice - 1]
+
+    if not 1 <= len(new_prefix) <= 5 or any(c.isspace() or c == '`' for c in new_prefix):
+        await ctx.send("Prefix must be 1 to 5 characters with no spaces or backticks.")
+        return
 
-@bot.command()
+    old_prefix = prefixes.get(ctx.guild.id)
+    prefixes.set(ctx.guild.id, new_prefix)
+    bot.catalog.invalidate_guild(ctx.guild.id)
+    bot.audit.record(ctx.guild.id, ctx.author.id, "change_prefix", new_prefix, f"from {old_prefix}")
+    logger.info(f"Changed prefix for guild {ctx.guild.id} to {new_prefix!r}")
+    await ctx.send(f"Command prefix for this server changed to `{new_prefix}`. Use `{new_prefix}help` for commands.")
+
+@bot.hybrid_command()
+@app_commands.default_permissions(administrator=True)
 @commands.has_permissions(administrator=True)
 async def generate_cog(ctx, cog_name: str):
     """Placeholder for generating predefined cog files on the server (admin)."""
@@ -510,12 +678,14 @@ async def generate_cog(ctx, cog_name: str):
 
     await ctx.send("This command is a placeholder for generating predefined cogs. No cogs are currently available for automatic generation. Use `!add_function` to create custom cogs.")
 
-@bot.command()
+@bot.hybrid_command()
+@app_commands.default_permissions(administrator=True)
 @commands.has_permissions(administrator=True)
 async def execute(ctx, *, command: str):
-    """Executes a shell command on the server (admin, restricted)."""
+    """Executes a shell command on the server; --bg runs it as a background job (admin, restricted)."""
     # Restrict to the allowed user ID
     if ctx.author.id != ALLOWED_USER_ID:
+        bot.audit.record(ctx.guild.id if ctx.guild else None, ctx.author.id, "execute_denied", command)
         await ctx.send("Sorry, you are not authorized to use this command.")
         return
 
@@ -523,19 +693,38 @@ async def execute(ctx, *, command: str):
         await ctx.send("Please provide a command to execute.")
         return
 
+    if command.split(maxsplit=1)[0] == '--bg':
+        command = command[len('--bg'):].strip()
+        if not command:
+            await ctx.send("Usage: `execute --bg <command>`")
+            return
+        try:
+            job = bot.jobs.start(command, ctx.author.id, ctx.guild.id if ctx.guild else None, ctx.channel,
+                                 cwd='/root/Discord-Bots/Odin')
+        except JobLimitReached as e:
+            await ctx.send(f"Couldn't start the job: {e}. See `jobs`.")
+            return
+        bot.audit.record(ctx.guild.id if ctx.guild else None, ctx.author.id, "execute_bg", command, f"job {job.id}")
+        await ctx.send(f"Started job #{job.id}. Use `job {job.id}` to see its output or `job kill {job.id}` to stop it.")
+        return
+
+    await ctx.defer()
     # Log the command execution attempt
     logger.info(f"Executing command '{command}' on behalf of user {ctx.author.id}")
 
     try:
         # Execute the command with a timeout of 10 seconds
-        result = subprocess.run(
+        result = await bot.executor.run_blocking(functools.partial(
+            subprocess.run,
             command,
             shell=True,
             cwd='/root/Discord-Bots/Odin',
             capture_output=True,
             text=True,
             timeout=10
-        )
+        ))
+
+        bot.audit.record(ctx.guild.id if ctx.guild else None, ctx.author.id, "execute", command, f"exit {result.returncode}")
 
         # Capture output
         output = result.stdout
@@ -558,6 +747,7 @@ async def execute(ctx, *, command: str):
         logger.info(f"Command '{command}' executed successfully with output length: {len(full_output)}")
 
     except subprocess.TimeoutExpired:
+        bot.audit.record(ctx.guild.id if ctx.guild else None, ctx.author.id, "execute", command, "timed out")
         await ctx.send("Command execution timed out after 10 seconds.")
         logger.error(f"Command '{command}' timed out after 10 seconds.")
     except subprocess.SubprocessError as e:
@@ -567,16 +757,338 @@ async def execute(ctx, *, command: str):
         await ctx.send(f"Unexpected error: {str(e)}")
         logger.error(f"Unexpected error executing command '{command}': {str(e)}")
 
+@bot.hybrid_command()
+@app_commands.default_permissions(administrator=True)
+@commands.has_permissions(administrator=True)
+async def stats(ctx):
+    """Shows gateway connection statistics (admin)."""
+    await ctx.defer()
+    if bot.ipc:
+        results = await bot.ipc.request("stats")
+        sections = []
+        for worker_id, data in sorted(results.items(), key=lambda item: int(item[0])):
+            sections.append(f"[cluster {worker_id}]\n" + "\n".join(f"{key}: {value}" for key, value in data.items()))
+        await ctx.send(f"**Odin Cluster Stats**:\n```\n{chr(10).join(sections)}\n```")
+        return
+    lines = "\n".join(f"{key}: {value}" for key, value in local_stats().items())
+    await ctx.send(f"**Odin Stats**:\n```\n{lines}\n```")
+
+@bot.hybrid_command()
+@app_commands.default_permissions(administrator=True)
+@commands.has_permissions(administrator=True)
+async def profile(ctx):
+    """Shows a ranked startup and extension load profile (admin)."""
+    report = profiler.report()
+    if bot.startup_report:
+        report += "\nStartup pre-imports (slowest first):"
+        for cog, timing in sorted(bot.startup_report.items(), key=lambda item: -item[1]["imports"]):
+            report += f"\n  cogs.{cog}: {timing['imports'] * 1000:.1f}ms"
+    if len(report) > 1900:
+        report = report[:1900] + "\n..."
+    await ctx.send(f"**Odin Startup Profile**:\n```\n{report}\n```")
+
+@bot.hybrid_command()
+@app_commands.default_permissions(administrator=True)
+@commands.has_permissions(administrator=True)
+async def loop_stats(ctx):
+    """Shows event loop lag and recent blocking callbacks (admin)."""
+    summary = loop_monitor.summary()
+    output = "\n".join(f"{key}: {value}" for key, value in summary.items())
+    for event in list(loop_monitor.slow_callbacks)[-3:]:
+        owner = event["command"] or "no command"
+        if event["cog"]:
+            owner += f" (cog {event['cog']})"
+        output += f"\n\n{event['duration'] * 1000:.0f}ms in {owner}\n{event['stack']}"
+    if len(output) > 1900:
+        output = output[:1900] + "\n..."
+    await ctx.send(f"**Event Loop Lag**:\n```\n{output}\n```")
+
+@bot.hybrid_command()
+@app_commands.default_permissions(administrator=True)
+@commands.has_permissions(administrator=True)
+async def memory(ctx, action: str = "caches", *, args: str = ""):
+    """Memory profiling: start, stop, snapshot, diff or caches (admin)."""
+    action = action.lower()
+    args = args.split()
+    if action == "start":
+        memory_profiler.start()
+        await ctx.send("Started tracemalloc. Take snapshots with `memory snapshot <label>`.")
+    elif action == "stop":
+        memory_profiler.stop()
+        await ctx.send("Stopped tracemalloc and discarded all snapshots.")
+    elif action == "snapshot":
+        if len(args) != 1:
+            await ctx.send("Usage: `memory snapshot <label>`")
+            return
+        try:
+            current, peak = memory_profiler.snapshot(args[0])
+        except RuntimeError as e:
+            await ctx.send(str(e))
+            return
+        await ctx.send(f"Snapshot `{args[0]}` taken. Traced: {current / 1048576:.1f} MiB (peak {peak / 1048576:.1f} MiB). "
+                       f"Stored: {', '.join(memory_profiler.snapshots)}")
+    elif action == "diff":
+        if len(args) not in (2, 3):
+            await ctx.send("Usage: `memory diff <old> <new> [lineno|filename|cog]`")
+            return
+        group = args[2] if len(args) == 3 else "lineno"
+        try:
+            rows = memory_profiler.diff(args[0], args[1], group)
+        except (KeyError, ValueError) as e:
+            await ctx.send(str(e.args[0]))
+            return
+        output = memory_profiler.format_diff(rows)
+        if len(output) > 1900:
+            output = output[:1900] + "\n..."
+        await ctx.send(f"**Memory Diff `{args[0]}` -> `{args[1]}` by {group}**:\n```\n{output}\n```")
+    elif action == "caches":
+        lines = "\n".join(f"{key}: {value}" for key, value in cache_summary(bot).items())
+        tracing = "on" if memory_profiler.running else "off"
+        await ctx.send(f"**discord.py Cache Sizes** (tracemalloc {tracing}):\n```\n{lines}\n```")
+    else:
+        await ctx.send("Unknown action. Use `start`, `stop`, `snapshot`, `diff` or `caches`.")
+
+@bot.hybrid_command()
+@app_commands.default_permissions(administrator=True)
+@commands.has_permissions(administrator=True)
+async def sync_commands(ctx, force: bool = False):
+    """Syncs slash commands with Discord if the command tree changed (admin)."""
+    await ctx.defer()
+    try:
+        synced = await sync_app_commands(bot, app_command_extensions(), force=force)
+    except discord.HTTPException as e:
+        await ctx.send(f"Failed to sync slash commands: {e}")
+        return
+    await ctx.send("Slash commands synced." if synced else "Slash commands are already up to date.")
+
+@bot.hybrid_command()
+@app_commands.default_permissions(administrator=True)
+@commands.has_permissions(administrator=True)
+async def invocations(ctx, action: str = "list", invocation_id: int = None):
+    """Lists running commands with their age, or cancels one (admin)."""
+    # Server admins see their own server's commands; the bot owner sees everything
+    if ctx.author.id == ALLOWED_USER_ID:
+        running = list(deadlines.running.values())
+    else:
+        running = deadlines.for_guild(ctx.guild.id if ctx.guild else None)
+    own = getattr(ctx, '_invocation', None)
+    running = [i for i in running if i is not own]
+    action = action.lower()
+    if action == "list":
+        if not running:
+            await ctx.send("No commands are running.")
+            return
+        lines = []
+        for invocation in sorted(running, key=lambda i: -i.age):
+            where = invocation.ctx.guild.name if invocation.ctx.guild else "DM"
+            limit = f"{invocation.deadline}s deadline" if invocation.deadline else "no deadline"
+            lines.append(f"#{invocation.id} {invocation.ctx.command.qualified_name} by {invocation.ctx.author} in {where}: "
+                         f"{invocation.age:.1f}s ({limit})")
+        output = "\n".join(lines)
+        if len(output) > 1900:
+            output = output[:1900] + "\n..."
+        await ctx.send(f"**Running Commands**:\n```\n{output}\n```")
+    elif action == "cancel":
+        if invocation_id is None:
+            await ctx.send("Usage: `invocations cancel <id>`")
+            return
+        if not any(i.id == invocation_id for i in running) or not deadlines.cancel(invocation_id):
+            await ctx.send(f"No running command with id {invocation_id}.")
+            return
+        logger.info(f"User {ctx.author.id} cancelled invocation #{invocation_id}")
+        await ctx.send(f"Cancelled command #{invocation_id}.")
+    else:
+        await ctx.send("Unknown action. Use `list` or `cancel <id>`.")
+
+@bot.hybrid_command()
+@app_commands.default_permissions(administrator=True)
+@commands.has_permissions(administrator=True)
+async def traces(ctx, count: int = 5):
+    """Shows the slowest recent commands and where their time went (admin)."""
+    # Server admins see their own server's traces; the bot owner sees everything
+    guild_id = None if ctx.author.id == ALLOWED_USER_ID else (ctx.guild.id if ctx.guild else 0)
+    slowest = tracer.slowest(max(1, min(count, 10)), guild_id)
+    if not slowest:
+        await ctx.send("No traces recorded yet.")
+        return
+    output = "\n\n".join(tracer.format(trace) for trace in slowest)
+    if len(output) > 1900:
+        output = output[:1900] + "\n..."
+    await ctx.send(f"**Slowest Recent Commands**:\n```\n{output}\n```")
+
+@bot.hybrid_command()
+@app_commands.default_permissions(administrator=True)
+@commands.has_permissions(administrator=True)
+async def audit(ctx, member: typing.Optional[discord.User] = None, action: str = None, count: int = 15):
+    """Shows who changed what: recent admin actions, filtered by user and/or action (admin)."""
+    # Server admins see their own server's history; the bot owner sees every server's
+    guild_id = None if ctx.author.id == ALLOWED_USER_ID else (ctx.guild.id if ctx.guild else 0)
+    start = time.perf_counter()
+    records = bot.audit.query(guild_id, member.id if member else None, action, max(1, min(count, 50)))
+    elapsed = (time.perf_counter() - start) * 1000
+    if not records:
+        await ctx.send("No matching audit records.")
+        return
+    lines = []
+    for record in records:
+        when = datetime.fromtimestamp(record.timestamp, timezone.utc).strftime('%Y-%m-%d %H:%M')
+        actor = bot.get_user(record.actor_id)
+        line = f"{when} {record.action} {record.target} by {actor or record.actor_id}"
+        if guild_id is None:
+            line += f" in {record.guild_id or 'DM'}"
+        if record.detail:
+            line += f" ({record.detail})"
+        lines.append(line)
+    output = "\n".join(lines)
+    if len(output) > 1850:
+        output = output[:1850] + "\n..."
+    await ctx.send(f"**Audit Log** ({len(records)} records, {elapsed:.1f}ms):\n```\n{output}\n```")
+
+@audit.autocomplete('action')
+async def audit_action_autocomplete(interaction, current):
+    names = sorted(bot.audit.actions_seen())
+    return [app_commands.Choice(name=name, value=name) for name in names if current.lower() in name.lower()][:25]
+
+async def require_owner(ctx):
+    if ctx.author.id != ALLOWED_USER_ID:
+        await ctx.send("Sorry, you are not authorized to use this command.")
+        return False
+    return True
+
+def format_job(job):
+    state = job.status if job.returncode is None else f"{job.status} (exit {job.returncode})"
+    return f"#{job.id} {state}, {job.runtime:.0f}s, {job.written / 1024:.0f} KiB output: {job.command[:80]}"
+
+@bot.hybrid_command()
+@app_commands.default_permissions(administrator=True)
+@commands.has_permissions(administrator=True)
+async def jobs(ctx):
+    """Lists background jobs started with `execute --bg` (admin, restricted)."""
+    if not await require_owner(ctx):
+        return
+    if not bot.jobs.jobs:
+        await ctx.send("No background jobs.")
+        return
+    output = "\n".join(format_job(job) for job in reversed(bot.jobs.jobs.values()))
+    if len(output) > 1900:
+        output = output[:1900] + "\n..."
+    await ctx.send(f"**Background Jobs** ({len(bot.jobs.running())}/{bot.jobs.max_running} running):\n```\n{output}\n```")
+
+@bot.hybrid_group(invoke_without_command=True, fallback="show")
+@app_commands.default_permissions(administrator=True)
+@commands.has_permissions(administrator=True)
+async def job(ctx, job_id: int):
+    """Shows a background job's status and the end of its output (admin, restricted)."""
+    if not await require_owner(ctx):
+        return
+    entry = bot.jobs.get(job_id)
+    if entry is None:
+        await ctx.send(f"No job #{job_id}.")
+        return
+    tail = bot.jobs.tail(entry).replace('```', "'''") or "(no output yet)"
+    await ctx.send(f"**{format_job(entry)[:200]}**\n```\n{tail}\n```")
+
+@job.command(name="output")
+@commands.has_permissions(administrator=True)
+async def job_output(ctx, job_id: int):
+    """Sends a background job's full output as a file (admin, restricted)."""
+    if not await require_owner(ctx):
+        return
+    entry = bot.jobs.get(job_id)
+    if entry is None:
+        await ctx.send(f"No job #{job_id}.")
+        return
+    data = bot.jobs.output(entry)
+    note = f" The first {entry.dropped / 1024:.0f} KiB were dropped to bound disk use." if entry.dropped else ""
+    await ctx.send(f"Output of job #{job_id} ({len(data) / 1024:.0f} KiB).{note}",
+                   file=discord.File(io.BytesIO(data), filename=f"job-{job_id}.log"))
+
+@job.command(name="kill")
+@commands.has_permissions(administrator=True)
+async def job_kill(ctx, job_id: int):
+    """Stops a running background job (admin, restricted)."""
+    if not await require_owner(ctx):
+        return
+    if bot.jobs.kill(job_id) is None:
+        await ctx.send(f"Job #{job_id} isn't running.")
+        return
+    bot.audit.record(ctx.guild.id if ctx.guild else None, ctx.author.id, "job_kill", job_id)
+    await ctx.send(f"Stopping job #{job_id}.")
+
+def local_stats():
+    data = bot.connection_stats.as_dict()
+    data["latency_ms"] = None if math.isnan(bot.latency) else round(bot.latency * 1000)
+    data["guilds"] = len(bot.guilds)
+    data["rate_limited"] = rate_limiter.rejected
+    data["sends"] = bot.sender.sent
+    data["sends_merged"] = bot.sender.merged
+    data.update({f"admission_{key}": value for key, value in admission.summary().items()})
+    data.update({f"invocations_{key}": value for key, value in deadlines.summary().items()})
+    data["jobs_running"] = len(bot.jobs.running())
+    for pool_name, pool in bot.executor.metrics().items():
+        if pool_name != "by_owner":
+            data[f"executor_{pool_name}"] = f"{pool['in_flight']} in flight, {pool['queued']} queued, {pool['timed_out']} timed out"
+    if WORKER:
+        data["shards"] = ",".join(map(str, bot.shard_ids))
+    return data
+
+# IPC handlers used when running as a cluster worker
+if bot.ipc:
+    @bot.ipc.handler("stats")
+    async def ipc_stats(data):
+        return local_stats()
+
+    @bot.ipc.handler("logs")
+    async def ipc_logs(data):
+        return list(recent_logs.lines)[-data.get("lines", 20):]
+
+    @bot.ipc.handler("registry_changed")
+    async def ipc_registry_changed(data):
+        bot.registry.load()
+        bot.catalog.invalidate()
+
+    @bot.ipc.handler("cog_enabled")
+    async def ipc_cog_enabled(data):
+        guild_configs.invalidate(data["guild_id"])
+        bot.catalog.invalidate_guild(data["guild_id"])
+
+    @bot.ipc.handler("cog_disabled")
+    async def ipc_cog_disabled(data):
+        guild_configs.invalidate(data["guild_id"])
+        bot.catalog.invalidate_guild(data["guild_id"])
+        await unload_if_unused(data["cog"])
+
+    @bot.ipc.handler("user_zones_changed")
+    async def ipc_user_zones_changed(data):
+        # Without the Time cog loaded nothing is cached; it reads the file when it loads
+        cog = bot.get_cog("Time")
+        if cog is not None:
+            cog.user_zones.apply(data["user_id"], data["zones"])
+
 async def main():
+    # Fork the CPU workers before the gateway and the thread pool start any threads
+    bot.executor.start()
+    if bot.ipc:
+        await bot.ipc.connect()
     try:
-        await bot.start(config['token'])
+        await run_forever(bot, config['token'])
     except Exception as e:
-        logger.error(f'Failed to start bot: {e}')
-        await bot.close()
-        await asyncio.sleep(5)
-        if bot.http:
-            await bot.http.close()
-        await main()
+        logger.error(f'Bot stopped after a fatal error: {e}')
+        raise SystemExit(EXIT_FATAL if is_fatal(e) else 1)
+    finally:
+        bot.registry.flush()
+        bot.executor.shutdown()
+        bot.jobs.shutdown()
+        bot.reminders.stop()
+        bot.reminders.store.close()
+        bot.audit.close()
+        if recorder:
+            recorder.close()
+        if bot.ipc:
+            await bot.ipc.close()
 
 if __name__ == '__main__':
-    asyncio.run(main())
+    if CLUSTER_ENABLED and not WORKER:
+        asyncio.run(ClusterSupervisor(config).run())
+    else:
+        asyncio.run(main())
@@ -1,10 +1,12 @@
 import discord
 from discord.ext import commands
-import json
 import logging
 import os
 from dotenv import load_dotenv
 import aiohttp
+import asyncio
+from utils.sender import BULK
+from utils.tracing import aiohttp_trace_config
 
 # Load environment variables from ../.env (relative to working directory /root/Discord-Bots/Odin)
 env_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '.env'))
@@ -22,31 +24,6 @@ class FunctionGenerator(commands.Cog):
         if not XAI_API_KEY:
             logger.error("XAI_API_KEY not found in .env file.")
         logger.info("Initializing FunctionGenerator cog")
-        self._register_commands()
-
-    def _register_commands(self):
-        """Register this cog's commands in functions.json."""
-        logger.info("Starting command registration for FunctionGenerator")
-        commands_to_register = {
-            "function_generator": "Generates a program from a text prompt using AI (admin). Usage: function_generator <function_name>"
-        }
-        try:
-            try:
-                with open('functions.json', 'r') as f:
-                    data = json.load(f)
-                logger.info("Successfully read functions.json")
-            except FileNotFoundError:
-                data = {"cogs": {}, "bot_commands": {}}
-                logger.warning("functions.json not found, creating new structure")
-
-            if "cogs" not in data:
-                data["cogs"] = {}
-            data["cogs"]["function_generator"] = {"commands": commands_to_register}
-            with open('functions.json', 'w') as f:
-                json.dump(data, f, indent=4)
-            logger.info("Successfully registered commands for FunctionGenerator")
-        except Exception as e:
-            logger.error(f"Failed to register commands for FunctionGenerator cog: {e}")
 
     async def _call_ai_model(self, prompt):
         """Call the xAI API to generate code based on the prompt."""
@@ -55,7 +32,7 @@ class FunctionGenerator(commands.Cog):
             return None
 
         if not self.session:
-            self.session = aiohttp.ClientSession()
+            self.session = aiohttp.ClientSession(trace_configs=[aiohttp_trace_config()])
 
         try:
             url = "https://api.x.ai/v1/completions"
@@ -84,7 +61,7 @@ class FunctionGenerator(commands.Cog):
             logger.error(f"xAI API request failed: {str(e)}")
             return None
 
-    @commands.command()
+    @commands.hybrid_command()
     @commands.has_permissions(administrator=True)
     async def function_generator(self, ctx, function_name: str):
         """Generates a program from a text prompt using AI (admin). Usage: function_generator <function_name>"""
@@ -142,8 +119,10 @@ class FunctionGenerator(commands.Cog):
             # Step 5: Send the generated code back to the channel
             if len(generated_code) > 1900:
                 parts = [generated_code[i:i+1900] for i in range(0, len(generated_code), 1900)]
-                for i, part in enumerate(parts, 1):
-                    await ctx.send(f"**Generated Program for `{function_name}` (Part {i}/{len(parts)})**:\n```\n{part}\n```")
+                await asyncio.gather(*(
+                    self.bot.sender.send(ctx, f"**Generated Program for `{function_name}` (Part {i}/{len(parts)})**:\n```\n{part}\n```", priority=BULK)
+                    for i, part in enumerate(parts, 1)
+                ))
             else:
                 await ctx.send(f"**Generated Program for `{function_name}`**:\n```\n{generated_code}\n```")
 
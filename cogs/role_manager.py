@@ -1,9 +1,11 @@
 import discord
+from discord import app_commands
 from discord.ext import commands
 import json
 import logging
 import os
 import asyncio
+from utils.sender import BULK
 
 # Setup logging
 logger = logging.getLogger(__name__)
@@ -19,35 +21,6 @@ class RoleManager(commands.Cog):
         self.bot = bot
         self.role_configs = self.load_role_configs()
         logger.info("Initializing RoleManager cog")
-        self._register_commands()
-
-    def _register_commands(self):
-        """Register this cog's commands in functions.json."""
-        logger.info("Starting command registration for RoleManager")
-        commands_to_register = {
-            "role_manager": "Manages roles (create/remove/modify) via DM (admin-only). Usage: role_manager",
-            "assign_role": "Assigns a low-level role to yourself. Usage: assign_role <role_name>",
-            "view_roles": "Views your current roles. Usage: view_roles",
-            "view_role_configs": "Views all role configurations (admin-only). Usage: view_role_configs",
-            "role_manager_help": "Shows the functionality of the RoleManager cog. Usage: role_manager_help"
-        }
-        try:
-            try:
-                with open('functions.json', 'r') as f:
-                    data = json.load(f)
-                logger.info("Successfully read functions.json")
-            except FileNotFoundError:
-                data = {"cogs": {}, "bot_commands": {}}
-                logger.warning("functions.json not found, creating new structure")
-
-            if "cogs" not in data:
-                data["cogs"] = {}
-            data["cogs"]["role_manager"] = {"commands": commands_to_register}
-            with open('functions.json', 'w') as f:
-                json.dump(data, f, indent=4)
-            logger.info("Successfully registered commands for RoleManager")
-        except Exception as e:
-            logger.error(f"Failed to register commands for RoleManager cog: {e}")
 
     # Load role configurations from file
     def load_role_configs(self):
@@ -61,6 +34,13 @@ class RoleManager(commands.Cog):
         with open(ROLE_CONFIG_FILE, 'w') as f:
             json.dump(self.role_configs, f, indent=2)
 
+    # Members are not cached under the lean runtime profile, so fetch them when needed
+    async def get_member(self, guild, user_id):
+        member = guild.get_member(user_id)
+        if member is None:
+            member = await guild.fetch_member(user_id)
+        return member
+
     # Check if the user is an admin
     def check_admin(self):
         async def predicate(ctx):
@@ -80,7 +60,8 @@ class RoleManager(commands.Cog):
             return True
         return commands.check(predicate)
 
-    @commands.command(name="role_manager")
+    @commands.hybrid_command(name="role_manager")
+    @app_commands.default_permissions(administrator=True)
     @commands.check(check_admin)
     async def role_manager(self, ctx):
         """Manages roles (create/remove/modify) via DM (admin-only). Usage: role_manager"""
@@ -174,9 +155,12 @@ class RoleManager(commands.Cog):
                 "permissions": permissions
             }
             self.save_role_configs()
+            self.bot.audit.record(ctx.guild.id, ctx.author.id, "role_create", role_name,
+                                  f"low_level={is_low_level} perms={perms_summary or 'none'}")
 
             # Step 8: Manage role hierarchy (ensure new role is below bot’s highest role)
-            bot_top_role = max([role for role in ctx.guild.me.roles], key=lambda r: r.position)
+            me = await self.get_member(ctx.guild, self.bot.user.id)
+            bot_top_role = max([role for role in me.roles], key=lambda r: r.position)
             if new_role.position > bot_top_role.position:
                 await new_role.edit(position=bot_top_role.position - 1)
 
@@ -222,6 +206,8 @@ class RoleManager(commands.Cog):
                 await ctx.author.send("I don’t have permission to delete roles. Please ensure I have the `Manage Roles` permission.")
                 return
 
+            self.bot.audit.record(ctx.guild.id, ctx.author.id, "role_remove", role_name, f"id={role.id}")
+
             # Step 5: Update role configurations
             if role_name in self.role_configs["roles"]:
                 del self.role_configs["roles"][role_name]
@@ -292,9 +278,12 @@ class RoleManager(commands.Cog):
                 "permissions": permissions
             }
             self.save_role_configs()
+            self.bot.audit.record(ctx.guild.id, ctx.author.id, "role_modify", role_name,
+                                  f"low_level={is_low_level} perms={perms_summary or 'none'}")
 
             # Step 8: Manage role hierarchy
-            bot_top_role = max([r for r in ctx.guild.me.roles], key=lambda r: r.position)
+            me = await self.get_member(ctx.guild, self.bot.user.id)
+            bot_top_role = max([r for r in me.roles], key=lambda r: r.position)
             if role.position > bot_top_role.position:
                 await role.edit(position=bot_top_role.position - 1)
 
@@ -321,12 +310,14 @@ class RoleManager(commands.Cog):
         ]
         permissions = {perm: False for perm in permission_options}
 
-        await ctx.author.send(
+        # Queued rather than awaited; the DM queue sends it ahead of the first question
+        self.bot.sender.post(
+            ctx.author,
             "Let’s set permissions for the role. For each permission, reply with `yes` to enable or `no` to disable."
         )
 
         for perm in permission_options:
-            await ctx.author.send(f"Enable `{perm}` permission? (yes/no)")
+            await self.bot.sender.send(ctx.author, f"Enable `{perm}` permission? (yes/no)")
             try:
                 perm_msg = await self.bot.wait_for('message', check=check, timeout=300)
                 enable = perm_msg.content.strip().lower() == "yes"
@@ -337,7 +328,7 @@ class RoleManager(commands.Cog):
 
         return permissions
 
-    @commands.command(name="assign_role")
+    @commands.hybrid_command(name="assign_role")
     @commands.check(check_everyone)
     async def assign_role(self, ctx, *, role_name: str):
         """Assigns a low-level role to yourself. Usage: assign_role <role_name>"""
@@ -355,17 +346,28 @@ class RoleManager(commands.Cog):
             await ctx.send(f"Role `{role_name}` no longer exists in the server.")
             return
 
-        if role in ctx.author.roles:
+        member = ctx.author if isinstance(ctx.author, discord.Member) else await self.get_member(ctx.guild, ctx.author.id)
+        if role in member.roles:
             await ctx.send(f"You already have the role `{role_name}`.")
             return
 
         try:
-            await ctx.author.add_roles(role, reason="Assigned via RoleManager")
+            await member.add_roles(role, reason="Assigned via RoleManager")
             await ctx.send(f"Assigned role `{role_name}` to you!")
         except discord.Forbidden:
             await ctx.send("I don’t have permission to assign roles. Please ensure I have the `Manage Roles` permission.")
 
-    @commands.command(name="view_roles")
+    @assign_role.autocomplete('role_name')
+    async def role_name_autocomplete(self, interaction, current):
+        """Low-level roles from the role configs that still exist in this server."""
+        guild_role_ids = {role.id for role in interaction.guild.roles} if interaction.guild else set()
+        names = sorted(
+            name for name, config in self.role_configs["roles"].items()
+            if config["is_low_level"] and config["id"] in guild_role_ids and current.lower() in name.lower()
+        )
+        return [app_commands.Choice(name=name, value=name) for name in names[:25]]
+
+    @commands.hybrid_command(name="view_roles")
     async def view_roles(self, ctx):
         """Views your current roles. Usage: view_roles"""
         roles = [role.name for role in ctx.author.roles if role.name != "@everyone"]
@@ -376,7 +378,8 @@ class RoleManager(commands.Cog):
         roles_list = "\n".join(roles)
         await ctx.send(f"**Your Roles**:\n```\n{roles_list}\n```")
 
-    @commands.command(name="view_role_configs")
+    @commands.hybrid_command(name="view_role_configs")
+    @app_commands.default_permissions(administrator=True)
     @commands.check(check_admin)
     async def view_role_configs(self, ctx):
         """Views all role configurations (admin-only). Usage: view_role_configs"""
@@ -396,12 +399,14 @@ class RoleManager(commands.Cog):
 
         if len(config_output) > 1900:
             parts = [config_output[i:i+1900] for i in range(0, len(config_output), 1900)]
-            for i, part in enumerate(parts, 1):
-                await ctx.send(f"**Role Configurations (Part {i}/{len(parts)})**:\n```\n{part}\n```")
+            await asyncio.gather(*(
+                self.bot.sender.send(ctx, f"**Role Configurations (Part {i}/{len(parts)})**:\n```\n{part}\n```", priority=BULK)
+                for i, part in enumerate(parts, 1)
+            ))
         else:
             await ctx.send(f"**Role Configurations**:\n```\n{config_output}\n```")
 
-    @commands.command(name="role_manager_help")
+    @commands.hybrid_command(name="role_manager_help")
     async def role_manager_help(self, ctx):
         """Shows the functionality of the RoleManager cog. Usage: role_manager_help"""
         help_text = (
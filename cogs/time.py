@@ -1,41 +1,227 @@
+from discord import app_commands
 from discord.ext import commands
-import pytz
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
 import asyncio
 import os
 import sys
 import subprocess
 import logging
+import re
+import time
+
+from utils.timezones import UserZoneStore, ZoneIndex, zone_label
 
 logger = logging.getLogger('Leobot')
 
+DEFAULT_TIMEZONES = (
+    ("Chicago", "America/Chicago"),
+    ("New York", "America/New_York"),
+    ("London", "Europe/London"),
+    ("Belgium", "Europe/Brussels"),
+    ("Athens", "Europe/Athens"),
+    ("Hong Kong", "Asia/Hong_Kong"),
+    ("Hawaii", "Pacific/Honolulu"),
+    ("Sydney", "Australia/Sydney"),
+)
+MAX_ZONES = 12
+TIME_FORMATS = ('%H:%M', '%H:%M:%S', '%I:%M%p', '%I%p', '%Y-%m-%dT%H:%M', '%Y-%m-%d@%H:%M')
+MAX_REMINDERS_PER_USER = 50
+MAX_REMINDER_DELAY = 366 * 86400
+DURATION_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 604800}
+DURATION_PATTERN = re.compile(r'(\d+)([smhdw])')
+
+
+def parse_duration(text):
+    """Seconds in a duration like `90s`, `10m` or `1d2h30m`, or None."""
+    text = text.strip().lower()
+    parts = DURATION_PATTERN.findall(text)
+    if not parts or ''.join(n + u for n, u in parts) != text:
+        return None
+    return sum(int(n) * DURATION_UNITS[u] for n, u in parts)
+
+
+def parse_time(text, zone):
+    """Parse `now`, a time of day (today in `zone`) or an ISO-style date and time into an aware datetime."""
+    text = text.strip().upper()
+    if text == "NOW":
+        return datetime.now(zone)
+    for fmt in TIME_FORMATS:
+        try:
+            parsed = datetime.strptime(text, fmt)
+        except ValueError:
+            continue
+        if '%Y' not in fmt:
+            today = datetime.now(zone)
+            parsed = parsed.replace(year=today.year, month=today.month, day=today.day)
+        return parsed.replace(tzinfo=zone)
+    return None
+
+
 class Time(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        # Resolve zones once; ZoneInfo objects are reused for every render
+        self.zones = {tz: ZoneInfo(tz) for _, tz in DEFAULT_TIMEZONES}
+        # Rendered tables for the current second, keyed by zone set
+        self._render_second = None
+        self._render_cache = {}
+        self.index = ZoneIndex()
+        self.user_zones = UserZoneStore()
+        self._guild_zones = {}
+        # Started by bot.py, so reminders fire whether or not this cog is loaded
+        self.scheduler = bot.reminders
         logger.info("Time cog initialized")
 
-    @commands.command(name="time")
+    async def cog_unload(self):
+        await self.cleanup()
+
+    def get_zone(self, tz):
+        zone = self.zones.get(tz)
+        if zone is None:
+            zone = self.zones[tz] = ZoneInfo(tz)
+        return zone
+
+    def render_times(self, timezones):
+        """Render a (label, zone) table; identical tables within the same second are computed once."""
+        second = int(time.time())
+        if second != self._render_second:
+            self._render_second = second
+            self._render_cache.clear()
+        text = self._render_cache.get(timezones)
+        if text is None:
+            now = datetime.fromtimestamp(second, timezone.utc)
+            text = "\n".join(
+                f"{city}: {now.astimezone(self.get_zone(tz)).strftime('%H:%M:%S %Z on %B %d, %Y')}"
+                for city, tz in timezones
+            )
+            self._render_cache[timezones] = text
+        return text
+
+    def guild_zones(self, guild_id):
+        zones = self._guild_zones.get(guild_id)
+        if zones is None:
+            names = self.bot.guild_configs.get(guild_id).get('time_zones')
+            zones = tuple((zone_label(name), name) for name in names) if names else DEFAULT_TIMEZONES
+            self._guild_zones[guild_id] = zones
+        return zones
+
+    def zones_for(self, ctx):
+        """The caller's own zone list, else their guild's, else the defaults."""
+        names = self.user_zones.get(ctx.author.id)
+        if names:
+            return tuple((zone_label(name), name) for name in names)
+        if ctx.guild is None:
+            return DEFAULT_TIMEZONES
+        return self.guild_zones(ctx.guild.id)
+
+    def resolve_zones(self, args):
+        """Resolve zone arguments, returning (names, unknown)."""
+        names, unknown = [], []
+        for arg in args:
+            name = self.index.resolve(arg)
+            if name is None:
+                unknown.append(arg)
+            elif name not in names:
+                names.append(name)
+        return names, unknown
+
+    def unknown_zones_message(self, unknown):
+        hints = []
+        for arg in unknown:
+            matches = self.index.complete(arg, limit=3)
+            hints.append(f"`{arg}`" + (f" (did you mean {', '.join(matches)}?)" if matches else ""))
+        return f"Unknown time zone(s): {', '.join(hints)}"
+
+    @commands.hybrid_group(name="time", invoke_without_command=True, fallback="now")
     async def world_time(self, ctx):
-        logger.info(f"Command !time received from {ctx.author.name} (ID: {ctx.author.id}) in channel {ctx.channel.name} (ID: {ctx.channel.id})")
-        timezones = {
-            "Chicago": "America/Chicago",
-            "New York": "America/New_York",
-            "London": "Europe/London",
-            "Belgium": "Europe/Brussels",
-            "Athens": "Europe/Athens",
-            "Hong Kong": "Asia/Hong_Kong",
-            "Hawaii": "Pacific/Honolulu",
-            "Sydney": "Australia/Sydney",
-        }
-        time_messages = []
-        for city, tz in timezones.items():
-            timezone = pytz.timezone(tz)
-            current_time = datetime.now(timezone).strftime("%H:%M:%S %Z on %B %d, %Y")
-            time_messages.append(f"{city}: {current_time}")
-        await ctx.send("\n".join(time_messages))
-        logger.info(f"Successfully sent times for {', '.join(timezones.keys())}")
-
-    @commands.command()
+        """Shows the current time in your, or this server's, time zones."""
+        logger.info(f"Command !time received from {ctx.author.name} (ID: {ctx.author.id}) in channel {ctx.channel} (ID: {ctx.channel.id})")
+        zones = self.zones_for(ctx)
+        await ctx.send(self.render_times(zones))
+        logger.info(f"Successfully sent times for {', '.join(city for city, _ in zones)}")
+
+    @world_time.command(name="convert")
+    async def convert(self, ctx, when: str, from_zone: str, *, to_zones: str = ""):
+        """Converts a time from one zone to others, e.g. `time convert 14:30 London Tokyo`."""
+        source = self.index.resolve(from_zone)
+        targets, unknown = self.resolve_zones(to_zones.split())
+        if source is None:
+            unknown.insert(0, from_zone)
+        if unknown:
+            await ctx.send(self.unknown_zones_message(unknown))
+            return
+        moment = parse_time(when, self.get_zone(source))
+        if moment is None:
+            await ctx.send("Couldn't read that time. Use `now`, `14:30`, `2:30pm` or `2024-05-01T14:30`.")
+            return
+        zones = tuple((zone_label(name), name) for name in targets[:MAX_ZONES]) if targets else self.zones_for(ctx)
+        # One UTC instant, converted into every target zone.
+        instant = moment.astimezone(timezone.utc)
+        lines = [f"{when} in {zone_label(source)} ({moment.strftime('%H:%M %Z, %B %d')}) is:"]
+        lines.extend(
+            f"{city}: {instant.astimezone(self.get_zone(tz)).strftime('%H:%M %Z on %B %d, %Y')}"
+            for city, tz in zones
+        )
+        await ctx.send("\n".join(lines))
+
+    @world_time.command(name="set")
+    async def set_zones(self, ctx, *, zones: str = ""):
+        """Sets your own list of time zones; with no zones, clears it."""
+        names, unknown = self.resolve_zones(zones.split())
+        if unknown:
+            await ctx.send(self.unknown_zones_message(unknown))
+            return
+        if len(names) > MAX_ZONES:
+            await ctx.send(f"You can pick up to {MAX_ZONES} zones.")
+            return
+        self.user_zones.set(ctx.author.id, names)
+        if self.bot.ipc:
+            await self.bot.ipc.broadcast("user_zones_changed", {"user_id": ctx.author.id, "zones": list(names)})
+        await ctx.send(f"Your time zones: {', '.join(names)}" if names else "Your time zones were cleared.")
+
+    @world_time.command(name="server")
+    @commands.guild_only()
+    @commands.has_permissions(administrator=True)
+    async def set_server_zones(self, ctx, *, zones: str = ""):
+        """Sets this server's default time zones; with no zones, restores the defaults (admin)."""
+        names, unknown = self.resolve_zones(zones.split())
+        if unknown:
+            await ctx.send(self.unknown_zones_message(unknown))
+            return
+        if len(names) > MAX_ZONES:
+            await ctx.send(f"You can pick up to {MAX_ZONES} zones.")
+            return
+        data = self.bot.guild_configs.get(ctx.guild.id)
+        if names:
+            data['time_zones'] = names
+        else:
+            data.pop('time_zones', None)
+        self.bot.guild_configs.save(ctx.guild.id, data)
+        self._guild_zones.pop(ctx.guild.id, None)
+        await ctx.send(f"Server time zones: {', '.join(names)}" if names else "Server time zones reset to the defaults.")
+
+    @world_time.command(name="search")
+    async def search_zones(self, ctx, *, query: str):
+        """Lists time zone names matching a prefix or close spelling."""
+        matches = self.index.complete(query, limit=15)
+        await ctx.send("\n".join(matches) if matches else f"No time zones match `{query}`.")
+
+    @convert.autocomplete('from_zone')
+    async def zone_autocomplete(self, interaction, current):
+        return [app_commands.Choice(name=name, value=name) for name in self.index.complete(current)]
+
+    @convert.autocomplete('to_zones')
+    @set_zones.autocomplete('zones')
+    @set_server_zones.autocomplete('zones')
+    async def zone_list_autocomplete(self, interaction, current):
+        """Complete the last zone in a space-separated list."""
+        head, _, last = current.rpartition(' ')
+        prefix = f"{head} " if head else ""
+        choices = [prefix + name for name in self.index.complete(last) if len(prefix + name) <= 100]
+        return [app_commands.Choice(name=choice, value=choice) for choice in choices]
+
+    @commands.hybrid_command()
     async def reboot(self, ctx):
         if ctx.author.id not in {1131932116242939975, 1314875665996185613}:
             await ctx.send("Only admins can use this command!")
@@ -82,6 +268,70 @@ class Time(commands.Cog):
         logger.info("Exiting current process...")
         sys.exit(0)
 
+    def due_time(self, ctx, when):
+        """Unix time for `now`, a duration (`1h30m`) or a clock time in the caller's first zone, else None."""
+        if when.strip().lower() == "now":
+            return time.time()
+        seconds = parse_duration(when)
+        if seconds is not None:
+            return time.time() + seconds
+        moment = parse_time(when, self.get_zone(self.zones_for(ctx)[0][1]))
+        if moment is None:
+            return None
+        # A bare time of day that has already passed means tomorrow, at the same wall-clock time
+        # in that zone; aware datetime arithmetic keeps the wall time across a DST change.
+        if moment.timestamp() <= time.time() and 'T' not in when.upper() and '@' not in when:
+            moment += timedelta(days=1)
+        return moment.timestamp()
+
+    async def schedule(self, ctx, when, message, mention):
+        now = time.time()
+        due = self.due_time(ctx, when)
+        if due is None:
+            await ctx.send("Couldn't read that time. Use a duration like `10m` or `1d2h`, or a time like `14:30`.")
+            return
+        if due < now or due - now > MAX_REMINDER_DELAY:
+            await ctx.send("Reminders must be in the future and within a year.")
+            return
+        if self.scheduler.store.count_for_user(ctx.author.id) >= MAX_REMINDERS_PER_USER:
+            await ctx.send(f"You already have {MAX_REMINDERS_PER_USER} pending reminders.")
+            return
+        guild_id = ctx.guild.id if ctx.guild else None
+        channel_id = ctx.channel.id if ctx.guild else None
+        reminder = self.scheduler.add(due, ctx.author.id, guild_id, channel_id, message, mention)
+        await ctx.send(f"Reminder #{reminder.id} set for <t:{int(due)}:F> (<t:{int(due)}:R>).")
+        logger.info(f"Reminder {reminder.id} scheduled by {ctx.author.name} (ID: {ctx.author.id}) for {int(due)}")
+
+    @commands.hybrid_command()
+    async def remind(self, ctx, when: str, *, message: str):
+        """Reminds you in this channel, e.g. `remind 1h30m stretch` or `remind 17:00 standup`."""
+        await self.schedule(ctx, when, message, mention=True)
+
+    @commands.hybrid_command()
+    @commands.guild_only()
+    @commands.has_permissions(administrator=True)
+    async def announce(self, ctx, when: str, *, message: str):
+        """Posts a scheduled announcement in this channel (admin)."""
+        await self.schedule(ctx, when, message, mention=False)
+
+    @commands.hybrid_group(name="reminders", invoke_without_command=True, fallback="list")
+    async def list_reminders(self, ctx):
+        """Lists your pending reminders."""
+        pending = self.scheduler.store.for_user(ctx.author.id)
+        if not pending:
+            await ctx.send("You have no pending reminders.")
+            return
+        lines = [f"#{r.id} <t:{int(r.due)}:R>: {r.message[:80]}" for r in pending]
+        await ctx.send("\n".join(lines))
+
+    @list_reminders.command(name="cancel")
+    async def cancel_reminder(self, ctx, reminder_id: int):
+        """Cancels one of your reminders by number."""
+        if self.scheduler.cancel(reminder_id, ctx.author.id):
+            await ctx.send(f"Reminder #{reminder_id} cancelled.")
+        else:
+            await ctx.send(f"You have no reminder #{reminder_id}.")
+
     async def cleanup(self):
         logger.info("Time cog cleanup complete (no resources to close)")
 
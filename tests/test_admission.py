@@ -0,0 +1,119 @@
+import asyncio
+import json
+import types
+
+import pytest
+
+from utils.admission import AdmissionController, Overloaded
+from utils.registry import CommandRegistry
+
+
+def registry(tmp_path, priority=None):
+    data = {"cogs": {}, "bot_commands": {}, "bot_settings": {}}
+    if priority:
+        data["bot_settings"]["priority"] = {"commands": priority}
+    path = tmp_path / "functions.json"
+    path.write_text(json.dumps(data))
+    return CommandRegistry(str(path))
+
+
+def context(guild_id, name="ping"):
+    return types.SimpleNamespace(guild=types.SimpleNamespace(id=guild_id) if guild_id else None,
+                                 command=types.SimpleNamespace(cog=None, qualified_name=name))
+
+
+async def drain(controller, invocations):
+    """Start every (label, ctx) while one slot is held, then free it; returns the admission order."""
+    order = []
+    holder = context(0)
+    await controller.acquire(holder)
+
+    async def invoke(label, ctx):
+        await controller.acquire(ctx)
+        order.append(label)
+        await asyncio.sleep(0)
+        controller.release(ctx)
+
+    tasks = [asyncio.create_task(invoke(label, ctx)) for label, ctx in invocations]
+    await asyncio.sleep(0)
+    controller.release(holder)
+    await asyncio.gather(*tasks)
+    return order
+
+
+def test_idle_controller_admits_immediately(tmp_path):
+    async def scenario():
+        controller = AdmissionController(registry(tmp_path))
+        ctx = context(1)
+        await controller.acquire(ctx)
+        await controller.acquire(ctx)  # A subcommand's second before_invoke is a no-op
+        assert controller.running == 1 and controller.queued == 0
+        controller.release(ctx)
+        controller.release(ctx)
+        assert controller.running == 0
+    asyncio.run(scenario())
+
+
+def test_busy_guild_does_not_starve_others(tmp_path):
+    controller = AdmissionController(registry(tmp_path), max_concurrent=1, per_guild=1)
+    order = asyncio.run(drain(controller, [("a1", context(1)), ("a2", context(1)), ("a3", context(1)),
+                                           ("b1", context(2))]))
+    # Guild 1 queued first, but guild 2's single command isn't made to wait behind all of them.
+    assert order.index("b1") < order.index("a2")
+    assert order == ["a1", "b1", "a2", "a3"]
+
+
+def test_weights_give_a_proportional_share(tmp_path):
+    weights = {1: 2, 2: 1}
+    controller = AdmissionController(registry(tmp_path), weight_for=lambda guild_id: weights.get(guild_id, 1), max_concurrent=1, per_guild=1)
+    invocations = [(f"g1-{i}", context(1)) for i in range(6)] + [(f"g2-{i}", context(2)) for i in range(6)]
+    order = asyncio.run(drain(controller, invocations))
+    first_six = [label[:2] for label in order[:6]]
+    assert first_six.count("g1") == 4 and first_six.count("g2") == 2
+
+
+def test_higher_priority_goes_first_within_a_guild(tmp_path):
+    controller = AdmissionController(registry(tmp_path, {"urgent": "high", "bulk": "low"}),
+                                     max_concurrent=1, per_guild=1)
+    order = asyncio.run(drain(controller, [("bulk", context(1, "bulk")), ("ping", context(1)),
+                                           ("urgent", context(1, "urgent"))]))
+    assert order == ["urgent", "ping", "bulk"]
+
+
+def test_low_priority_is_shed_first_then_everything_but_high(tmp_path):
+    async def scenario():
+        controller = AdmissionController(registry(tmp_path, {"bulk": "low", "urgent": "high"}),
+                                         max_concurrent=1, shed_low_at=1, max_queue=2)
+        holder = context(1)
+        await controller.acquire(holder)
+        waiting = [asyncio.create_task(controller.acquire(context(2)))]
+        await asyncio.sleep(0)
+        with pytest.raises(Overloaded) as error:
+            await controller.acquire(context(3, "bulk"))
+        assert error.value.reason == "low_priority"
+        waiting.append(asyncio.create_task(controller.acquire(context(3))))
+        await asyncio.sleep(0)
+        with pytest.raises(Overloaded) as error:
+            await controller.acquire(context(4))
+        assert error.value.reason == "queue_full"
+        # High priority still queues past max_queue.
+        waiting.append(asyncio.create_task(controller.acquire(context(4, "urgent"))))
+        await asyncio.sleep(0)
+        assert controller.queued == 3
+        assert controller.shed == {"low_priority": 1, "queue_full": 1}
+        for task in waiting:
+            task.cancel()
+        await asyncio.gather(*waiting, return_exceptions=True)
+        assert controller.queued == 0
+    asyncio.run(scenario())
+
+
+def test_queued_invocation_gives_up_after_max_wait(tmp_path):
+    async def scenario():
+        controller = AdmissionController(registry(tmp_path), max_concurrent=1, max_wait=0.01)
+        await controller.acquire(context(1))
+        with pytest.raises(Overloaded) as error:
+            await controller.acquire(context(2))
+        assert error.value.reason == "timeout"
+        assert controller.queued == 0 and controller.summary()["shed"] == 1
+    asyncio.run(scenario())
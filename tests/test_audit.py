@@ -0,0 +1,60 @@
+import os
+
+from utils.audit import AuditJournal
+
+
+def fill(journal):
+    journal.record(1, 10, "enable_function", "time")
+    journal.record(1, 11, "rename", "ping", "to pong")
+    journal.record(2, 10, "enable_function", "role_manager")
+    journal.record(None, 10, "execute", "ls", "exit 0")
+
+
+def test_query_filters_by_guild_actor_and_action_newest_first(tmp_path):
+    journal = AuditJournal(str(tmp_path))
+    fill(journal)
+    assert [r.target for r in journal.query(actor_id=10)] == ["ls", "role_manager", "time"]
+    assert [r.target for r in journal.query(guild_id=1)] == ["ping", "time"]
+    assert [r.target for r in journal.query(guild_id=2, actor_id=10, action="enable_function")] == ["role_manager"]
+    assert [r.guild_id for r in journal.query(guild_id=0)] == [0]  # DMs are stored as guild 0
+    assert journal.query(action="never_recorded") == []
+    assert len(journal.query(limit=2)) == 2
+    record = journal.query(action="rename")[0]
+    assert (record.actor_id, record.target, record.detail) == (11, "ping", "to pong")
+
+
+def test_index_is_rebuilt_from_segments_on_startup(tmp_path):
+    journal = AuditJournal(str(tmp_path), segment_bytes=100)
+    fill(journal)
+    journal.close()
+    assert len(os.listdir(tmp_path)) > 1  # Small segments roll over
+
+    reopened = AuditJournal(str(tmp_path), segment_bytes=100)
+    assert len(reopened.locations) == 4
+    assert sorted(reopened.actions_seen()) == ["enable_function", "execute", "rename"]
+    assert [r.target for r in reopened.query(actor_id=10, action="enable_function")] == ["role_manager", "time"]
+    reopened.record(3, 12, "change_prefix", "?")
+    assert reopened.query(guild_id=3)[0].target == "?"
+
+
+def test_torn_final_line_is_truncated_and_appends_stay_readable(tmp_path):
+    journal = AuditJournal(str(tmp_path))
+    fill(journal)
+    journal.close()
+    segment = tmp_path / "000001.log"
+    intact = segment.stat().st_size
+    with open(segment, "ab") as f:
+        f.write(b'[1700000000,1,10,"disa')  # Crash mid-write
+
+    reopened = AuditJournal(str(tmp_path))
+    assert segment.stat().st_size == intact
+    assert len(reopened.locations) == 4
+    reopened.record(1, 10, "disable_function", "time")
+    assert reopened.query(action="disable_function")[0].target == "time"
+    assert len(AuditJournal(str(tmp_path)).locations) == 5
+
+
+def test_malformed_complete_line_is_skipped(tmp_path):
+    (tmp_path / "000001.log").write_bytes(b'not json\n[1700000000,1,10,"rename","a","b"]\n')
+    journal = AuditJournal(str(tmp_path))
+    assert [r.target for r in journal.query()] == ["a"]
@@ -0,0 +1,87 @@
+import asyncio
+import json
+
+from utils.cluster import ClusterClient, split_shards, worker_path
+
+
+class FakeSupervisor:
+    """Accepts worker connections and lets the test drive what each one receives."""
+
+    def __init__(self):
+        self.connections = asyncio.Queue()
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.on_connection, '127.0.0.1', 0)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def on_connection(self, reader, writer):
+        hello = json.loads(await reader.readline())
+        await self.connections.put((hello, reader, writer))
+
+
+def test_client_skips_bad_lines_and_reconnects():
+    received = []
+
+    async def scenario():
+        supervisor = FakeSupervisor()
+        port = await supervisor.start()
+        client = ClusterClient(3, port, "secret")
+
+        @client.handler("registry_changed")
+        async def on_change(data):
+            received.append(data)
+
+        await client.connect()
+        hello, _, writer = await supervisor.connections.get()
+        writer.write(b'not json\n{"op": "broadcast"}\n')
+        writer.write(json.dumps({"op": "broadcast", "name": "registry_changed", "data": {"n": 1}}).encode() + b'\n')
+        await writer.drain()
+        await asyncio.sleep(0.1)
+
+        writer.close()
+        # Lost connection: broadcasts are dropped, not raised.
+        await asyncio.sleep(0.05)
+        await client.broadcast("registry_changed")
+
+        _, _, writer = await asyncio.wait_for(supervisor.connections.get(), 5)
+        writer.write(json.dumps({"op": "broadcast", "name": "registry_changed", "data": {"n": 2}}).encode() + b'\n')
+        await writer.drain()
+        await asyncio.sleep(0.1)
+        connected = client.connected
+        await client.close()
+        supervisor.server.close()
+        return hello, connected
+
+    hello, connected = asyncio.run(scenario())
+    assert hello == {"op": "hello", "cluster_id": 3, "token": "secret"}
+    assert received == [{"n": 1}, {"n": 2}]
+    assert connected
+
+
+def test_requests_are_answered_locally_while_disconnected():
+    async def scenario():
+        supervisor = FakeSupervisor()
+        port = await supervisor.start()
+        client = ClusterClient(1, port, "secret")
+
+        @client.handler("stats")
+        async def stats(data):
+            return {"guilds": 4}
+
+        await client.connect()
+        _, _, writer = await supervisor.connections.get()
+        pending = asyncio.ensure_future(client.request("stats"))
+        await asyncio.sleep(0.05)
+        writer.close()
+        result = await asyncio.wait_for(pending, 5)
+        await client.close()
+        supervisor.server.close()
+        return result
+
+    assert asyncio.run(scenario()) == {"1": {"guilds": 4}}
+
+
+def test_shard_ranges_and_worker_paths():
+    assert split_shards(5, 2) == [[0, 1, 2], [3, 4]]
+    assert split_shards(2, 4) == [[0], [1]]
+    assert worker_path("recordings/gateway.jsonl.gz", 2) == "recordings/gateway-2.jsonl.gz"
@@ -0,0 +1,63 @@
+import asyncio
+
+import discord
+from discord.ext import commands
+
+from utils.command_sync import app_command_payload, sync_app_commands
+
+
+class FakeHTTP:
+    def __init__(self):
+        self.synced = []
+
+    async def bulk_upsert_global_commands(self, application_id, payload):
+        self.synced.append([command['name'] for command in payload])
+        return payload
+
+
+def make_bot():
+    bot = commands.Bot(command_prefix='!', help_command=None, intents=discord.Intents.none())
+    bot._connection.application_id = 1
+    bot.http = FakeHTTP()
+
+    @bot.hybrid_command()
+    async def ping(ctx):
+        """Pong."""
+
+    return bot
+
+
+def test_unloaded_extensions_are_part_of_the_synced_tree():
+    bot = make_bot()
+    names = [command['name'] for command in app_command_payload(bot, ['cogs.role_manager'])]
+    assert 'ping' in names
+    assert {'role_manager', 'assign_role', 'view_roles'} <= set(names)
+    assert 'cogs.role_manager' not in bot.extensions
+
+
+def test_payload_does_not_depend_on_what_is_loaded():
+    async def scenario():
+        bot = make_bot()
+        before = app_command_payload(bot, ['cogs.role_manager'])
+        await bot.load_extension('cogs.role_manager')
+        return before, app_command_payload(bot, ['cogs.role_manager'])
+
+    before, after = asyncio.run(scenario())
+    assert before == after
+
+
+def test_unchanged_tree_is_not_synced_again(tmp_path):
+    path = str(tmp_path / "app_commands.sha256")
+
+    async def scenario():
+        bot = make_bot()
+        first = await sync_app_commands(bot, ['cogs.role_manager'], path=path)
+        second = await sync_app_commands(bot, ['cogs.role_manager'], path=path)
+        # Leaving a cog out is a different tree, which is why callers pass every available cog.
+        third = await sync_app_commands(bot, [], path=path)
+        return bot.http.synced, (first, second, third)
+
+    synced, results = asyncio.run(scenario())
+    assert results == (True, False, True)
+    assert 'assign_role' in synced[0]
+    assert 'assign_role' not in synced[1]
@@ -0,0 +1,141 @@
+import asyncio
+import json
+import types
+
+import pytest
+
+from utils.deadlines import DeadlineTracker
+from utils.registry import CommandRegistry
+
+
+def tracker(tmp_path, deadline=None, default=5):
+    data = {"cogs": {}, "bot_commands": {}, "bot_settings": {}}
+    if deadline is not None:
+        data["bot_settings"]["deadline"] = deadline
+    path = tmp_path / "functions.json"
+    path.write_text(json.dumps(data))
+    return DeadlineTracker(CommandRegistry(str(path)), default=default)
+
+
+def context(name="slow"):
+    return types.SimpleNamespace(guild=None, command=types.SimpleNamespace(cog=None, qualified_name=name))
+
+
+async def invoke(deadlines, ctx, work):
+    """Run `work` the way discord.py runs a command: CancelledError is swallowed, after_invoke still runs."""
+    deadlines.start(ctx)
+    try:
+        await work()
+    except asyncio.CancelledError:
+        pass
+    invocation = deadlines.finish(ctx)
+    return invocation, asyncio.current_task().cancelling()
+
+
+def test_deadline_comes_from_the_registry(tmp_path):
+    deadlines = tracker(tmp_path, {"default": 60, "commands": {"install_deps": 900, "forever": None}})
+    assert deadlines.deadline_for(context("install_deps").command) == 900
+    assert deadlines.deadline_for(context("ping").command) == 60
+    assert deadlines.deadline_for(context("forever").command) is None
+
+    (tmp_path / "unset").mkdir()
+    assert tracker(tmp_path / "unset", default=7).deadline_for(context().command) == 7
+
+
+def test_interactive_commands_outlast_their_wait_for_chains(tmp_path):
+    path = tmp_path / "functions.json"
+    path.write_text(open("functions.json").read())
+    deadlines = DeadlineTracker(CommandRegistry(str(path)))
+
+    def command(name, module=None):
+        cog = type("Cog", (), {"__module__": module})() if module else None
+        return types.SimpleNamespace(cog=cog, qualified_name=name)
+
+    # Longest chain of 300s replies: action, name, level, eight permissions, confirmation.
+    assert deadlines.deadline_for(command("role_manager", "cogs.role_manager")) > 12 * 300
+    # Prompt, description, confirmation and a corrected description, then the AI request.
+    assert deadlines.deadline_for(command("function_generator", "cogs.function_generator")) > 5 * 300
+    assert deadlines.deadline_for(command("add_function")) > 300
+    assert deadlines.deadline_for(command("change_prefix")) > 60
+    assert deadlines.deadline_for(command("ping", "cogs.general")) == 300
+
+
+def test_expired_invocation_is_cancelled_and_uncancelled(tmp_path):
+    deadlines = tracker(tmp_path, {"commands": {"slow": 0.01}})
+
+    async def scenario():
+        return await invoke(deadlines, context(), lambda: asyncio.sleep(5))
+
+    invocation, cancelling = asyncio.run(scenario())
+    assert invocation.stopped == "deadline"
+    # The swallowed cancel must not leave the task marked as cancelling for its next await.
+    assert cancelling == 0
+    assert deadlines.expired == 1 and deadlines.running == {}
+
+
+def test_admin_cancel_stops_a_running_invocation(tmp_path):
+    deadlines = tracker(tmp_path)
+
+    async def scenario():
+        ctx = context()
+        task = asyncio.create_task(invoke(deadlines, ctx, lambda: asyncio.sleep(5)))
+        await asyncio.sleep(0)
+        (invocation_id,) = deadlines.running
+        assert deadlines.cancel(invocation_id) is not None
+        assert deadlines.cancel(invocation_id) is None  # Already stopping
+        return await task
+
+    invocation, cancelling = asyncio.run(scenario())
+    assert invocation.stopped == "cancelled" and cancelling == 0
+    assert deadlines.cancelled == 1
+
+
+def test_cleanups_run_once_however_the_invocation_ends(tmp_path):
+    deadlines = tracker(tmp_path)
+    calls = []
+
+    async def scenario():
+        ctx = context()
+
+        async def work():
+            deadlines.add_cleanup(ctx, calls.append, "sync")
+
+            async def release():
+                calls.append("async")
+            deadlines.add_cleanup(ctx, release)
+
+        await invoke(deadlines, ctx, work)
+        assert deadlines.finish(ctx) is None  # Second finish is a no-op
+        await asyncio.sleep(0)
+
+    asyncio.run(scenario())
+    assert calls == ["sync", "async"]
+
+
+def test_task_killed_before_after_invoke_still_runs_cleanups(tmp_path):
+    deadlines = tracker(tmp_path)
+    calls = []
+
+    async def scenario():
+        ctx = context()
+
+        async def command():
+            deadlines.start(ctx)
+            deadlines.add_cleanup(ctx, calls.append, "released")
+            await asyncio.sleep(5)
+
+        task = asyncio.create_task(command())
+        await asyncio.sleep(0)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        await asyncio.sleep(0)
+
+    asyncio.run(scenario())
+    assert calls == ["released"]
+    assert deadlines.running == {}
+
+
+def test_cleanup_without_an_invocation_is_an_error(tmp_path):
+    with pytest.raises(RuntimeError):
+        tracker(tmp_path).add_cleanup(context(), print)
@@ -0,0 +1,79 @@
+import asyncio
+import concurrent.futures
+import os
+import sys
+import time
+
+import pytest
+
+from utils.executor import ExecutorBusy, ExecutorService
+
+
+def main_module():
+    return sys.modules['__main__'].__name__, os.getpid()
+
+
+def crash():
+    os._exit(1)
+
+
+def test_cpu_work_runs_in_forked_workers():
+    async def scenario():
+        service = ExecutorService(processes=1)
+        service.start()
+        try:
+            return await service.run_cpu(main_module, owner='time')
+        finally:
+            service.shutdown()
+
+    name, pid = asyncio.run(scenario())
+    # A spawned worker would have re-imported the main module as __mp_main__.
+    assert name == '__main__'
+    assert pid != os.getpid()
+
+
+def test_timed_out_cpu_task_replaces_the_pool():
+    async def scenario():
+        service = ExecutorService(processes=1)
+        pool = service.process_pool
+        with pytest.raises(asyncio.TimeoutError):
+            await service.run_cpu(time.sleep, 5, timeout=0.2)
+        replaced = service.process_pool
+        result = await service.run_cpu(abs, -3)
+        service.shutdown()
+        return pool, replaced, result, service.stats['processes'].timed_out
+
+    pool, replaced, result, timed_out = asyncio.run(scenario())
+    assert replaced is not pool
+    assert result == 3
+    assert timed_out == 1
+
+
+def test_broken_pool_is_replaced():
+    async def scenario():
+        service = ExecutorService(processes=1)
+        pool = service.process_pool
+        with pytest.raises(concurrent.futures.BrokenExecutor):
+            await service.run_cpu(crash)
+        result = await service.run_cpu(abs, -4)
+        service.shutdown()
+        return pool, service.process_pool, result
+
+    pool, replaced, result = asyncio.run(scenario())
+    assert replaced is not pool
+    assert result == 4
+
+
+def test_quota_counts_tasks_until_they_finish():
+    async def scenario():
+        service = ExecutorService(quota=1)
+        running = asyncio.ensure_future(service.run_blocking(time.sleep, 0.2, owner='time'))
+        await asyncio.sleep(0.05)
+        with pytest.raises(ExecutorBusy):
+            await service.run_blocking(abs, -1, owner='time')
+        other = await service.run_blocking(abs, -2, owner='general')
+        await running
+        service.shutdown()
+        return other, service.stats['threads'].rejected
+
+    assert asyncio.run(scenario()) == (2, 1)
@@ -0,0 +1,36 @@
+import json
+import types
+
+from utils.guild_config import GuildConfigCache, PrefixResolver
+
+
+def message(guild_id):
+    return types.SimpleNamespace(guild=types.SimpleNamespace(id=guild_id) if guild_id else None)
+
+
+BOT = types.SimpleNamespace(user=types.SimpleNamespace(id=42))
+
+
+def test_guild_prefix_read_from_config_once(tmp_path):
+    (tmp_path / "1.json").write_text(json.dumps({"cogs": [], "prefix": "?"}))
+    resolver = PrefixResolver(GuildConfigCache(config_dir=str(tmp_path)), "!")
+    assert resolver(BOT, message(1)) == ['<@42> ', '<@!42> ', '?']
+    # Later changes on disk aren't seen until the guild is invalidated.
+    (tmp_path / "1.json").write_text(json.dumps({"cogs": [], "prefix": "$"}))
+    assert resolver.get(1) == "?"
+    resolver.invalidate(1)
+    resolver.guild_configs.invalidate(1)
+    assert resolver.get(1) == "$"
+
+
+def test_default_prefix_for_dms_and_unconfigured_guilds(tmp_path):
+    resolver = PrefixResolver(GuildConfigCache(config_dir=str(tmp_path)), "!")
+    assert resolver(BOT, message(None))[-1] == "!"
+    assert resolver.get(2) == "!"
+
+
+def test_set_prefix_persists_to_the_guild_config(tmp_path):
+    resolver = PrefixResolver(GuildConfigCache(config_dir=str(tmp_path)), "!")
+    resolver.set(3, ">>")
+    assert resolver.get(3) == ">>"
+    assert json.loads((tmp_path / "3.json").read_text())["prefix"] == ">>"
@@ -0,0 +1,94 @@
+import asyncio
+
+import pytest
+
+from utils.jobs import JobLimitReached, JobManager
+
+
+async def finished(job):
+    await asyncio.wait_for(asyncio.shield(job.task), 10)
+    return job
+
+
+def test_job_output_is_kept_on_disk_and_reported(tmp_path):
+    reported = []
+
+    async def scenario():
+        manager = JobManager(str(tmp_path), notify=reported.append)
+        job = await finished(manager.start("echo hello; echo oops >&2; exit 3", owner_id=1))
+        return manager, job
+
+    manager, job = asyncio.run(scenario())
+    assert (job.status, job.returncode) == ("failed", 3)
+    assert manager.output(job) == b"hello\noops\n"
+    assert manager.tail(job, limit=5) == "oops\n"
+    assert reported == [job]
+
+
+def test_running_jobs_are_capped(tmp_path):
+    async def scenario():
+        manager = JobManager(str(tmp_path), max_running=1)
+        job = manager.start("sleep 5", owner_id=1)
+        with pytest.raises(JobLimitReached):
+            manager.start("true", owner_id=1)
+        manager.kill(job.id)
+        await asyncio.gather(job.task, return_exceptions=True)
+
+    asyncio.run(scenario())
+
+
+def test_kill_stops_the_whole_process_group(tmp_path):
+    async def scenario():
+        manager = JobManager(str(tmp_path))
+        # The shell's child would outlive a plain kill of the shell.
+        job = manager.start("sleep 30 & echo started; wait", owner_id=1)
+        while b"started" not in manager.output(job):
+            await asyncio.sleep(0.01)
+        assert manager.kill(job.id) is job
+        await asyncio.gather(job.task, return_exceptions=True)
+        assert manager.kill(job.id) is None
+        return job
+
+    job = asyncio.run(scenario())
+    assert job.status == "killed" and not job.running
+    assert job.returncode is not None
+
+
+def test_timeout_terminates_the_job(tmp_path):
+    async def scenario():
+        manager = JobManager(str(tmp_path), timeout=0.2)
+        return await finished(manager.start("sleep 30", owner_id=1))
+
+    job = asyncio.run(scenario())
+    assert job.status == "timed out"
+
+
+def test_output_is_bounded_to_the_most_recent_bytes(tmp_path):
+    async def scenario():
+        manager = JobManager(str(tmp_path), max_bytes=4096)
+        return manager, await finished(manager.start("seq 1 5000", owner_id=1))
+
+    manager, job = asyncio.run(scenario())
+    output = manager.output(job)
+    assert len(output) <= 4096
+    assert output.endswith(b"4999\n5000\n")
+    assert job.written == len("\n".join(map(str, range(1, 5001)))) + 1
+    assert job.dropped > 0
+
+
+def test_only_the_last_finished_jobs_are_kept(tmp_path):
+    async def scenario():
+        manager = JobManager(str(tmp_path), keep=2)
+        jobs = []
+        for _ in range(4):
+            jobs.append(await finished(manager.start("echo x", owner_id=1)))
+        manager.start("true", owner_id=1)  # Pruning happens as jobs start
+        await asyncio.sleep(0.5)
+        return manager, jobs
+
+    manager, jobs = asyncio.run(scenario())
+    assert manager.get(jobs[0].id) is None and manager.get(jobs[1].id) is None
+    assert not (tmp_path / f"{jobs[0].id}.log").exists()
+    assert manager.get(jobs[3].id) is jobs[3]
+    # A new manager continues numbering after the files left on disk.
+    assert JobManager(str(tmp_path)).next_id == 6
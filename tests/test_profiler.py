@@ -0,0 +1,56 @@
+import asyncio
+import importlib
+import sys
+
+from utils.profiler import StartupProfiler, _ImportTimer
+
+
+def write_module(directory, name, body=""):
+    (directory / f"{name}.py").write_text(body)
+
+
+def test_nested_captures_share_one_hook_and_restore_loaders(tmp_path, monkeypatch):
+    write_module(tmp_path, "profiled_inner")
+    write_module(tmp_path, "profiled_outer", "import profiled_inner\n")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    profiler = StartupProfiler()
+
+    with profiler.capture("outer"):
+        importlib.import_module("profiled_outer")
+        with profiler.capture("inner"):
+            assert sum(isinstance(finder, _ImportTimer) for finder in sys.meta_path) == 1
+            write_module(tmp_path, "profiled_late")
+            importlib.import_module("profiled_late")
+    assert not any(isinstance(finder, _ImportTimer) for finder in sys.meta_path)
+
+    outer = [record[0] for record in profiler.extensions["outer"]["imports"]]
+    inner = [record[0] for record in profiler.extensions["inner"]["imports"]]
+    assert outer == ["profiled_inner", "profiled_outer", "profiled_late"]
+    assert inner == ["profiled_late"]
+    module = sys.modules["profiled_outer"]
+    assert module.__loader__ is module.__spec__.loader
+    assert type(module.__loader__).__name__ == "SourceFileLoader"
+    for name in ("profiled_inner", "profiled_outer", "profiled_late"):
+        sys.modules.pop(name)
+
+
+def test_instrument_wraps_load_extension_once():
+    loads = []
+
+    async def load_extension(name, *, package=None):
+        loads.append(name)
+
+    class FakeBot:
+        pass
+
+    bot = FakeBot()
+    bot.load_extension = load_extension
+    profiler = StartupProfiler()
+    profiler.instrument(bot)
+    wrapped = bot.load_extension
+    profiler.instrument(bot)
+    assert bot.load_extension is wrapped
+
+    asyncio.run(bot.load_extension("cogs.example"))
+    assert loads == ["cogs.example"]
+    assert list(profiler.extensions) == ["cogs.example"]
@@ -0,0 +1,81 @@
+import json
+import types
+
+import pytest
+
+from utils.ratelimit import RateLimited, RateLimiter, TokenBucket
+from utils.registry import CommandRegistry
+
+
+def registry(tmp_path, data=None):
+    path = tmp_path / "functions.json"
+    path.write_text(json.dumps(data or {"cogs": {}, "bot_commands": {}}))
+    return CommandRegistry(str(path))
+
+
+def context(user_id, guild_id=1, name="ping"):
+    command = types.SimpleNamespace(cog=None, qualified_name=name)
+    return types.SimpleNamespace(author=types.SimpleNamespace(id=user_id),
+                                 guild=types.SimpleNamespace(id=guild_id) if guild_id else None,
+                                 command=command)
+
+
+def test_token_bucket_refills_at_its_rate():
+    bucket = TokenBucket(2, 10.0, now=0.0)
+    bucket.tokens -= 2
+    assert bucket.retry_after() == pytest.approx(5.0)
+    bucket.refill(5.0)
+    assert bucket.tokens == pytest.approx(1.0)
+    assert bucket.retry_after() == 0.0
+    bucket.refill(100.0)
+    assert bucket.tokens == 2.0
+
+
+def test_token_bucket_idle_once_it_would_be_full():
+    bucket = TokenBucket(2, 10.0, now=0.0)
+    bucket.tokens = 0.0
+    assert not bucket.idle(9.0)
+    assert bucket.idle(10.0)
+
+
+def test_user_limit_rejects_without_consuming_other_buckets(tmp_path):
+    limiter = RateLimiter(registry(tmp_path), {"user": (2, 60.0), "guild": (10, 60.0)})
+    ctx = context(user_id=7)
+    assert limiter.check(ctx) and limiter.check(ctx)
+    guild_tokens = limiter.buckets[("guild", 1, "ping")].tokens
+    with pytest.raises(RateLimited) as error:
+        limiter.check(ctx)
+    assert error.value.scope == "user"
+    assert limiter.rejected == 1
+    assert limiter.buckets[("guild", 1, "ping")].tokens == pytest.approx(guild_tokens, abs=1e-3)
+
+
+def test_null_limit_disables_a_scope(tmp_path):
+    limiter = RateLimiter(registry(tmp_path, {"cogs": {}, "bot_commands": {}, "bot_settings": {"rate_limit": {"user": None}}}),
+                          {"user": (1, 60.0), "guild": (100, 60.0)})
+    ctx = context(user_id=7)
+    for _ in range(5):
+        limiter.check(ctx)
+    assert ("user", 7, "ping") not in limiter.buckets
+
+
+def test_buckets_are_capped_lru_first(tmp_path):
+    limiter = RateLimiter(registry(tmp_path), {"user": (1, 3600.0), "guild": None}, max_buckets=3)
+    for user_id in (1, 2, 3):
+        limiter.check(context(user_id, guild_id=None))
+    # Touching user 1 makes user 2 the least recently used bucket.
+    with pytest.raises(RateLimited):
+        limiter.check(context(1, guild_id=None))
+    limiter.check(context(4, guild_id=None))
+    assert list(limiter.buckets) == [("user", 3, "ping"), ("user", 1, "ping"), ("user", 4, "ping")]
+
+
+def test_idle_buckets_are_dropped_as_new_ones_arrive(tmp_path):
+    limiter = RateLimiter(registry(tmp_path), {"user": (5, 0.001), "guild": None}, max_buckets=100)
+    limiter.check(context(1, guild_id=None))
+    limiter.check(context(2, guild_id=None))
+    # Both earlier buckets refilled long ago, so creating a third drops them.
+    for bucket in limiter.buckets.values():
+        bucket.updated -= 10
+    limiter.check(context(3, guild_id=None))
+    assert list(limiter.buckets) == [("user", 3, "ping")]
@@ -0,0 +1,84 @@
+import json
+
+import pytest
+
+from utils.registry import CommandRegistry
+
+
+@pytest.fixture
+def path(tmp_path):
+    path = tmp_path / "functions.json"
+    path.write_text(json.dumps({
+        "cogs": {"time": {"commands": {"time": "Shows the time."}, "rate_limit": {"user": [2, 10]}}},
+        "bot_commands": {"update": "Restarts the bot (admin)."},
+        "bot_settings": {"deadline": 300},
+    }))
+    return path
+
+
+def saved(path):
+    return json.loads(path.read_text())
+
+
+def test_rename_survives_the_cog_registering_again(path):
+    registry = CommandRegistry(str(path))
+    assert registry.rename("time", "clock") == "time"
+    registry.register_cog("time", {"time": "Shows the time.", "remind": "Reminds you."})
+    registry.flush()
+    data = saved(path)
+    assert data["cogs"]["time"]["commands"] == {"clock": "Shows the time.", "remind": "Reminds you."}
+    assert data["cogs"]["time"]["renamed"] == {"time": "clock"}
+    # Settings stored next to the commands are left alone.
+    assert data["cogs"]["time"]["rate_limit"] == {"user": [2, 10]}
+    assert data["bot_settings"] == {"deadline": 300}
+
+
+def test_renaming_twice_maps_the_original_name(path):
+    registry = CommandRegistry(str(path))
+    registry.rename("update", "restart")
+    registry.rename("restart", "reboot")
+    registry.register_bot_commands({"update": "Restarts the bot (admin)."})
+    assert registry.find("reboot") == ("bot", None)
+    assert registry.find("update") is None and registry.find("restart") is None
+    assert registry.data["bot_renames"] == {"update": "reboot"}
+
+
+def test_unknown_command_cannot_be_renamed(path):
+    with pytest.raises(KeyError):
+        CommandRegistry(str(path)).rename("nope", "other")
+
+
+def test_flush_only_writes_when_something_changed(path):
+    registry = CommandRegistry(str(path))
+    before = path.stat().st_mtime_ns
+    registry.flush()
+    registry.register_cog("time", {"time": "Shows the time."})
+    registry.flush()
+    assert path.stat().st_mtime_ns == before
+
+
+def test_workers_merge_instead_of_overwriting_each_other(path):
+    first, second = CommandRegistry(str(path)), CommandRegistry(str(path))
+    first.register_cog("time", {"time": "Shows the time."})
+    second.register_cog("role_manager", {"view_roles": "Views your roles."})
+    first.rename("time", "clock")
+    first.flush()
+    # The second worker's snapshot predates the rename; its flush must not undo it.
+    second.flush()
+    data = saved(path)
+    assert data["cogs"]["time"]["commands"] == {"clock": "Shows the time."}
+    assert data["cogs"]["role_manager"]["commands"] == {"view_roles": "Views your roles."}
+
+    # After reloading, the other worker sees the rename and applies it to its own registrations.
+    second.load()
+    assert second.find("clock") == ("cog", "time")
+    second.register_cog("time", {"time": "Shows the time now."})
+    second.flush()
+    assert saved(path)["cogs"]["time"]["commands"] == {"clock": "Shows the time now."}
+
+
+def test_missing_or_invalid_file_starts_empty(tmp_path):
+    assert CommandRegistry(str(tmp_path / "missing.json")).all_commands() == set()
+    broken = tmp_path / "broken.json"
+    broken.write_text("{")
+    assert CommandRegistry(str(broken)).available_cogs() == set()
@@ -0,0 +1,188 @@
+import asyncio
+import sqlite3
+import time
+import types
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+import cogs.time as time_cog
+from utils.reminders import ReminderScheduler, ReminderStore
+
+
+def run(scheduler, seconds):
+    async def scenario():
+        scheduler.start()
+        await asyncio.sleep(seconds)
+        scheduler.stop()
+    asyncio.run(scenario())
+
+
+def pending(store):
+    return [row[0] for row in store.db.execute('SELECT message FROM reminders ORDER BY id')]
+
+
+def test_due_reminders_are_delivered_in_one_batch_and_deleted():
+    store = ReminderStore(':memory:')
+    batches = []
+
+    async def deliver(batch):
+        batches.append([r.message for r in batch])
+
+    scheduler = ReminderScheduler(store, deliver)
+    now = time.time()
+    for message in ("a", "b", "c"):
+        scheduler.add(now + 0.05, 1, None, None, message)
+    scheduler.add(now + 3600, 1, None, None, "later")
+    run(scheduler, 0.3)
+    assert batches == [["a", "b", "c"]]
+    assert pending(store) == ["later"]
+    assert scheduler.delivered == 3
+
+
+def test_failed_reminders_are_kept_and_retried():
+    store = ReminderStore(':memory:')
+    attempts = []
+
+    async def deliver(batch):
+        attempts.append([r.message for r in batch])
+        return [r for r in batch if r.message == "flaky" and len(attempts) == 1]
+
+    scheduler = ReminderScheduler(store, deliver, retry_delay=0.1)
+    now = time.time()
+    scheduler.add(now, 1, None, None, "ok")
+    scheduler.add(now, 1, None, None, "flaky")
+    run(scheduler, 0.5)
+    assert attempts == [["ok", "flaky"], ["flaky"]]
+    assert pending(store) == []
+    assert (scheduler.delivered, scheduler.retried) == (2, 1)
+
+
+def test_whole_batch_is_retried_when_deliver_raises():
+    store = ReminderStore(':memory:')
+    attempts = []
+
+    async def deliver(batch):
+        attempts.append(len(batch))
+        if len(attempts) == 1:
+            raise ConnectionError("gateway down")
+
+    scheduler = ReminderScheduler(store, deliver, retry_delay=0.1)
+    now = time.time()
+    scheduler.add(now, 1, None, None, "a")
+    scheduler.add(now, 1, None, None, "b")
+    run(scheduler, 0.5)
+    assert attempts == [2, 2]
+    assert pending(store) == []
+
+
+def test_reminders_are_dropped_after_max_attempts():
+    store = ReminderStore(':memory:')
+    attempts = []
+
+    async def deliver(batch):
+        attempts.append(batch[0].attempts)
+        return batch
+
+    scheduler = ReminderScheduler(store, deliver, retry_delay=0.05, max_attempts=3)
+    scheduler.add(time.time(), 1, None, None, "never")
+    run(scheduler, 0.5)
+    assert attempts == [0, 1, 2]
+    assert pending(store) == []
+    assert (scheduler.retried, scheduler.dropped) == (2, 1)
+
+
+def test_attempts_survive_a_reload_from_the_store(tmp_path):
+    path = str(tmp_path / "reminders.db")
+    store = ReminderStore(path)
+    reminder = store.add(time.time(), 1, None, None, "flaky")
+    reminder.attempts = 2
+    store.reschedule_many([reminder])
+    store.close()
+    assert ReminderStore(path).window(0, time.time() + 1)[0].attempts == 2
+
+
+def test_old_databases_get_an_attempts_column(tmp_path):
+    path = str(tmp_path / "reminders.db")
+    db = sqlite3.connect(path)
+    db.execute("CREATE TABLE reminders (id INTEGER PRIMARY KEY, due REAL NOT NULL, user_id INTEGER NOT NULL, "
+               "guild_id INTEGER, channel_id INTEGER, message TEXT NOT NULL, mention INTEGER NOT NULL DEFAULT 1)")
+    db.execute("INSERT INTO reminders (due, user_id, message) VALUES (1, 1, 'old')")
+    db.commit()
+    db.close()
+    assert ReminderStore(path).window(0, 2)[0].attempts == 0
+
+
+def test_store_errors_do_not_stop_the_scheduler():
+    store = ReminderStore(':memory:')
+    delivered = []
+    failures = []
+    window = store.window
+
+    def flaky_window(after, until):
+        if not failures:
+            failures.append(after)
+            raise sqlite3.OperationalError("database is locked")
+        return window(after, until)
+
+    async def deliver(batch):
+        delivered.extend(r.message for r in batch)
+
+    store.window = flaky_window
+    scheduler = ReminderScheduler(store, deliver, error_delay=0.05)
+    store.add(time.time(), 1, None, None, "late but delivered")
+    run(scheduler, 0.3)
+    assert failures
+    assert delivered == ["late but delivered"]
+
+
+def test_cancelled_and_unowned_reminders_are_not_delivered():
+    store = ReminderStore(':memory:')
+    delivered = []
+
+    async def deliver(batch):
+        delivered.extend(r.message for r in batch)
+
+    scheduler = ReminderScheduler(store, deliver, owns=lambda reminder: reminder.guild_id != 2)
+    now = time.time()
+    scheduler.add(now + 0.05, 1, 1, 10, "mine")
+    scheduler.add(now + 0.05, 1, 2, 20, "other shard")
+    cancelled = scheduler.add(now + 0.05, 1, 1, 10, "cancelled")
+    assert not scheduler.cancel(cancelled.id, user_id=99)  # Someone else's reminder
+    assert scheduler.cancel(cancelled.id, user_id=1)
+    run(scheduler, 0.3)
+    assert delivered == ["mine"]
+    # Another worker delivers the other shard's reminder, so it stays in the store.
+    assert pending(store) == ["other shard"]
+
+
+def test_reminders_beyond_the_window_are_loaded_as_it_advances():
+    store = ReminderStore(':memory:')
+    delivered = []
+
+    async def deliver(batch):
+        delivered.extend(r.message for r in batch)
+
+    scheduler = ReminderScheduler(store, deliver, window=0.2)
+    scheduler.add(time.time() + 0.3, 1, None, None, "far")
+    assert scheduler.heap == []  # Not loaded until the window reaches it
+    run(scheduler, 0.6)
+    assert delivered == ["far"]
+
+
+def test_due_time_for_now_and_clock_times_across_dst(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    cog = time_cog.Time(types.SimpleNamespace(reminders=None))
+    chicago = ZoneInfo("America/Chicago")
+    monkeypatch.setattr(cog, "zones_for", lambda ctx: (("Chicago", "America/Chicago"),))
+    # 18:00 on the day before US daylight saving time ends.
+    now = datetime(2026, 10, 31, 18, 0, tzinfo=chicago).timestamp()
+    monkeypatch.setattr(time_cog.time, "time", lambda: now)
+    monkeypatch.setattr(time_cog, "datetime", type("frozen", (datetime,), {"now": staticmethod(
+        lambda tz=None: datetime.fromtimestamp(now, tz))}))
+
+    assert cog.due_time(None, "now") == now
+    assert cog.due_time(None, "10m") == now + 600
+    # 17:00 has passed, so it means 17:00 tomorrow: 23 wall-clock hours, but 24 real ones as clocks go back.
+    assert cog.due_time(None, "17:00") == datetime(2026, 11, 1, 17, 0, tzinfo=chicago).timestamp()
+    assert cog.due_time(None, "17:00") - now == 24 * 3600
+    assert cog.due_time(None, "nonsense") is None
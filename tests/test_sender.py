@@ -0,0 +1,141 @@
+import asyncio
+import time
+import types
+
+import discord
+from discord.ext import commands
+
+from utils.sender import BULK, OutboundScheduler, destination_key
+
+
+class FakeMessage:
+    def __init__(self, channel, content):
+        self.channel = channel
+        self.content = content
+
+
+class FakeChannel:
+    def __init__(self, id, log):
+        self.id = id
+        self.log = log
+
+    async def send(self, content=None, **kwargs):
+        self.log.append((self.id, content))
+        return FakeMessage(self, content)
+
+
+class FakeDM(discord.DMChannel):
+    def __init__(self, id, recipient, log):
+        self.id = id
+        self.recipients = [recipient]
+        self.log = log
+
+    async def send(self, content=None, **kwargs):
+        self.log.append((self.id, content))
+        return FakeMessage(self, content)
+
+
+class FakeUser(discord.User):
+    def __init__(self, id, log, dm_channel_id):
+        super().__init__(state=None, data={'id': id, 'username': f'user{id}', 'discriminator': '0', 'avatar': None})
+        self.log = log
+        self.known_dm = None
+        self.dm_channel_id = dm_channel_id
+
+    @property
+    def dm_channel(self):
+        return self.known_dm
+
+    async def send(self, content=None, **kwargs):
+        # Like User.send: opens the DM channel on first use.
+        if self.known_dm is None:
+            self.known_dm = FakeDM(self.dm_channel_id, self, self.log)
+        return await self.known_dm.send(content, **kwargs)
+
+
+def context(channel, author_id=1, guild=True):
+    message = types.SimpleNamespace(channel=channel, author=types.SimpleNamespace(id=author_id),
+                                    guild=types.SimpleNamespace(id=5) if guild else None, _state=None)
+    return commands.Context(message=message, bot=None, view=None)
+
+
+def test_replies_from_different_commands_are_not_merged():
+    log = []
+    channel = FakeChannel(10, log)
+
+    async def scenario():
+        sender = OutboundScheduler()
+        first, second = context(channel, 1), context(channel, 2)
+        return await asyncio.gather(sender.send(first, "one"), sender.send(second, "two"),
+                                    sender.send(first, "three", priority=BULK), sender.send(second, "four", priority=BULK))
+
+    messages = asyncio.run(scenario())
+    assert log == [(10, "one"), (10, "two"), (10, "three"), (10, "four")]
+    assert len({id(message) for message in messages}) == 4
+
+
+def test_bulk_output_of_one_command_is_merged():
+    log = []
+    channel = FakeChannel(10, log)
+
+    async def scenario():
+        sender = OutboundScheduler()
+        ctx = context(channel)
+        messages = await asyncio.gather(*(sender.send(ctx, f"part {i}", priority=BULK) for i in range(3)),
+                                        sender.send(ctx, "reply"))
+        return sender, messages
+
+    sender, messages = asyncio.run(scenario())
+    # The interactive reply goes first; the bulk parts follow as one message.
+    assert log == [(10, "reply"), (10, "part 0\npart 1\npart 2")]
+    assert messages[0] is messages[1] is messages[2]
+    assert (sender.sent, sender.merged) == (2, 2)
+
+
+def test_a_user_and_their_dm_channel_share_one_queue():
+    log = []
+    user = FakeUser(7, log, dm_channel_id=70)
+    dm = FakeDM(70, user, log)
+    assert destination_key(user) == destination_key(dm) == destination_key(context(dm, author_id=7, guild=False))
+
+    async def scenario():
+        sender = OutboundScheduler()
+        sender.post(user, "intro")
+        await sender.send(dm, "question")
+        await sender.send(user, "follow-up")
+        return sender
+
+    sender = asyncio.run(scenario())
+    assert log == [(70, "intro"), (70, "question"), (70, "follow-up")]
+    assert sender.dm_keys == {70: ('user', 7)}
+
+
+def test_rate_limit_headers_pace_the_channel():
+    log = []
+    channel = FakeChannel(10, log)
+
+    async def scenario():
+        sender = OutboundScheduler()
+        ctx = context(channel)
+        await sender.send(ctx, "first")
+        sender.observe('POST', '/api/v10/channels/10/messages', 200,
+                       {'X-RateLimit-Limit': '5', 'X-RateLimit-Remaining': '0', 'X-RateLimit-Reset-After': '0.3'})
+        start = time.monotonic()
+        await sender.send(ctx, "second")
+        return time.monotonic() - start
+
+    assert asyncio.run(scenario()) >= 0.25
+    assert log == [(10, "first"), (10, "second")]
+
+
+def test_global_rate_limit_pauses_every_queue():
+    log = []
+
+    async def scenario():
+        sender = OutboundScheduler()
+        sender.observe('POST', '/api/v10/channels/10/messages', 429, {'X-RateLimit-Global': 'true', 'Retry-After': '0.3'})
+        start = time.monotonic()
+        await sender.send(FakeChannel(20, log), "hello")
+        return time.monotonic() - start
+
+    assert asyncio.run(scenario()) >= 0.25
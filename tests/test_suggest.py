@@ -0,0 +1,54 @@
+from utils.suggest import BKTree, edit_distance
+
+
+def build(*words):
+    tree = BKTree()
+    for word in words:
+        tree.add(word)
+    return tree
+
+
+def test_edit_distance_counts_transpositions_once():
+    assert edit_distance("ping", "ping") == 0
+    assert edit_distance("ping", "pnig") == 1
+    assert edit_distance("help", "hepl") == 1
+    assert edit_distance("", "abc") == 3
+
+
+def test_search_finds_words_within_distance():
+    tree = build("ping", "info", "help", "cmd_bank", "remind")
+    assert sorted(tree.search("pong", 1)) == [(1, "ping")]
+    assert tree.search("zzzzzzzz", 2) == []
+
+
+def test_removed_word_is_tombstoned_not_returned():
+    tree = build("ping", "pint", "info", "help", "cmd_bank", "remind")
+    tree.remove("pint")
+    assert "pint" in tree.removed
+    assert [match for _, match in tree.search("pint", 1)] == ["ping"]
+
+
+def test_readding_a_tombstoned_word_revives_it():
+    tree = build("ping", "pint", "info", "help", "cmd_bank", "remind")
+    tree.remove("pint")
+    tree.add("pint")
+    assert "pint" not in tree.removed
+    assert (0, "pint") in tree.search("pint", 0)
+
+
+def test_tree_is_rebuilt_once_half_the_words_are_tombstones():
+    tree = build("ping", "pint", "info", "help")
+    tree.remove("ping")
+    tree.remove("pint")
+    assert tree.removed == {"ping", "pint"}
+    tree.remove("info")
+    # Three of four words removed: rebuilt with only the live word, tombstones gone.
+    assert tree.removed == set()
+    assert tree.words == {"help"}
+    assert tree.search("help", 3) == [(0, "help")]
+
+
+def test_removing_an_unknown_word_is_a_no_op():
+    tree = build("ping")
+    tree.remove("pong")
+    assert tree.removed == set()
@@ -0,0 +1,60 @@
+import types
+
+import pytest
+
+import cogs.time as time_cog
+
+
+@pytest.fixture
+def cog(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # UserZoneStore reads user_time_zones.json from the working directory
+    return time_cog.Time(types.SimpleNamespace(reminders=None))
+
+
+def freeze(monkeypatch, now):
+    monkeypatch.setattr(time_cog.time, "time", lambda: now)
+
+
+def test_same_table_within_a_second_is_rendered_once(cog, monkeypatch):
+    freeze(monkeypatch, 1_700_000_000.2)
+    first = cog.render_times(time_cog.DEFAULT_TIMEZONES)
+    freeze(monkeypatch, 1_700_000_000.9)
+    assert cog.render_times(time_cog.DEFAULT_TIMEZONES) is first
+    assert list(cog._render_cache) == [time_cog.DEFAULT_TIMEZONES]
+
+
+def test_cache_is_dropped_when_the_second_changes(cog, monkeypatch):
+    freeze(monkeypatch, 1_700_000_000.5)
+    cog.render_times((("London", "Europe/London"),))
+    freeze(monkeypatch, 1_700_000_001.0)
+    text = cog.render_times((("Tokyo", "Asia/Tokyo"),))
+    assert list(cog._render_cache) == [(("Tokyo", "Asia/Tokyo"),)]
+    assert text == "Tokyo: 07:13:21 JST on November 15, 2023"
+
+
+def test_zone_objects_are_resolved_once(cog):
+    zone = cog.get_zone("America/Sao_Paulo")
+    assert cog.get_zone("America/Sao_Paulo") is zone
+    assert cog.get_zone("Europe/London") is cog.zones["Europe/London"]
+
+
+def test_user_zones_are_read_from_memory_and_updated_on_write(tmp_path, monkeypatch):
+    path = str(tmp_path / "zones.json")
+    writer, other = time_cog.UserZoneStore(path), time_cog.UserZoneStore(path)
+    writer.set(7, ("Europe/London", "Asia/Tokyo"))
+    assert writer.get(7) == ("Europe/London", "Asia/Tokyo")
+
+    # Reads don't touch the file; another worker learns of the change when told over IPC.
+    def no_disk(*args, **kwargs):
+        raise AssertionError("read the zones file")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(time_cog.os, "stat", no_disk)
+        patch.setattr("builtins.open", no_disk)
+        assert other.get(7) is None
+        other.apply(7, ["Europe/London", "Asia/Tokyo"])
+        assert other.get(7) == ("Europe/London", "Asia/Tokyo")
+
+    other.set(8, ("UTC",))
+    assert other.get(7) == ("Europe/London", "Asia/Tokyo")
+    assert time_cog.UserZoneStore(path).zones == {7: ("Europe/London", "Asia/Tokyo"), 8: ("UTC",)}
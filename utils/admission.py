@@ -0,0 +1,192 @@
+import asyncio
+import collections
+import logging
+import time
+
+from discord.ext import commands
+
+from utils.catalog import cog_key
+
+logger = logging.getLogger(__name__)
+
+PRIORITIES = {"high": 0, "normal": 1, "low": 2}
+
+
+class Overloaded(commands.CommandError):
+    def __init__(self, reason):
+        self.reason = reason
+        super().__init__(f"Overloaded ({reason}).")
+
+
+class _Waiter:
+    __slots__ = ('guild', 'cog', 'priority', 'future', 'enqueued')
+
+    def __init__(self, guild, cog, priority, future, enqueued):
+        self.guild = guild
+        self.cog = cog
+        self.priority = priority
+        self.future = future
+        self.enqueued = enqueued
+
+
+class _Slot:
+    __slots__ = ('guild', 'cog')
+
+    def __init__(self, guild, cog):
+        self.guild = guild
+        self.cog = cog
+
+
+class AdmissionController:
+    """Admission control for command invocations, run from the bot's before/after invoke hooks.
+
+    At most `max_concurrent` invocations run at once, at most `per_guild` per
+    guild, and at most a cog's "max_concurrency" registry setting per cog. When
+    an invocation can't start it waits in its guild's queue; freed slots go to
+    the guild with the lowest start tag (start-time fair queuing, weighted by
+    `weight_for(guild_id)`), so one busy guild can't starve the rest. Under
+    overload, "low" priority commands are shed once `shed_low_at` invocations
+    are queued, everything but "high" once `max_queue` are, and queued
+    invocations give up after `max_wait` seconds. Priorities come from the
+    registry's "priority" setting: a name, or {"default": ..., "commands": {...}}.
+    """
+
+    def __init__(self, registry, weight_for=None, max_concurrent=50, per_guild=8, max_queue=200,
+                 shed_low_at=50, max_wait=30.0):
+        self.registry = registry
+        self.weight_for = weight_for or (lambda guild_id: 1)
+        self.max_concurrent = max_concurrent
+        self.per_guild = per_guild
+        self.max_queue = max_queue
+        self.shed_low_at = shed_low_at
+        self.max_wait = max_wait
+        self.running = 0
+        self.running_by_guild = collections.Counter()
+        self.running_by_cog = collections.Counter()
+        self.queues = {}
+        self.queued = 0
+        self.finish = {}
+        self.clock = 0.0
+        self.admitted = 0
+        self.shed = collections.Counter()
+        self.waits = collections.deque(maxlen=1000)
+
+    def priority_for(self, command):
+        config = self.registry.setting(cog_key(command), "priority", "normal")
+        if isinstance(config, dict):
+            config = config.get("commands", {}).get(command.qualified_name, config.get("default", "normal"))
+        return PRIORITIES.get(config, PRIORITIES["normal"])
+
+    def _can_run(self, guild, cog):
+        if self.running >= self.max_concurrent or self.running_by_guild[guild] >= self.per_guild:
+            return False
+        limit = self.registry.setting(cog, "max_concurrency")
+        return not limit or self.running_by_cog[cog] < limit
+
+    def _start(self, guild, cog, waited):
+        tag = max(self.clock, self.finish.get(guild, 0.0))
+        self.finish[guild] = tag + 1 / max(self.weight_for(guild), 0.01)
+        self.clock = tag
+        self.running += 1
+        self.running_by_guild[guild] += 1
+        self.running_by_cog[cog] += 1
+        self.admitted += 1
+        self.waits.append(waited)
+        return _Slot(guild, cog)
+
+    async def acquire(self, ctx):
+        # Before-invoke hooks run for a group and again for its subcommand; admit once.
+        if getattr(ctx, '_admission', None) is not None:
+            return
+        guild = ctx.guild.id if ctx.guild else None
+        cog = cog_key(ctx.command)
+        if not self.queued and self._can_run(guild, cog):
+            ctx._admission = self._start(guild, cog, 0.0)
+            return
+
+        priority = self.priority_for(ctx.command)
+        if priority == PRIORITIES["low"] and self.queued >= self.shed_low_at:
+            self.shed["low_priority"] += 1
+            raise Overloaded("low_priority")
+        if priority != PRIORITIES["high"] and self.queued >= self.max_queue:
+            self.shed["queue_full"] += 1
+            raise Overloaded("queue_full")
+
+        waiter = _Waiter(guild, cog, priority, asyncio.get_running_loop().create_future(), time.monotonic())
+        self.queues.setdefault(guild, collections.deque()).append(waiter)
+        self.queued += 1
+        self._dispatch()
+        try:
+            timeout = None if priority == PRIORITIES["high"] else self.max_wait
+            slot = await asyncio.wait_for(asyncio.shield(waiter.future), timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # Admitted just as we gave up: hand the slot back.
+                ctx._admission = waiter.future.result()
+                self.release(ctx)
+            else:
+                waiter.future.cancel()
+                self._remove(waiter)
+            if isinstance(e, asyncio.TimeoutError):
+                self.shed["timeout"] += 1
+                raise Overloaded("timeout")
+            raise
+        ctx._admission = slot
+
+    def _remove(self, waiter):
+        queue = self.queues.get(waiter.guild)
+        if queue is not None and waiter in queue:
+            queue.remove(waiter)
+            self.queued -= 1
+            if not queue:
+                del self.queues[waiter.guild]
+
+    def _dispatch(self):
+        """Hand free slots to queued invocations, lowest start tag first."""
+        while self.queued and self.running < self.max_concurrent:
+            best, best_tag = None, None
+            for guild, queue in self.queues.items():
+                if self.running_by_guild[guild] >= self.per_guild:
+                    continue
+                # Within a guild, higher priority first, then arrival order.
+                eligible = [w for w in queue if self._can_run(guild, w.cog)]
+                if not eligible:
+                    continue
+                waiter = min(eligible, key=lambda w: w.priority)
+                tag = max(self.clock, self.finish.get(guild, 0.0))
+                if best_tag is None or tag < best_tag:
+                    best, best_tag = waiter, tag
+            if best is None:
+                return
+            self._remove(best)
+            best.future.set_result(self._start(best.guild, best.cog, time.monotonic() - best.enqueued))
+
+    def release(self, ctx):
+        slot = getattr(ctx, '_admission', None)
+        if slot is None:
+            return
+        ctx._admission = None
+        self.running -= 1
+        self.running_by_guild[slot.guild] -= 1
+        if not self.running_by_guild[slot.guild]:
+            del self.running_by_guild[slot.guild]
+        self.running_by_cog[slot.cog] -= 1
+        if not self.running_by_cog[slot.cog]:
+            del self.running_by_cog[slot.cog]
+        if len(self.finish) > 1000:
+            for guild in [g for g, f in self.finish.items() if f <= self.clock and g not in self.queues]:
+                del self.finish[guild]
+        self._dispatch()
+
+    def summary(self):
+        waits = sorted(self.waits)
+        pick = lambda fraction: round(waits[min(len(waits) - 1, int(len(waits) * fraction))] * 1000, 1) if waits else 0
+        return {
+            "running": self.running,
+            "queued": self.queued,
+            "admitted": self.admitted,
+            "shed": sum(self.shed.values()),
+            "queue_wait_p50_ms": pick(0.50),
+            "queue_wait_p95_ms": pick(0.95),
+            "queue_wait_max_ms": round(waits[-1] * 1000, 1) if waits else 0,
+        }
@@ -0,0 +1,162 @@
+import array
+import json
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+AUDIT_DIR = 'audit'
+SEGMENT_BYTES = 1024 * 1024
+# Segment number and byte offset packed into one integer per record.
+OFFSET_BITS = 40
+
+
+class AuditRecord:
+    __slots__ = ('timestamp', 'guild_id', 'actor_id', 'action', 'target', 'detail')
+
+    def __init__(self, timestamp, guild_id, actor_id, action, target, detail):
+        self.timestamp = timestamp
+        self.guild_id = guild_id
+        self.actor_id = actor_id
+        self.action = action
+        self.target = target
+        self.detail = detail
+
+
+class AuditJournal:
+    """Append-only journal of admin actions, split into numbered segment files.
+
+    Every record has the same schema, stored as a JSON array per line:
+    [timestamp, guild_id, actor_id, action, target, detail] (guild_id 0 for DMs).
+    A new segment starts once the current one reaches `segment_bytes`. Segments
+    are indexed once at startup: only each record's location plus its guild,
+    actor and action are kept in memory, so queries pick matching records
+    without scanning and read just the lines they return.
+    """
+
+    def __init__(self, directory=AUDIT_DIR, segment_bytes=SEGMENT_BYTES):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.segments = []
+        self.locations = array.array('Q')
+        self.guilds = array.array('Q')
+        self.actors = array.array('Q')
+        self.actions = array.array('H')
+        self.action_names = []
+        self.action_codes = {}
+        self.by_guild = {}
+        self.by_actor = {}
+        self.by_action = {}
+        self._file = None
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+
+    def _segment_path(self, number):
+        return os.path.join(self.directory, f'{number:06d}.log')
+
+    def _load(self):
+        start = time.perf_counter()
+        self.segments = sorted(int(name[:-4]) for name in os.listdir(self.directory)
+                               if name.endswith('.log') and name[:-4].isdigit())
+        for index, number in enumerate(self.segments):
+            offset = 0
+            with open(self._segment_path(number), 'rb') as f:
+                for line in f:
+                    if not line.endswith(b'\n'):
+                        # A torn final write from a crash; cut it off so the next append starts a clean line.
+                        logger.warning(f"Truncating partial audit record in segment {number} at byte {offset}")
+                        os.truncate(self._segment_path(number), offset)
+                        break
+                    try:
+                        timestamp, guild_id, actor_id, action, _, _ = json.loads(line)
+                    except ValueError:
+                        logger.warning(f"Skipping malformed audit record in segment {number} at byte {offset}")
+                    else:
+                        self._index(index, offset, guild_id, actor_id, action)
+                    offset += len(line)
+        logger.info(f"Indexed {len(self.locations)} audit records from {len(self.segments)} segments "
+                    f"in {(time.perf_counter() - start) * 1000:.0f}ms")
+
+    def _index(self, segment_index, offset, guild_id, actor_id, action):
+        record_id = len(self.locations)
+        code = self.action_codes.get(action)
+        if code is None:
+            code = self.action_codes[action] = len(self.action_names)
+            self.action_names.append(action)
+        self.locations.append(segment_index << OFFSET_BITS | offset)
+        self.guilds.append(guild_id)
+        self.actors.append(actor_id)
+        self.actions.append(code)
+        self.by_guild.setdefault(guild_id, array.array('I')).append(record_id)
+        self.by_actor.setdefault(actor_id, array.array('I')).append(record_id)
+        self.by_action.setdefault(code, array.array('I')).append(record_id)
+
+    def _writer(self):
+        if self._file is None or self._file.tell() >= self.segment_bytes:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            if not self.segments or os.path.getsize(self._segment_path(self.segments[-1])) >= self.segment_bytes:
+                self.segments.append(self.segments[-1] + 1 if self.segments else 1)
+            self._file = open(self._segment_path(self.segments[-1]), 'ab')
+        return self._file
+
+    def record(self, guild_id, actor_id, action, target='', detail=''):
+        """Append one record; failures are logged, never raised into the command."""
+        line = json.dumps([int(time.time()), guild_id or 0, actor_id, action, str(target)[:200], str(detail)[:500]],
+                          separators=(',', ':'), ensure_ascii=False).encode() + b'\n'
+        try:
+            f = self._writer()
+            offset = f.tell()
+            f.write(line)
+            f.flush()
+        except OSError as e:
+            logger.error(f"Failed to write audit record {action} by {actor_id}: {e}")
+            return
+        self._index(len(self.segments) - 1, offset, guild_id or 0, actor_id, action)
+
+    def query(self, guild_id=None, actor_id=None, action=None, limit=15):
+        """Newest matching records first. Every filter left as None matches anything."""
+        code = self.action_codes.get(action)
+        candidates = []
+        if guild_id is not None:
+            candidates.append(self.by_guild.get(guild_id, ()))
+        if actor_id is not None:
+            candidates.append(self.by_actor.get(actor_id, ()))
+        if action is not None:
+            candidates.append(self.by_action.get(code, ()) if code is not None else ())
+        if candidates:
+            # Walk the shortest posting list and check the other filters against the in-memory columns.
+            ids = reversed(min(candidates, key=len))
+        else:
+            ids = reversed(range(len(self.locations)))
+        matches = []
+        for record_id in ids:
+            if guild_id is not None and self.guilds[record_id] != guild_id:
+                continue
+            if actor_id is not None and self.actors[record_id] != actor_id:
+                continue
+            if action is not None and self.actions[record_id] != code:
+                continue
+            matches.append(record_id)
+            if len(matches) >= limit:
+                break
+        return [self._read(record_id) for record_id in matches]
+
+    def _read(self, record_id):
+        location = self.locations[record_id]
+        segment = self.segments[location >> OFFSET_BITS]
+        if self._file is not None:
+            self._file.flush()
+        with open(self._segment_path(segment), 'rb') as f:
+            f.seek(location & ((1 << OFFSET_BITS) - 1))
+            return AuditRecord(*json.loads(f.readline()))
+
+    def actions_seen(self):
+        return list(self.action_names)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
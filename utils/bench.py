@@ -0,0 +1,227 @@
+import argparse
+import asyncio
+import datetime
+import gc
+import json
+import logging
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import discord
+
+from utils.gateway_profile import synthetic_guild
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+OUTPUT = os.path.join(ROOT, 'bench_output.txt')
+COMMANDS_PER_COG = 5
+GUILD_MEMBERS = 200
+COGS_PER_GUILD = 5
+
+
+class FakeContext:
+    """Just enough of commands.Context for the command callbacks under test."""
+
+    def __init__(self, bot, guild, author, prefix='!'):
+        self.bot = bot
+        self.guild = guild
+        self.author = author
+        self.channel = guild.text_channels[0]
+        self.prefix = prefix
+        self.sent = 0
+
+    async def send(self, content=None, **kwargs):
+        self.sent += 1
+
+    async def defer(self, **kwargs):
+        pass
+
+
+async def fake_request(route, **kwargs):
+    """Stand-in for HTTPClient.request: every REST call succeeds instantly with no body."""
+    return None
+
+
+def write_fixture(workdir, guilds, cogs, roles):
+    """Write config.json, functions.json, server_configs, role_configs.json and synthetic cogs into workdir."""
+    rng = random.Random(0)
+    cog_names = [f'bench_cog_{i}' for i in range(cogs)]
+    os.makedirs(os.path.join(workdir, 'cogs'))
+    os.makedirs(os.path.join(workdir, 'server_configs'))
+    for index, name in enumerate(cog_names):
+        methods = "".join(
+            f"\n    @commands.command(name='{name}_{j}')\n    async def cmd_{j}(self, ctx):\n"
+            f"        \"\"\"Synthetic command {j} of {name}.\"\"\"\n        await ctx.send('ok')\n"
+            for j in range(COMMANDS_PER_COG))
+        with open(os.path.join(workdir, 'cogs', f'{name}.py'), 'w') as f:
+            f.write(f"from discord.ext import commands\n\n\nclass BenchCog{index}(commands.Cog):\n"
+                    f"    def __init__(self, bot):\n        self.bot = bot\n{methods}\n\n"
+                    f"async def setup(bot):\n    await bot.add_cog(BenchCog{index}(bot))\n")
+
+    registry = {"cogs": {name: {"commands": {}} for name in cog_names + ['general', 'role_manager']},
+                "bot_commands": {}}
+    with open(os.path.join(workdir, 'functions.json'), 'w') as f:
+        json.dump(registry, f)
+    with open(os.path.join(workdir, 'config.json'), 'w') as f:
+        json.dump({"prefix": "!", "token": "offline"}, f)
+
+    payloads = []
+    for g in range(guilds):
+        guild_id = (g + 1) << 32
+        payload, _, member_ids = synthetic_guild(guild_id, GUILD_MEMBERS, channels=5, roles=roles)
+        payloads.append((payload, member_ids))
+        enabled = rng.sample(cog_names, min(COGS_PER_GUILD, cogs)) + ['role_manager']
+        with open(os.path.join(workdir, 'server_configs', f'{guild_id}.json'), 'w') as f:
+            json.dump({"cogs": enabled}, f)
+
+    # Role configs are global and name -> id, so they point at the first guild's roles.
+    first_roles = payloads[0][0]['roles'][1:]
+    role_configs = {"roles": {role['name']: {"id": int(role['id']), "is_low_level": True, "permissions": {}}
+                              for role in first_roles}}
+    with open(os.path.join(workdir, 'role_configs.json'), 'w') as f:
+        json.dump(role_configs, f)
+    return payloads, cog_names
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+async def measure(name, operation, iterations, setup=None):
+    """Time `operation(i)` over `iterations` calls, then repeat a short pass under tracemalloc for peak memory."""
+    durations = []
+    for i in range(iterations):
+        if setup:
+            await setup(i)
+        start = time.perf_counter_ns()
+        await operation(i)
+        durations.append(time.perf_counter_ns() - start)
+
+    gc.collect()
+    tracemalloc.start()
+    for i in range(min(iterations, 100)):
+        if setup:
+            await setup(i)
+        await operation(i)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    durations.sort()
+    total = sum(durations) / 1e9
+    return {
+        'name': name,
+        'iterations': iterations,
+        'ops_per_sec': iterations / total if total else float('inf'),
+        'p50_us': percentile(durations, 0.50) / 1000,
+        'p95_us': percentile(durations, 0.95) / 1000,
+        'p99_us': percentile(durations, 0.99) / 1000,
+        'peak_kib': peak / 1024,
+    }
+
+
+async def run(args, workdir):
+    payloads, cog_names = write_fixture(workdir, args.guilds, args.cogs, args.roles)
+    os.chdir(workdir)
+    # Synthetic cogs in workdir/cogs join the repo's cogs namespace package.
+    sys.path[:0] = [ROOT, workdir]
+    import bot as odin
+    logging.disable(logging.CRITICAL)
+
+    bot = odin.bot
+    bot.http.request = fake_request
+    state = bot._connection
+    state.user = discord.ClientUser(state=state, data={'id': '1', 'username': 'odin', 'discriminator': '0',
+                                                       'avatar': None, 'global_name': None, 'bot': True})
+    contexts = []
+    for payload, member_ids in payloads:
+        guild = state._get_create_guild(payload)
+        contexts.append([FakeContext(bot, guild, guild.get_member(uid)) for uid in member_ids[:10]])
+
+    def ctx_for(i):
+        return contexts[i % len(contexts)][i % 10]
+
+    for i in range(len(contexts)):
+        await odin.load_server_cogs(contexts[i][0].guild.id)
+    general = bot.get_cog('General')
+    role_manager = bot.get_cog('RoleManager')
+    role_names = list(role_manager.role_configs['roles'])
+    first_guild = contexts[0]
+    spare_cog = cog_names[-1]
+
+    async def unload_guild_cogs(i):
+        for cog_name in odin.guild_configs.cogs(ctx_for(i).guild.id):
+            if f'cogs.{cog_name}' in bot.extensions:
+                await bot.unload_extension(f'cogs.{cog_name}')
+
+    async def invalidate_catalog(i):
+        bot.catalog.invalidate()
+
+    async def clear_spare_cog(i):
+        # enable_function refuses a cog that's already enabled.
+        data = odin.guild_configs.get(ctx_for(i).guild.id)
+        if spare_cog in data['cogs']:
+            data['cogs'].remove(spare_cog)
+
+    async def enable_disable(i):
+        ctx = ctx_for(i)
+        await odin.enable_function.callback(ctx, spare_cog)
+        await odin.disable_function.callback(ctx, spare_cog)
+
+    n = args.iterations
+    results = [
+        await measure('load_server_cogs (warm)', lambda i: odin.load_server_cogs(ctx_for(i).guild.id), n),
+        await measure('load_server_cogs (cold)', lambda i: odin.load_server_cogs(ctx_for(i).guild.id),
+                      max(n // 20, 10), setup=unload_guild_cogs),
+        await measure('enable_function + disable_function', enable_disable, max(n // 10, 10), setup=clear_spare_cog),
+        await measure('General.cmd_bank (cached)', lambda i: general.cmd_bank.callback(general, ctx_for(i), 1), n),
+        await measure('General.cmd_bank (rebuilt)', lambda i: general.cmd_bank.callback(general, ctx_for(i), 1), n,
+                      setup=invalidate_catalog),
+        await measure('RoleManager.assign_role',
+                      lambda i: role_manager.assign_role.callback(role_manager, first_guild[i % 10],
+                                                                  role_name=role_names[i % len(role_names)]), n),
+    ]
+    await bot.close()
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return 'unknown'
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark hot command paths against a synthetic offline fixture.")
+    parser.add_argument('--guilds', type=int, default=100)
+    parser.add_argument('--cogs', type=int, default=20)
+    parser.add_argument('--roles', type=int, default=50)
+    parser.add_argument('--iterations', type=int, default=2000)
+    parser.add_argument('--output', default=OUTPUT, help="File the results are appended to.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix='odin-bench-') as workdir:
+        results = asyncio.run(run(args, workdir))
+        os.chdir(ROOT)
+
+    lines = [f"# {datetime.datetime.now().isoformat(timespec='seconds')} rev {git_revision()} "
+             f"python {sys.version.split()[0]} discord.py {discord.__version__}",
+             f"# fixture: {args.guilds} guilds, {args.cogs} cogs, {args.roles} roles, {args.iterations} iterations",
+             f"{'benchmark':<36} {'ops/sec':>10} {'p50 us':>9} {'p95 us':>9} {'p99 us':>9} {'peak KiB':>9}"]
+    for r in results:
+        lines.append(f"{r['name']:<36} {r['ops_per_sec']:>10.0f} {r['p50_us']:>9.1f} {r['p95_us']:>9.1f} "
+                     f"{r['p99_us']:>9.1f} {r['peak_kib']:>9.1f}")
+    lines.append(f"# max RSS: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.1f} MiB")
+    report = "\n".join(lines)
+    print(report)
+    with open(args.output, 'a') as f:
+        f.write(report + "\n\n")
+
+
+if __name__ == '__main__':
+    main()
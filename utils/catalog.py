@@ -0,0 +1,104 @@
+import logging
+
+import discord
+
+logger = logging.getLogger(__name__)
+
+# Discord allows 25 fields per embed and 6000 characters in total; stay well inside both.
+FIELDS_PER_PAGE = 20
+MAX_VALUE_LENGTH = 200
+
+
+def cog_key(command):
+    """Name a command's cog is enabled under ('general', 'role_manager', ...), or None for bot-level commands."""
+    if command.cog is None:
+        return None
+    return type(command.cog).__module__.rsplit('.', 1)[-1]
+
+
+class CommandCatalog:
+    """Command listing built from `bot.commands`, with rendered embeds cached per guild.
+
+    Cogs that aren't loaded in this process (lazy cogs, or cogs no guild here
+    has enabled yet) are listed from their command registry entries instead,
+    so help shows every command a guild could use. The command list is rebuilt
+    only after an extension or the registry changes; a guild's pages are
+    re-rendered only when its cog set or prefix changes.
+    """
+
+    def __init__(self, bot):
+        self.bot = bot
+        self._entries = None
+        self._pages = {}
+        self._help = {}
+
+    def on_extension_change(self, action, name):
+        self.invalidate()
+
+    def invalidate(self):
+        self._entries = None
+        self._pages.clear()
+
+    def invalidate_guild(self, guild_id):
+        for key in [key for key in self._pages if key[0] == guild_id]:
+            del self._pages[key]
+
+    @property
+    def entries(self):
+        """Sorted (name, description, cog) tuples for every visible command."""
+        if self._entries is None:
+            entries = {command.name: (command.name, command.short_doc or "No description.", cog_key(command))
+                       for command in self.bot.commands if not command.hidden}
+            registry = getattr(self.bot, 'registry', None)
+            if registry is not None:
+                for cog_name, entry in registry.data["cogs"].items():
+                    if f'cogs.{cog_name}' in self.bot.extensions:
+                        continue  # Loaded, so its live commands are already listed
+                    for name, description in entry.get("commands", {}).items():
+                        entries.setdefault(name, (name, description or "No description.", cog_name))
+            self._entries = sorted(entries.values())
+        return self._entries
+
+    def pages(self, guild_id, server_cogs, prefix):
+        key = (guild_id, prefix)
+        pages = self._pages.get(key)
+        if pages is None:
+            pages = self._pages[key] = self._render(server_cogs, prefix)
+        return pages
+
+    def _render(self, server_cogs, prefix):
+        rows = []
+        for name, description, cog in self.entries:
+            if cog is None:
+                status = ""
+            elif cog == "general":
+                status = "* (enabled)*"
+            else:
+                status = "* (enabled)*" if cog in server_cogs else "* (disabled)*"
+            rows.append((f"{prefix}{name} {status}", description[:MAX_VALUE_LENGTH]))
+
+        chunks = [rows[i:i + FIELDS_PER_PAGE] for i in range(0, len(rows), FIELDS_PER_PAGE)] or [[]]
+        pages = []
+        for number, chunk in enumerate(chunks, 1):
+            embed = discord.Embed(title="Odin Command Bank", color=discord.Color.purple())
+            for field_name, value in chunk:
+                embed.add_field(name=field_name, value=value, inline=False)
+            footer = f"Total Commands: {len(rows)}"
+            if len(chunks) > 1:
+                footer = f"Page {number}/{len(chunks)} · {footer} · {prefix}cmd_bank <page>"
+            embed.set_footer(text=footer)
+            pages.append(embed)
+        return pages
+
+    def help_embed(self, prefix):
+        embed = self._help.get(prefix)
+        if embed is None:
+            embed = discord.Embed(title="Odin Help", color=discord.Color.green())
+            embed.add_field(
+                name="Available Commands",
+                value=f"Use `{prefix}cmd_bank` to see all available commands and their descriptions.",
+                inline=False
+            )
+            embed.set_footer(text=f"Prefix: {prefix}")
+            self._help[prefix] = embed
+        return embed
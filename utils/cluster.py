@@ -0,0 +1,364 @@
+import asyncio
+import collections
+import itertools
+import json
+import logging
+import os
+import secrets
+import signal
+import sys
+import time
+
+import discord
+
+from utils.supervisor import Backoff
+
+logger = logging.getLogger(__name__)
+
+# Environment variables the supervisor hands to each worker process.
+ENV_CLUSTER_ID = 'ODIN_CLUSTER_ID'
+ENV_SHARD_IDS = 'ODIN_SHARD_IDS'
+ENV_SHARD_COUNT = 'ODIN_SHARD_COUNT'
+ENV_IPC_PORT = 'ODIN_IPC_PORT'
+ENV_IPC_TOKEN = 'ODIN_IPC_TOKEN'
+
+REQUEST_TIMEOUT = 5.0
+# Exit status a worker uses for errors a restart can't fix (bad config, bad token); EX_CONFIG from sysexits.h.
+# Anything else, including the 1 of an uncaught exception, is treated as a crash and restarted.
+EXIT_FATAL = 78
+
+
+def worker_settings():
+    """Return (cluster_id, shard_ids, shard_count) if this process is a cluster worker, else None."""
+    cluster_id = os.environ.get(ENV_CLUSTER_ID)
+    if cluster_id is None:
+        return None
+    shard_ids = [int(s) for s in os.environ[ENV_SHARD_IDS].split(',') if s]
+    return int(cluster_id), shard_ids, int(os.environ[ENV_SHARD_COUNT])
+
+
+def worker_path(path, cluster_id):
+    """Per-worker variant of a file path: recordings/gateway.jsonl.gz -> recordings/gateway-2.jsonl.gz."""
+    directory, name = os.path.split(path)
+    stem, dot, extension = name.partition('.')
+    return os.path.join(directory, f"{stem}-{cluster_id}{dot}{extension}")
+
+
+def split_shards(shard_count, workers):
+    """Split shard ids 0..shard_count-1 into `workers` contiguous ranges."""
+    workers = max(1, min(workers, shard_count))
+    size, extra = divmod(shard_count, workers)
+    ranges, start = [], 0
+    for i in range(workers):
+        end = start + size + (1 if i < extra else 0)
+        ranges.append(list(range(start, end)))
+        start = end
+    return ranges
+
+
+async def _send(writer, message):
+    writer.write(json.dumps(message).encode() + b'\n')
+    await writer.drain()
+
+
+class RecentLogHandler(logging.Handler):
+    """Keeps the last few formatted log lines so `logs` can be answered over IPC."""
+
+    def __init__(self, capacity=200):
+        super().__init__()
+        self.lines = collections.deque(maxlen=capacity)
+
+    def emit(self, record):
+        try:
+            self.lines.append(self.format(record))
+        except Exception:
+            self.handleError(record)
+
+
+class ClusterClient:
+    """Worker side of the IPC channel to the cluster supervisor.
+
+    The connection is kept up in the background: when it drops, the client
+    reconnects with backoff. Until then broadcasts are dropped with a warning,
+    and requests are answered by this worker alone.
+    """
+
+    def __init__(self, cluster_id, port, token):
+        self.cluster_id = cluster_id
+        self.port = port
+        self.token = token
+        self.handlers = {}
+        self._pending = {}
+        self._ids = itertools.count()
+        self._writer = None
+        self._task = None
+        self._tasks = set()
+
+    def handler(self, name):
+        """Register a coroutine answering requests/broadcasts called `name`."""
+        def decorator(func):
+            self.handlers[name] = func
+            return func
+        return decorator
+
+    @property
+    def connected(self):
+        return self._writer is not None and not self._writer.is_closing()
+
+    async def connect(self):
+        """Connect to the supervisor, then keep the connection up from a background task."""
+        reader = await self._open()
+        self._task = asyncio.create_task(self._run(reader))
+
+    async def _open(self):
+        reader, writer = await asyncio.open_connection('127.0.0.1', self.port)
+        await _send(writer, {"op": "hello", "cluster_id": self.cluster_id, "token": self.token})
+        self._writer = writer
+        logger.info(f"Cluster {self.cluster_id} connected to IPC on port {self.port}")
+        return reader
+
+    async def _run(self, reader):
+        backoff = Backoff(base=0.5, cap=30.0)
+        while True:
+            await self._read_loop(reader)
+            self._disconnected()
+            while True:
+                delay = backoff.delay()
+                logger.error(f"Cluster {self.cluster_id} lost its IPC connection; reconnecting in {delay:.1f}s")
+                await asyncio.sleep(delay)
+                try:
+                    reader = await self._open()
+                except OSError as e:
+                    logger.warning(f"Cluster {self.cluster_id} failed to reconnect to IPC: {e}")
+                    continue
+                backoff.reset()
+                break
+
+    def _disconnected(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(ConnectionError("IPC connection lost"))
+        self._pending.clear()
+
+    async def _read_loop(self, reader):
+        while True:
+            try:
+                line = await reader.readline()
+            except (OSError, ValueError) as e:
+                logger.warning(f"Cluster {self.cluster_id} failed to read from IPC: {e}")
+                return
+            if not line:
+                return
+            try:
+                message = json.loads(line)
+                op = message.get("op")
+                if op == "reply":
+                    future = self._pending.pop(message["id"], None)
+                    if future and not future.done():
+                        future.set_result(message["data"])
+                elif op in ("request", "broadcast"):
+                    self._spawn(self._handle(message))
+            except (ValueError, KeyError, TypeError, AttributeError) as e:
+                logger.warning(f"Cluster {self.cluster_id} skipped a malformed IPC message: {e}")
+
+    def _spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _answer(self, message):
+        func = self.handlers.get(message.get("name"))
+        if func is None:
+            return None
+        try:
+            return await func(message.get("data") or {})
+        except Exception as e:
+            logger.error(f"IPC handler {message['name']} failed: {e}")
+            return {"error": str(e)}
+
+    async def _handle(self, message):
+        result = await self._answer(message)
+        if message["op"] == "request" and self.connected:
+            try:
+                await _send(self._writer, {"op": "reply", "id": message.get("id"), "data": result})
+            except (OSError, ConnectionError) as e:
+                logger.warning(f"Cluster {self.cluster_id} failed to answer IPC request {message.get('name')}: {e}")
+
+    async def request(self, name, data=None):
+        """Ask every worker (including this one) and return {cluster_id: result}.
+
+        While the IPC connection is down only this worker answers.
+        """
+        if self.connected:
+            request_id = next(self._ids)
+            future = asyncio.get_running_loop().create_future()
+            self._pending[request_id] = future
+            try:
+                await _send(self._writer, {"op": "request", "id": request_id, "name": name, "data": data})
+                return await asyncio.wait_for(future, timeout=REQUEST_TIMEOUT * 2)
+            except (OSError, ConnectionError) as e:
+                logger.warning(f"IPC request {name} failed, answering for cluster {self.cluster_id} only: {e}")
+            finally:
+                self._pending.pop(request_id, None)
+        return {str(self.cluster_id): await self._answer({"name": name, "data": data})}
+
+    async def broadcast(self, name, data=None):
+        """Notify every other worker; no reply is expected. Failures are logged, never raised."""
+        if not self.connected:
+            logger.warning(f"IPC is disconnected, other workers missed broadcast {name}")
+            return
+        try:
+            await _send(self._writer, {"op": "broadcast", "name": name, "data": data})
+        except (OSError, ConnectionError) as e:
+            logger.warning(f"Failed to broadcast {name} over IPC: {e}")
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        self._disconnected()
+
+
+class ClusterSupervisor:
+    """Spawns one bot process per shard range and relays IPC traffic between them."""
+
+    def __init__(self, config):
+        cluster_config = config.get('cluster', {})
+        self.token = config['token']
+        self.shard_count = cluster_config.get('shard_count')
+        self.workers = cluster_config.get('workers', 1)
+        self.port = cluster_config.get('ipc_port', 8765)
+        # A worker that stayed up this long gets a fresh restart backoff
+        self.healthy_after = cluster_config.get('healthy_after', 300)
+        self.ipc_token = secrets.token_hex(16)
+        self.connections = {}
+        self.processes = {}
+        self._ids = itertools.count()
+        self._pending = {}
+        self._tasks = set()
+        self._stopping = False
+
+    async def _recommended_shards(self):
+        http = discord.http.HTTPClient(asyncio.get_running_loop())
+        try:
+            await http.static_login(self.token)
+            shards, _ = await http.get_bot_gateway()
+            return shards
+        finally:
+            await http.close()
+
+    async def run(self):
+        if not self.shard_count:
+            self.shard_count = await self._recommended_shards()
+        ranges = split_shards(self.shard_count, self.workers)
+        logger.info(f"Starting {len(ranges)} workers for {self.shard_count} shards")
+
+        server = await asyncio.start_server(self._on_connection, '127.0.0.1', self.port)
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, self.stop)
+            except NotImplementedError:
+                pass
+
+        async with server:
+            await asyncio.gather(*(self._keep_worker(i, shard_ids) for i, shard_ids in enumerate(ranges)))
+
+    def stop(self):
+        self._stopping = True
+        for process in self.processes.values():
+            if process.returncode is None:
+                process.terminate()
+
+    async def _keep_worker(self, cluster_id, shard_ids):
+        backoff = Backoff()
+        while not self._stopping:
+            env = dict(os.environ)
+            env.update({
+                ENV_CLUSTER_ID: str(cluster_id),
+                ENV_SHARD_IDS: ','.join(map(str, shard_ids)),
+                ENV_SHARD_COUNT: str(self.shard_count),
+                ENV_IPC_PORT: str(self.port),
+                ENV_IPC_TOKEN: self.ipc_token,
+            })
+            process = await asyncio.create_subprocess_exec(sys.executable, *sys.argv, env=env)
+            self.processes[cluster_id] = process
+            logger.info(f"Worker {cluster_id} (pid {process.pid}) started for shards {shard_ids}")
+            started = time.monotonic()
+            code = await process.wait()
+            if self._stopping:
+                break
+            if code == EXIT_FATAL:
+                logger.critical(f"Worker {cluster_id} exited fatally, stopping cluster.")
+                self.stop()
+                break
+            if time.monotonic() - started >= self.healthy_after:
+                backoff.reset()
+            delay = backoff.delay()
+            logger.error(f"Worker {cluster_id} exited with code {code}; restarting in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+    async def _on_connection(self, reader, writer):
+        hello = json.loads(await reader.readline() or b'{}')
+        if hello.get("op") != "hello" or hello.get("token") != self.ipc_token:
+            writer.close()
+            return
+        cluster_id = hello["cluster_id"]
+        self.connections[cluster_id] = writer
+        try:
+            while line := await reader.readline():
+                try:
+                    message = json.loads(line)
+                    op = message.get("op")
+                except (ValueError, AttributeError) as e:
+                    logger.warning(f"Skipped a malformed IPC message from worker {cluster_id}: {e}")
+                    continue
+                if op == "broadcast":
+                    for other_id, other in list(self.connections.items()):
+                        if other_id != cluster_id:
+                            try:
+                                await _send(other, message)
+                            except (OSError, ConnectionError) as e:
+                                logger.warning(f"Failed to relay {message.get('name')} to worker {other_id}: {e}")
+                elif op == "request":
+                    task = asyncio.create_task(self._fan_out(writer, message))
+                    self._tasks.add(task)
+                    task.add_done_callback(self._tasks.discard)
+                elif op == "reply":
+                    future = self._pending.pop(message.get("id"), None)
+                    if future and not future.done():
+                        future.set_result((cluster_id, message.get("data")))
+        except (OSError, ValueError) as e:
+            logger.warning(f"IPC connection to worker {cluster_id} failed: {e}")
+        finally:
+            if self.connections.get(cluster_id) is writer:
+                del self.connections[cluster_id]
+
+    async def _fan_out(self, origin, message):
+        loop = asyncio.get_running_loop()
+        futures = []
+        for writer in list(self.connections.values()):
+            request_id = next(self._ids)
+            future = loop.create_future()
+            self._pending[request_id] = future
+            futures.append((request_id, future))
+            try:
+                await _send(writer, {**message, "id": request_id})
+            except (OSError, ConnectionError):
+                pass  # That worker's answer just times out
+
+        results = {}
+        done, _ = await asyncio.wait([f for _, f in futures], timeout=REQUEST_TIMEOUT) if futures else (set(), set())
+        for request_id, future in futures:
+            self._pending.pop(request_id, None)
+            if future in done:
+                cluster_id, data = future.result()
+                results[str(cluster_id)] = data
+        try:
+            await _send(origin, {"op": "reply", "id": message.get("id"), "data": results})
+        except (OSError, ConnectionError) as e:
+            logger.warning(f"Failed to return {message.get('name')} results: {e}")
@@ -0,0 +1,100 @@
+import hashlib
+import importlib.util
+import inspect
+import json
+import logging
+import os
+
+import discord
+from discord.ext import commands
+
+logger = logging.getLogger(__name__)
+
+HASH_PATH = 'app_commands.sha256'
+
+
+def extension_app_commands(extension):
+    """Top-level app commands defined by an extension's cogs, read from its module without loading it."""
+    spec = importlib.util.find_spec(extension)
+    if spec is None:
+        raise ModuleNotFoundError(extension)
+    # A fresh module object outside sys.modules, the way load_extension builds one, so a later load is unaffected.
+    lib = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(lib)
+    found = []
+    for cls in vars(lib).values():
+        if not (inspect.isclass(cls) and issubclass(cls, commands.Cog) and cls.__module__ == lib.__name__):
+            continue
+        if cls.__cog_is_app_commands_group__:
+            logger.warning(f"{cls.__name__} in {extension} is a GroupCog; its commands are only synced while it is loaded.")
+            continue
+        for command in cls.__cog_commands__:
+            app_command = getattr(command, 'app_command', None)
+            if app_command is not None and command.parent is None:
+                found.append(app_command)
+        found.extend(cls.__cog_app_commands__)
+    return found
+
+
+def app_command_payload(bot, extensions=()):
+    """The global command list as sent to Discord.
+
+    bot.tree only holds the commands of cogs that are loaded right now, so the
+    commands of every extension in `extensions` that isn't loaded are added
+    from its module. Syncing only the loaded tree would delete those commands.
+    """
+    payload = {command.name: command.to_dict(bot.tree) for command in bot.tree.get_commands()}
+    for extension in extensions:
+        if extension in bot.extensions:
+            continue
+        try:
+            found = extension_app_commands(extension)
+        except Exception as e:
+            logger.error(f"Failed to read app commands from {extension}: {e}")
+            continue
+        for command in found:
+            payload.setdefault(command.name, command.to_dict(bot.tree))
+    return sorted(payload.values(), key=lambda c: c['name'])
+
+
+def tree_hash(bot, payload):
+    """Content hash of the global app command list, as it would be sent to Discord."""
+    data = json.dumps({"application_id": bot.application_id, "commands": payload}, sort_keys=True)
+    return hashlib.sha256(data.encode()).hexdigest()
+
+
+async def sync_app_commands(bot, extensions=(), path=HASH_PATH, force=False):
+    """Sync the command tree only when its hash differs from the last successful sync.
+
+    `extensions` are all the extensions whose commands should exist globally,
+    loaded or not. Global syncs are rate limited per application, so restarts
+    with an unchanged tree skip the API call entirely. Returns whether a sync
+    happened.
+    """
+    if bot.application_id is None:
+        raise discord.app_commands.MissingApplicationID()
+    payload = app_command_payload(bot, extensions)
+    digest = tree_hash(bot, payload)
+    try:
+        with open(path, 'r') as f:
+            saved = f.read().strip()
+    except FileNotFoundError:
+        saved = None
+    if digest == saved and not force:
+        logger.info("App command tree unchanged, skipping sync.")
+        return False
+
+    try:
+        synced = await bot.http.bulk_upsert_global_commands(bot.application_id, payload=payload)
+    except discord.HTTPException as e:
+        logger.error(f"Failed to sync app commands: {e}")
+        raise
+    tmp_path = f'{path}.tmp'
+    try:
+        with open(tmp_path, 'w') as f:
+            f.write(digest)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logger.error(f"Failed to write {path}: {e}")
+    logger.info(f"Synced {len(synced)} app commands.")
+    return True
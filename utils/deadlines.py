@@ -0,0 +1,130 @@
+import asyncio
+import inspect
+import itertools
+import logging
+import time
+
+from utils.catalog import cog_key
+
+logger = logging.getLogger(__name__)
+
+# Commands that wait on DM replies (role_manager, add_function, ...) get longer deadlines in
+# functions.json, so their own wait_for timeouts fire and tell the user first.
+DEFAULT_DEADLINE = 300
+
+
+class Invocation:
+    __slots__ = ('id', 'ctx', 'task', 'started', 'deadline', 'handle', 'stopped', 'cleanups', '_done_callback')
+
+    def __init__(self, id, ctx, task, deadline):
+        self.id = id
+        self.ctx = ctx
+        self.task = task
+        self.started = time.monotonic()
+        self.deadline = deadline
+        self.handle = None
+        self.stopped = None
+        self.cleanups = []
+        self._done_callback = None
+
+    @property
+    def age(self):
+        return time.monotonic() - self.started
+
+
+class DeadlineTracker:
+    """Cancel scopes for command invocations, opened in before_invoke and closed in after_invoke.
+
+    Each invocation gets a deadline from the registry's "deadline" setting (seconds,
+    or {"default": ..., "commands": {...}}; null disables it), falling back to
+    `default`. When it passes, the invoking task is cancelled; discord.py turns
+    that into a failed command and still runs the after-invoke hooks. Cleanups
+    registered with `add_cleanup` run exactly once when the scope closes, and
+    also if the task dies before after_invoke gets to run.
+    """
+
+    def __init__(self, registry, default=DEFAULT_DEADLINE):
+        self.registry = registry
+        self.default = default
+        self.running = {}
+        self.ids = itertools.count(1)
+        self.expired = 0
+        self.cancelled = 0
+
+    def deadline_for(self, command):
+        config = self.registry.setting(cog_key(command), "deadline", self.default)
+        if isinstance(config, dict):
+            config = config.get("commands", {}).get(command.qualified_name, config.get("default", self.default))
+        return config
+
+    def start(self, ctx):
+        # Before-invoke hooks run for a group and again for its subcommand; open one scope.
+        if getattr(ctx, '_invocation', None) is not None:
+            return ctx._invocation
+        task = asyncio.current_task()
+        invocation = Invocation(next(self.ids), ctx, task, self.deadline_for(ctx.command))
+        if invocation.deadline:
+            invocation.handle = asyncio.get_running_loop().call_later(invocation.deadline, self._expire, invocation)
+        invocation._done_callback = lambda _: self.finish(ctx)
+        task.add_done_callback(invocation._done_callback)
+        self.running[invocation.id] = invocation
+        ctx._invocation = invocation
+        return invocation
+
+    def add_cleanup(self, ctx, func, *args):
+        """Run `func(*args)` when the invocation ends, however it ends. Coroutines are scheduled as tasks."""
+        invocation = getattr(ctx, '_invocation', None)
+        if invocation is None:
+            raise RuntimeError("No command invocation is running for this context")
+        invocation.cleanups.append((func, args))
+
+    def _expire(self, invocation):
+        if invocation.id not in self.running:
+            return
+        self.expired += 1
+        logger.warning(f"Command {invocation.ctx.command} passed its {invocation.deadline}s deadline, cancelling it")
+        invocation.stopped = 'deadline'
+        invocation.task.cancel()
+
+    def cancel(self, invocation_id):
+        """Cancel a running invocation by id; returns it, or None if it already finished."""
+        invocation = self.running.get(invocation_id)
+        if invocation is None or invocation.stopped:
+            return None
+        self.cancelled += 1
+        invocation.stopped = 'cancelled'
+        invocation.task.cancel()
+        return invocation
+
+    def finish(self, ctx):
+        """Close the invocation's scope and run its cleanups; safe to call more than once."""
+        invocation = getattr(ctx, '_invocation', None)
+        if invocation is None:
+            return None
+        ctx._invocation = None
+        self.running.pop(invocation.id, None)
+        if invocation.handle is not None:
+            invocation.handle.cancel()
+        invocation.task.remove_done_callback(invocation._done_callback)
+        if invocation.stopped and not invocation.task.done():
+            # discord.py swallowed our CancelledError; don't leave the event task marked as cancelling.
+            invocation.task.uncancel()
+        for func, args in invocation.cleanups:
+            try:
+                result = func(*args)
+                if inspect.isawaitable(result):
+                    asyncio.ensure_future(result)
+            except Exception as e:
+                logger.error(f"Cleanup {getattr(func, '__name__', func)} for {ctx.command} failed: {e}")
+        return invocation
+
+    def for_guild(self, guild_id):
+        return [i for i in self.running.values() if (i.ctx.guild.id if i.ctx.guild else None) == guild_id]
+
+    def summary(self):
+        return {
+            "running": len(self.running),
+            "expired": self.expired,
+            "cancelled": self.cancelled,
+            "oldest_s": round(max((i.age for i in self.running.values()), default=0), 1),
+        }
@@ -0,0 +1,226 @@
+import asyncio
+import collections
+import concurrent.futures
+import logging
+import multiprocessing
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUOTA = 4
+DEFAULT_TIMEOUT = 30.0
+
+
+class ExecutorBusy(Exception):
+    """Raised when an owner already has as many tasks in flight as its quota allows."""
+
+    def __init__(self, owner, limit):
+        super().__init__(f"{owner or 'bot'} already has {limit} background tasks running")
+        self.owner = owner
+        self.limit = limit
+
+
+class _PoolStats:
+    __slots__ = ('workers', 'in_flight', 'peak', 'completed', 'failed', 'timed_out', 'rejected', 'run_time')
+
+    def __init__(self, workers):
+        self.workers = workers
+        self.in_flight = 0
+        self.peak = 0
+        self.completed = 0
+        self.failed = 0
+        self.timed_out = 0
+        self.rejected = 0
+        self.run_time = 0.0
+
+    def as_dict(self):
+        finished = self.completed + self.failed
+        return {
+            'workers': self.workers,
+            'in_flight': self.in_flight,
+            'queued': max(0, self.in_flight - self.workers),
+            'peak_in_flight': self.peak,
+            'completed': self.completed,
+            'failed': self.failed,
+            'timed_out': self.timed_out,
+            'rejected': self.rejected,
+            'avg_ms': round(self.run_time / finished * 1000, 1) if finished else 0,
+        }
+
+
+class ExecutorService:
+    """Shared worker pools for cogs: threads for blocking I/O, processes for CPU work.
+
+    Every task is charged to an owner (a cog name, or None for bot.py) whose
+    number of tasks in flight is capped by the registry's "executor_quota"
+    setting. A task counts against the quota until it really finishes, even
+    after the caller has timed out waiting for it. Process tasks that time out
+    cannot be interrupted, so the process pool is replaced instead; so is a
+    pool whose worker died.
+
+    Process workers are forked: spawn and forkserver workers import the main
+    module again, which for bot.py means building a second bot. Call `start()`
+    early, before the gateway and the thread pool have started threads, so the
+    workers are forked from a quiet process.
+    """
+
+    def __init__(self, registry=None, threads=8, processes=None, quota=DEFAULT_QUOTA, timeout=DEFAULT_TIMEOUT):
+        self.registry = registry
+        self.default_quota = quota
+        self.default_timeout = timeout
+        self.thread_pool = concurrent.futures.ThreadPoolExecutor(max_workers=threads, thread_name_prefix='odin-io')
+        self.process_workers = processes or min(os.cpu_count() or 2, 4)
+        self._process_pool = None
+        self.stats = {'threads': _PoolStats(threads), 'processes': _PoolStats(self.process_workers)}
+        self.in_flight = collections.Counter()
+        self.pending = collections.defaultdict(set)
+        self.closed = False
+
+    def start(self):
+        """Fork the process pool's workers now rather than on the first CPU task."""
+        if self._process_pool is None and not self.closed:
+            self._process_pool = self._new_process_pool()
+
+    @property
+    def process_pool(self):
+        if self._process_pool is None:
+            self._process_pool = self._new_process_pool()
+        return self._process_pool
+
+    def _new_process_pool(self):
+        pool = concurrent.futures.ProcessPoolExecutor(
+            max_workers=self.process_workers, mp_context=multiprocessing.get_context('fork'))
+        # A fork-based pool starts all of its workers on the first submit.
+        pool.submit(os.getpid)
+        return pool
+
+    def quota_for(self, owner):
+        if self.registry is None:
+            return self.default_quota
+        return self.registry.setting(owner, 'executor_quota', self.default_quota)
+
+    def for_cog(self, cog):
+        """Executor view that charges every task to `cog` (a Cog instance or cog name)."""
+        name = cog if isinstance(cog, str) else type(cog).__module__.rsplit('.', 1)[-1]
+        return CogExecutor(self, name)
+
+    async def run_blocking(self, func, *args, owner=None, timeout=None):
+        """Run blocking I/O on the thread pool. Like run_in_executor, use functools.partial for keyword arguments."""
+        return await self._run('threads', self.thread_pool, func, args, owner, timeout)
+
+    async def run_cpu(self, func, *args, owner=None, timeout=None):
+        """Run CPU-heavy work on the process pool; `func` and its arguments must be picklable."""
+        return await self._run('processes', self.process_pool, func, args, owner, timeout)
+
+    async def _run(self, pool_name, pool, func, args, owner, timeout):
+        if self.closed:
+            raise RuntimeError("Executor service is shut down")
+        stats = self.stats[pool_name]
+        limit = self.quota_for(owner)
+        if self.in_flight[owner] >= limit:
+            stats.rejected += 1
+            raise ExecutorBusy(owner, limit)
+
+        loop = asyncio.get_running_loop()
+        started = time.monotonic()
+        try:
+            future = pool.submit(func, *args)
+        except concurrent.futures.BrokenExecutor:
+            if pool_name != 'processes':
+                raise
+            self._replace_process_pool(pool)
+            pool = self.process_pool
+            future = pool.submit(func, *args)
+        self.in_flight[owner] += 1
+        self.pending[owner].add(future)
+        stats.in_flight += 1
+        stats.peak = max(stats.peak, stats.in_flight)
+
+        def finished(done):
+            # Runs in a worker thread; hand the bookkeeping back to the loop.
+            try:
+                loop.call_soon_threadsafe(self._finished, pool_name, owner, done, started)
+            except RuntimeError:
+                pass  # The loop already closed during shutdown
+
+        future.add_done_callback(finished)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout or self.default_timeout)
+        except asyncio.TimeoutError:
+            stats.timed_out += 1
+            logger.warning(f"{getattr(func, '__name__', func)} for {owner or 'bot'} timed out on the {pool_name} pool")
+            if pool_name == 'processes' and not future.done():
+                self._replace_process_pool(pool)
+            raise
+        except concurrent.futures.BrokenExecutor:
+            if pool_name == 'processes':
+                self._replace_process_pool(pool)
+            raise
+
+    def _finished(self, pool_name, owner, future, started):
+        stats = self.stats[pool_name]
+        stats.in_flight -= 1
+        self.in_flight[owner] -= 1
+        if not self.in_flight[owner]:
+            del self.in_flight[owner]
+        self.pending[owner].discard(future)
+        if not self.pending[owner]:
+            del self.pending[owner]
+        if future.cancelled():
+            return
+        stats.run_time += time.monotonic() - started
+        if future.exception() is not None:
+            stats.failed += 1
+        else:
+            stats.completed += 1
+
+    def _replace_process_pool(self, pool):
+        if pool is not self._process_pool:
+            return  # Another task already replaced it
+        self._process_pool = None
+        # Stuck workers can't be interrupted; terminate them so the new pool gets the CPU back.
+        for process in list((getattr(pool, '_processes', None) or {}).values()):
+            process.terminate()
+        pool.shutdown(wait=False, cancel_futures=True)
+        logger.warning("Replaced the process pool after a task timed out or a worker died")
+
+    def cancel_owner(self, owner):
+        """Cancel an owner's tasks that haven't started yet, e.g. when its cog is unloaded."""
+        cancelled = sum(future.cancel() for future in list(self.pending.get(owner, ())))
+        if cancelled:
+            logger.info(f"Cancelled {cancelled} queued background task(s) for {owner}")
+        return cancelled
+
+    def on_extension_change(self, action, name):
+        if action in ('unload', 'reload'):
+            self.cancel_owner(name.rsplit('.', 1)[-1])
+
+    def metrics(self):
+        data = {pool_name: stats.as_dict() for pool_name, stats in self.stats.items()}
+        data['by_owner'] = {owner or 'bot': count for owner, count in self.in_flight.items()}
+        return data
+
+    def shutdown(self):
+        """Cancel queued work and stop both pools without waiting for running tasks."""
+        if self.closed:
+            return
+        self.closed = True
+        self.thread_pool.shutdown(wait=False, cancel_futures=True)
+        if self._process_pool is not None:
+            self._process_pool.shutdown(wait=False, cancel_futures=True)
+        logger.info("Executor service shut down")
+
+
+class CogExecutor:
+    """`ExecutorService` bound to one owner, so a cog can't charge its work to another."""
+
+    def __init__(self, service, owner):
+        self.service = service
+        self.owner = owner
+
+    async def run_blocking(self, func, *args, timeout=None):
+        return await self.service.run_blocking(func, *args, owner=self.owner, timeout=timeout)
+
+    async def run_cpu(self, func, *args, timeout=None):
+        return await self.service.run_cpu(func, *args, owner=self.owner, timeout=timeout)
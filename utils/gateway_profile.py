@@ -0,0 +1,175 @@
+import argparse
+import gc
+import json
+import os
+import subprocess
+import sys
+
+import discord
+
+PROFILES = ('standard', 'lean')
+
+
+def build_intents(profile):
+    intents = discord.Intents.default()
+    intents.message_content = True
+    intents.dm_messages = True
+    if profile == 'lean':
+        # Nothing in the bot or its cogs listens for these events.
+        intents.typing = False
+        intents.voice_states = False
+        intents.invites = False
+        intents.webhooks = False
+        intents.integrations = False
+        intents.emojis_and_stickers = False
+        intents.guild_scheduled_events = False
+        intents.auto_moderation = False
+        intents.reactions = False
+        intents.polls = False
+    return intents
+
+
+def gateway_options(profile='standard', max_messages=None):
+    """Keyword arguments for the Bot constructor for a runtime profile.
+
+    The lean profile keeps only the bot's own member cached (discord.py always
+    does), never chunks guilds and bounds the message cache. RoleManager fetches
+    the members it needs on demand instead.
+    """
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown runtime profile {profile!r}; expected one of {', '.join(PROFILES)}.")
+    options = {'intents': build_intents(profile)}
+    if profile == 'lean':
+        options['member_cache_flags'] = discord.MemberCacheFlags.none()
+        options['chunk_guilds_at_startup'] = False
+        options['max_messages'] = 100 if max_messages is None else max_messages
+    elif max_messages is not None:
+        options['max_messages'] = max_messages
+    return options
+
+
+def rss_bytes():
+    with open('/proc/self/statm', 'r') as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+
+def _member(user_id, role_ids):
+    return {
+        'user': {'id': str(user_id), 'username': f'user{user_id}', 'discriminator': '0', 'avatar': None, 'global_name': None},
+        'roles': role_ids,
+        'joined_at': '2024-01-01T00:00:00+00:00',
+        'deaf': False,
+        'mute': False,
+        'flags': 0,
+    }
+
+
+def synthetic_guild(guild_id, members, channels, roles, voice_fraction=0.05):
+    """A GUILD_CREATE payload shaped like a large community server."""
+    role_ids = [str(guild_id + 1 + i) for i in range(roles)]
+    channel_ids = [guild_id + 100000 + i for i in range(channels)]
+    member_ids = range(guild_id + 1000000, guild_id + 1000000 + members)
+    voice_channel = str(guild_id + 99999)
+    return {
+        'id': str(guild_id),
+        'name': 'Synthetic Guild',
+        'owner_id': str(member_ids[0]),
+        'member_count': members,
+        'large': True,
+        'features': [],
+        'emojis': [],
+        'stickers': [],
+        'roles': [{'id': str(guild_id), 'name': '@everyone', 'permissions': '0', 'position': 0, 'color': 0,
+                   'hoist': False, 'managed': False, 'mentionable': False, 'flags': 0}] +
+                 [{'id': rid, 'name': f'role{i}', 'permissions': '0', 'position': i + 1, 'color': 0,
+                   'hoist': False, 'managed': False, 'mentionable': False, 'flags': 0} for i, rid in enumerate(role_ids)],
+        'channels': [{'id': str(cid), 'type': 0, 'name': f'channel{i}', 'position': i, 'permission_overwrites': []}
+                     for i, cid in enumerate(channel_ids)] +
+                    [{'id': voice_channel, 'type': 2, 'name': 'voice', 'position': channels, 'permission_overwrites': [],
+                      'bitrate': 64000, 'user_limit': 0}],
+        'members': [_member(uid, role_ids[i % roles:i % roles + 2]) for i, uid in enumerate(member_ids)],
+        'voice_states': [{'user_id': str(uid), 'channel_id': voice_channel, 'session_id': 'x', 'deaf': False,
+                          'mute': False, 'self_deaf': False, 'self_mute': False, 'self_video': False, 'suppress': False}
+                         for uid in member_ids[:int(members * voice_fraction)]],
+        'threads': [],
+        'stage_instances': [],
+        'guild_scheduled_events': [],
+        'presences': [],
+    }, channel_ids, list(member_ids)
+
+
+def _message(message_id, channel_id, guild_id, author):
+    member = _member(author, [])
+    user = member.pop('user')
+    return {
+        'id': str(message_id), 'channel_id': str(channel_id), 'guild_id': str(guild_id), 'author': user,
+        'member': member, 'content': 'x' * 80, 'timestamp': '2024-01-01T00:00:00+00:00', 'edited_timestamp': None,
+        'tts': False, 'mention_everyone': False, 'mentions': [], 'mention_roles': [], 'attachments': [],
+        'embeds': [], 'pinned': False, 'type': 0,
+    }
+
+
+def measure(profile, guilds, members, messages, max_messages=None):
+    """Parse a synthetic workload into a ConnectionState and report the RSS it added."""
+    options = gateway_options(profile, max_messages)
+
+    # Build every payload up front so only the cache growth is measured.
+    workload = []
+    for g in range(guilds):
+        guild_id = (g + 1) << 32
+        payload, channel_ids, member_ids = synthetic_guild(guild_id, members, channels=50, roles=40)
+        events = [_message(guild_id + 10 ** 7 + i, channel_ids[i % len(channel_ids)], guild_id,
+                           member_ids[(i * 7919) % len(member_ids)]) for i in range(messages)]
+        workload.append((payload, events))
+
+    gc.collect()
+    before = rss_bytes()
+    state = discord.state.ConnectionState(dispatch=lambda *args: None, handlers={}, hooks={}, http=None, **options)
+    state.user = discord.ClientUser(state=state, data={'id': '1', 'username': 'odin', 'discriminator': '0',
+                                                       'avatar': None, 'global_name': None, 'bot': True})
+    for payload, events in workload:
+        state._get_create_guild(payload)
+        for event in events:
+            state.parse_message_create(event)
+    gc.collect()
+    after = rss_bytes()
+
+    return {
+        'profile': profile,
+        'rss_delta_mib': round((after - before) / 1048576, 1),
+        'cached_members': sum(len(guild._members) for guild in state._guilds.values()),
+        'cached_messages': len(state._messages or []),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure RSS of each runtime profile on a synthetic large-guild fixture.")
+    parser.add_argument('--guilds', type=int, default=1)
+    parser.add_argument('--members', type=int, default=50000)
+    parser.add_argument('--messages', type=int, default=5000)
+    parser.add_argument('--max-messages', type=int, default=None)
+    parser.add_argument('--profile', choices=PROFILES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.profile:
+        print(json.dumps(measure(args.profile, args.guilds, args.members, args.messages, args.max_messages)))
+        return
+
+    # Each profile runs in a fresh interpreter so allocator state doesn't leak between them.
+    results = []
+    for profile in PROFILES:
+        cmd = [sys.executable, '-m', 'utils.gateway_profile', '--profile', profile, '--guilds', str(args.guilds),
+               '--members', str(args.members), '--messages', str(args.messages)]
+        if args.max_messages is not None:
+            cmd += ['--max-messages', str(args.max_messages)]
+        out = subprocess.run(cmd, capture_output=True, text=True, check=True).stdout
+        results.append(json.loads(out.strip().splitlines()[-1]))
+
+    print(f"Fixture: {args.guilds} guild(s) x {args.members} members, {args.messages} messages each")
+    for r in results:
+        print(f"{r['profile']:>8}: RSS +{r['rss_delta_mib']} MiB, {r['cached_members']} members, {r['cached_messages']} messages cached")
+    print(f"    diff: {results[0]['rss_delta_mib'] - results[1]['rss_delta_mib']:.1f} MiB saved by the lean profile")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,350 @@
+import argparse
+import asyncio
+import datetime
+import gzip
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from aiohttp import web
+import discord
+
+from utils.gateway_profile import synthetic_guild
+
+logger = logging.getLogger(__name__)
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# The replayer needs these to rebuild guild state, so they are always recorded.
+STATE_EVENTS = ('READY', 'GUILD_CREATE')
+DEFAULT_EVENTS = STATE_EVENTS + (
+    'MESSAGE_CREATE', 'MESSAGE_UPDATE', 'MESSAGE_DELETE',
+    'GUILD_ROLE_CREATE', 'GUILD_ROLE_UPDATE', 'GUILD_ROLE_DELETE',
+    'GUILD_MEMBER_ADD', 'GUILD_MEMBER_UPDATE', 'GUILD_MEMBER_REMOVE',
+    'GUILD_UPDATE', 'GUILD_DELETE', 'CHANNEL_CREATE', 'CHANNEL_UPDATE', 'CHANNEL_DELETE',
+)
+
+
+class GatewayRecorder:
+    """Capture raw gateway dispatch payloads to gzip-compressed JSON lines.
+
+    Wraps entries in the connection state's parser table, which the gateway
+    websocket calls for every dispatch, so payloads are recorded exactly as
+    Discord sent them. Each line is `[seconds since start, event, data]`.
+    """
+
+    def __init__(self, path, events=None, max_events=None):
+        self.path = path
+        self.events = set(events or DEFAULT_EVENTS) | set(STATE_EVENTS)
+        self.max_events = max_events
+        self.count = 0
+        self._file = None
+        self._start = None
+
+    def attach(self, bot):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = gzip.open(self.path, 'wt', encoding='utf-8')
+        self._start = time.monotonic()
+        header = {"version": 1, "recorded": datetime.datetime.now().isoformat(timespec='seconds'),
+                  "events": sorted(self.events)}
+        self._file.write(json.dumps(header) + "\n")
+        parsers = bot._connection.parsers
+        for event in self.events:
+            if event in parsers:
+                parsers[event] = self._wrap(event, parsers[event])
+        logger.info(f"Recording gateway events to {self.path}")
+
+    def _wrap(self, event, parse):
+        def parser(data):
+            if self._file is not None:
+                self._file.write(json.dumps([round(time.monotonic() - self._start, 4), event, data],
+                                            separators=(',', ':')) + "\n")
+                self.count += 1
+                if self.max_events and self.count >= self.max_events:
+                    self.close()
+            parse(data)
+        return parser
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            logger.info(f"Stopped recording after {self.count} gateway events")
+
+
+def read_recording(path):
+    """Return (header, [(offset, event, data), ...]) for a recording."""
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        header = json.loads(f.readline())
+        return header, [tuple(json.loads(line)) for line in f]
+
+
+def _user(user_id, bot=False):
+    return {'id': str(user_id), 'username': f'user{user_id}', 'discriminator': '0', 'avatar': None,
+            'global_name': None, 'bot': bot}
+
+
+def _json_response(data, status=200):
+    # discord.py only decodes bodies whose content type is exactly application/json (no charset).
+    return web.Response(body=json.dumps(data).encode(), status=status, headers={'Content-Type': 'application/json'})
+
+
+class StubRestServer:
+    """Local stand-in for the Discord REST API: accepts every request and answers with minimal payloads."""
+
+    def __init__(self, bot_user):
+        self.bot_user = bot_user
+        self.requests = {}
+        self.next_id = 1 << 60
+        self.runner = None
+        self.port = None
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_route('*', '/{path:.*}', self.handle)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, '127.0.0.1', 0)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+        return f'http://127.0.0.1:{self.port}/api/v10'
+
+    async def stop(self):
+        if self.runner is not None:
+            await self.runner.cleanup()
+
+    def _snowflake(self):
+        self.next_id += 1
+        return str(self.next_id)
+
+    async def handle(self, request):
+        parts = request.path.split('/')[3:]
+        # Count by route template, with snowflakes collapsed.
+        route = '/'.join('{id}' if part.isdigit() else part for part in parts)
+        key = f'{request.method} /{route}'
+        self.requests[key] = self.requests.get(key, 0) + 1
+
+        if request.method == 'GET' and parts == ['users', '@me']:
+            return _json_response(self.bot_user)
+        if request.method == 'GET' and parts == ['oauth2', 'applications', '@me']:
+            return _json_response({'id': self.bot_user['id'], 'name': self.bot_user['username'], 'description': '',
+                                   'icon': None, 'bot_public': False, 'bot_require_code_grant': False,
+                                   'owner': _user(0), 'verify_key': '', 'flags': 0})
+        if request.method == 'POST' and len(parts) == 3 and parts[0] == 'channels' and parts[2] == 'messages':
+            body = {}
+            if request.content_type == 'application/json':
+                body = await request.json()
+            return _json_response({
+                'id': self._snowflake(), 'channel_id': parts[1], 'author': self.bot_user,
+                'content': body.get('content') or '', 'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+                'edited_timestamp': None, 'tts': False, 'mention_everyone': False, 'mentions': [],
+                'mention_roles': [], 'attachments': [], 'embeds': body.get('embeds') or [], 'pinned': False, 'type': 0,
+            })
+        if request.method == 'POST' and parts == ['users', '@me', 'channels']:
+            body = await request.json()
+            return _json_response({'id': self._snowflake(), 'type': 1, 'recipients': [_user(body['recipient_id'])]})
+        if request.method in ('PUT', 'DELETE'):
+            return web.Response(status=204)
+        return _json_response({'message': 'Not stubbed', 'code': 0}, status=404)
+
+
+def _prepare_workdir(workdir):
+    """Copy the bot's config files into workdir, with a dummy token and recording disabled."""
+    config = {"prefix": "!"}
+    if os.path.exists(os.path.join(ROOT, 'config.json')):
+        with open(os.path.join(ROOT, 'config.json'), 'r') as f:
+            config = json.load(f)
+    config['token'] = 'replay'
+    config.pop('gateway_recording', None)
+    with open(os.path.join(workdir, 'config.json'), 'w') as f:
+        json.dump(config, f)
+    for name in ('functions.json', 'role_configs.json'):
+        if os.path.exists(os.path.join(ROOT, name)):
+            shutil.copy(os.path.join(ROOT, name), workdir)
+    if os.path.isdir(os.path.join(ROOT, 'server_configs')):
+        shutil.copytree(os.path.join(ROOT, 'server_configs'), os.path.join(workdir, 'server_configs'))
+
+
+def _percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+async def replay(path, speed, drain_timeout=30.0):
+    """Feed a recording through bot.py's parsers against the stub REST server and return a report dict."""
+    header, records = read_recording(path)
+    ready = next((data for _, event, data in records if event == 'READY'), None)
+    if ready is None:
+        raise ValueError(f"{path} has no READY event; start recording before the bot connects.")
+
+    stub = StubRestServer(ready['user'])
+    discord.http.Route.BASE = await stub.start()
+    sys.path.insert(0, ROOT)
+    import bot as odin
+
+    async def skip_sync(bot, extensions=(), **kwargs):
+        return False
+
+    # Replays measure event handling; a global command sync would only hit the stub with a bulk PUT.
+    odin.sync_app_commands = skip_sync
+    bot = odin.bot
+    state = bot._connection
+    # There is no gateway to request members from, and nothing else to wait for before on_ready.
+    state._chunk_guilds = False
+    state.guild_ready_timeout = 0
+
+    fed, latencies, outcomes, failures = {}, [], {'completed': 0, 'failed': 0}, {}
+
+    def finished(ctx, outcome):
+        started = fed.pop(ctx.message.id, None)
+        if started is not None:
+            latencies.append(time.perf_counter() - started)
+        outcomes[outcome] += 1
+
+    async def on_command_completion(ctx):
+        finished(ctx, 'completed')
+
+    async def on_command_error(ctx, error):
+        finished(ctx, 'failed')
+        failures[type(error).__name__] = failures.get(type(error).__name__, 0) + 1
+
+    bot.add_listener(on_command_completion)
+    bot.add_listener(on_command_error)
+    await bot.login('replay')
+
+    counts = {}
+    start = time.perf_counter()
+    first_offset = records[0][0] if records else 0
+    for offset, event, data in records:
+        if speed:
+            delay = start + (offset - first_offset) / speed - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        parse = state.parsers.get(event)
+        if parse is None:
+            continue
+        if event == 'MESSAGE_CREATE':
+            fed[int(data['id'])] = time.perf_counter()
+        parse(data)
+        counts[event] = counts.get(event, 0) + 1
+        await asyncio.sleep(0)
+    fed_done = time.perf_counter()
+
+    # Wait for commands still in flight; messages that were not commands never complete.
+    deadline = fed_done + drain_timeout
+    while time.perf_counter() < deadline:
+        pending = [task for task in asyncio.all_tasks() if task.get_name().startswith('discord.py: on_')]
+        if not pending:
+            break
+        await asyncio.sleep(0.05)
+    elapsed = time.perf_counter() - start
+
+    await bot.close()
+    await stub.stop()
+
+    latencies.sort()
+    commands_done = outcomes['completed'] + outcomes['failed']
+    report = {
+        'recording': os.path.basename(path),
+        'speed': f'{speed}x' if speed else 'max',
+        'events': sum(counts.values()),
+        'event_counts': counts,
+        'elapsed_s': round(elapsed, 3),
+        'events_per_sec': round(sum(counts.values()) / (fed_done - start), 1) if fed_done > start else None,
+        'commands_completed': outcomes['completed'],
+        'commands_failed': outcomes['failed'],
+        'commands_per_sec': round(commands_done / elapsed, 1) if elapsed else None,
+        'failures': failures,
+        'rest_requests': stub.requests,
+    }
+    if latencies:
+        report.update({
+            'latency_p50_ms': round(_percentile(latencies, 0.50) * 1000, 2),
+            'latency_p95_ms': round(_percentile(latencies, 0.95) * 1000, 2),
+            'latency_p99_ms': round(_percentile(latencies, 0.99) * 1000, 2),
+            'latency_max_ms': round(latencies[-1] * 1000, 2),
+        })
+    return report
+
+
+def synthesize(path, guilds, members, messages, rate, commands):
+    """Write a synthetic recording: READY, one GUILD_CREATE per guild and `messages` command messages."""
+    bot_user = _user(1, bot=True)
+    records = []
+    guild_channels = []
+    for g in range(guilds):
+        guild_id = (g + 1) << 32
+        payload, channel_ids, member_ids = synthetic_guild(guild_id, members, channels=10, roles=20)
+        records.append([0, 'GUILD_CREATE', payload])
+        guild_channels.append((guild_id, channel_ids, member_ids))
+    ready = {'v': 10, 'user': bot_user, 'session_id': 'synthetic', 'resume_gateway_url': 'wss://localhost',
+             'guilds': [{'id': str(guild_id), 'unavailable': True} for guild_id, _, _ in guild_channels],
+             'application': {'id': '1', 'flags': 0}}
+    records.insert(0, [0, 'READY', ready])
+    for i in range(messages):
+        guild_id, channel_ids, member_ids = guild_channels[i % guilds]
+        author = member_ids[(i * 7919) % len(member_ids)]
+        member = {'roles': [], 'joined_at': '2024-01-01T00:00:00+00:00', 'deaf': False, 'mute': False, 'flags': 0}
+        records.append([round(i / rate, 4), 'MESSAGE_CREATE', {
+            'id': str(guild_id + 10 ** 8 + i), 'channel_id': str(channel_ids[i % len(channel_ids)]),
+            'guild_id': str(guild_id), 'author': _user(author), 'member': member,
+            'content': commands[i % len(commands)], 'timestamp': '2024-01-01T00:00:00+00:00',
+            'edited_timestamp': None, 'tts': False, 'mention_everyone': False, 'mentions': [],
+            'mention_roles': [], 'attachments': [], 'embeds': [], 'pinned': False, 'type': 0,
+        }])
+    with gzip.open(path, 'wt', encoding='utf-8') as f:
+        f.write(json.dumps({"version": 1, "recorded": "synthetic", "events": list(STATE_EVENTS) + ['MESSAGE_CREATE']}) + "\n")
+        for record in records:
+            f.write(json.dumps(record, separators=(',', ':')) + "\n")
+
+
+def parse_speed(value):
+    if value == 'max':
+        return None
+    speed = float(value.rstrip('x'))
+    if speed <= 0:
+        raise argparse.ArgumentTypeError("speed must be positive or 'max'")
+    return speed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a recorded gateway session into bot.py against a local stub REST server.")
+    parser.add_argument('recording', help="gzip JSON-lines recording (see the gateway_recording config key).")
+    parser.add_argument('--speed', type=parse_speed, default=1.0, help="1, 10x, ... or 'max' (default: real time).")
+    parser.add_argument('--synthesize', action='store_true', help="Write a synthetic recording to RECORDING and exit.")
+    parser.add_argument('--guilds', type=int, default=10)
+    parser.add_argument('--members', type=int, default=500)
+    parser.add_argument('--messages', type=int, default=2000)
+    parser.add_argument('--rate', type=float, default=50.0, help="Synthetic messages per second.")
+    parser.add_argument('--commands', default='!ping,!cmd_bank,!help,!info',
+                        help="Comma-separated message contents for --synthesize.")
+    args = parser.parse_args()
+
+    if args.synthesize:
+        synthesize(args.recording, args.guilds, args.members, args.messages, args.rate, args.commands.split(','))
+        print(f"Wrote synthetic recording to {args.recording}")
+        return
+
+    path = os.path.abspath(args.recording)
+    with tempfile.TemporaryDirectory(prefix='odin-replay-') as workdir:
+        _prepare_workdir(workdir)
+        os.chdir(workdir)
+        logging.disable(logging.INFO)
+        report = asyncio.run(replay(path, args.speed))
+        os.chdir(ROOT)
+
+    for key, value in report.items():
+        if isinstance(value, dict):
+            print(f"{key}:")
+            for name, count in sorted(value.items(), key=lambda item: -item[1]):
+                print(f"  {name}: {count}")
+        else:
+            print(f"{key}: {value}")
+
+
+if __name__ == '__main__':
+    main()
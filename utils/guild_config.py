@@ -0,0 +1,107 @@
+import json
+import logging
+import os
+
+from utils.tracing import span
+
+logger = logging.getLogger(__name__)
+
+CONFIG_DIR = './server_configs'
+
+
+def shard_for(guild_id, shard_count):
+    """Shard that owns a guild, per Discord's sharding formula."""
+    return (guild_id >> 22) % max(shard_count, 1)
+
+
+class GuildConfigCache:
+    """In-memory copy of ./server_configs/<guild_id>.json, partitioned by shard.
+
+    Each worker only ever touches the partitions for the shards it runs, so a
+    cluster never holds every guild's config in every process.
+    """
+
+    def __init__(self, shard_count=1, config_dir=CONFIG_DIR):
+        self.shard_count = shard_count or 1
+        self.config_dir = config_dir
+        self.partitions = {}
+
+    def _path(self, guild_id):
+        return os.path.join(self.config_dir, f'{guild_id}.json')
+
+    def _partition(self, guild_id):
+        return self.partitions.setdefault(shard_for(guild_id, self.shard_count), {})
+
+    def get(self, guild_id):
+        """Return the guild's config dict, reading it from disk on first use."""
+        partition = self._partition(guild_id)
+        if guild_id in partition:
+            return partition[guild_id]
+
+        path = self._path(guild_id)
+        try:
+            with span("guild_config.load"), open(path, 'r') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            data = {"cogs": []}
+        except json.JSONDecodeError:
+            logger.error(f"Invalid JSON in {path}. Using an empty config.")
+            data = {"cogs": []}
+        data.setdefault("cogs", [])
+        partition[guild_id] = data
+        return data
+
+    def cogs(self, guild_id):
+        return self.get(guild_id)["cogs"]
+
+    def save(self, guild_id, data):
+        self._partition(guild_id)[guild_id] = data
+        self._write(self._path(guild_id), data)
+
+    def invalidate(self, guild_id):
+        self._partition(guild_id).pop(guild_id, None)
+
+    def cached(self):
+        """Iterate over (guild_id, config) pairs for every cached guild."""
+        for partition in self.partitions.values():
+            yield from partition.items()
+
+    def _write(self, path, data):
+        try:
+            with open(path, 'w') as f:
+                json.dump(data, f, indent=4)
+        except OSError as e:
+            logger.error(f"Failed to write {path}: {e}")
+
+
+class PrefixResolver:
+    """Callable `command_prefix` backed by an in-memory guild -> prefix map.
+
+    Runs on every message, so after a guild's first message it is a single dict
+    lookup. Mentioning the bot always works as a prefix.
+    """
+
+    def __init__(self, guild_configs, default):
+        self.guild_configs = guild_configs
+        self.default = default
+        self.prefixes = {}
+
+    def get(self, guild_id):
+        prefix = self.prefixes.get(guild_id)
+        if prefix is None:
+            prefix = self.prefixes[guild_id] = self.guild_configs.get(guild_id).get('prefix', self.default)
+        return prefix
+
+    def set(self, guild_id, prefix):
+        data = self.guild_configs.get(guild_id)
+        data['prefix'] = prefix
+        self.guild_configs.save(guild_id, data)
+        self.prefixes[guild_id] = prefix
+
+    def invalidate(self, guild_id):
+        self.prefixes.pop(guild_id, None)
+
+    def __call__(self, bot, message):
+        prefix = self.default if message.guild is None else self.get(message.guild.id)
+        user_id = bot.user.id
+        return [f'<@{user_id}> ', f'<@!{user_id}> ', prefix]
@@ -0,0 +1,212 @@
+import asyncio
+import collections
+import contextvars
+import io
+import logging
+import os
+import signal
+import time
+
+logger = logging.getLogger(__name__)
+
+JOBS_DIR = 'jobs'
+KILL_GRACE = 5.0
+
+
+class JobLimitReached(Exception):
+    """Raised when as many background jobs are running as the manager allows."""
+
+    def __init__(self, limit):
+        super().__init__(f"{limit} background jobs are already running")
+        self.limit = limit
+
+
+class Job:
+    __slots__ = ('id', 'command', 'owner_id', 'guild_id', 'channel', 'started', 'ended', 'status', 'returncode',
+                 'process', 'task', 'written', 'dropped', 'path')
+
+    def __init__(self, id, command, owner_id, guild_id, channel, path):
+        self.id = id
+        self.command = command
+        self.owner_id = owner_id
+        self.guild_id = guild_id
+        self.channel = channel
+        self.started = time.time()
+        self.ended = None
+        self.status = 'starting'
+        self.returncode = None
+        self.process = None
+        self.task = None
+        self.written = 0
+        self.dropped = 0
+        self.path = path
+
+    @property
+    def running(self):
+        return self.ended is None
+
+    @property
+    def runtime(self):
+        return (self.ended or time.time()) - self.started
+
+
+class JobManager:
+    """Shell commands run as tracked background jobs, with their output kept on disk.
+
+    Jobs run through asyncio subprocesses in their own process group, so nothing
+    blocks the event loop and a kill reaches every child. Output goes to
+    <directory>/<id>.log; once that reaches half of `max_bytes` it is moved to
+    <id>.log.1 and a fresh file is started, so each job keeps at most `max_bytes`
+    of its most recent output. Only the last `keep` finished jobs are kept.
+    """
+
+    def __init__(self, directory=JOBS_DIR, max_running=2, max_bytes=1024 * 1024, timeout=3600, keep=50, notify=None):
+        self.directory = directory
+        self.max_running = max_running
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self.keep = keep
+        self.notify = notify
+        self.jobs = collections.OrderedDict()
+        os.makedirs(directory, exist_ok=True)
+        # Continue numbering after the output files of earlier runs instead of overwriting them.
+        previous = [(int(name.split('.', 1)[0]), name) for name in os.listdir(directory) if name.split('.', 1)[0].isdigit()]
+        self.next_id = max((job_id for job_id, _ in previous), default=0) + 1
+        for job_id, name in previous:
+            if job_id < self.next_id - keep:
+                os.remove(os.path.join(directory, name))
+
+    def running(self):
+        return [job for job in self.jobs.values() if job.running]
+
+    def get(self, job_id):
+        return self.jobs.get(job_id)
+
+    def start(self, command, owner_id, guild_id=None, channel=None, cwd=None):
+        if len(self.running()) >= self.max_running:
+            raise JobLimitReached(self.max_running)
+        job = Job(self.next_id, command, owner_id, guild_id, channel, os.path.join(self.directory, f'{self.next_id}.log'))
+        self.next_id += 1
+        self.jobs[job.id] = job
+        # The job outlives the command that started it, so don't carry that command's context along.
+        job.task = asyncio.create_task(self._run(job, cwd), context=contextvars.Context())
+        self._prune()
+        return job
+
+    async def _run(self, job, cwd):
+        try:
+            job.process = await asyncio.create_subprocess_shell(
+                job.command, cwd=cwd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT,
+                stdin=asyncio.subprocess.DEVNULL, start_new_session=True)
+            job.status = 'running'
+            logger.info(f"Started job #{job.id} (pid {job.process.pid}): {job.command}")
+            try:
+                await asyncio.wait_for(self._copy_output(job), self.timeout)
+            except asyncio.TimeoutError:
+                job.status = 'timed out'
+                await self._terminate(job)
+            job.returncode = await job.process.wait()
+            if job.status == 'running':
+                job.status = 'finished' if job.returncode == 0 else 'failed'
+        except asyncio.CancelledError:
+            job.status = 'killed'
+            if job.process is not None:
+                await self._terminate(job)
+                job.returncode = job.process.returncode
+        except Exception as e:
+            job.status = 'failed'
+            logger.error(f"Job #{job.id} failed: {e}")
+        finally:
+            job.ended = time.time()
+        logger.info(f"Job #{job.id} {job.status} after {job.runtime:.1f}s (exit {job.returncode})")
+        if self.notify:
+            try:
+                self.notify(job)
+            except Exception as e:
+                logger.error(f"Failed to report job #{job.id}: {e}")
+
+    async def _copy_output(self, job):
+        half = max(self.max_bytes // 2, 1)
+        output = open(job.path, 'wb')
+        try:
+            while True:
+                chunk = await job.process.stdout.read(65536)
+                if not chunk:
+                    return
+                job.written += len(chunk)
+                while chunk:
+                    if output.tell() >= half:
+                        # Rotate: the previous half becomes <id>.log.1, which is what bounds the job's disk use.
+                        output.close()
+                        if os.path.exists(f'{job.path}.1'):
+                            job.dropped += os.path.getsize(f'{job.path}.1')
+                        os.replace(job.path, f'{job.path}.1')
+                        output = open(job.path, 'wb')
+                    room = half - output.tell()
+                    output.write(chunk[:room])
+                    chunk = chunk[room:]
+                output.flush()
+        finally:
+            output.close()
+
+    async def _terminate(self, job):
+        if job.process.returncode is not None:
+            return
+        try:
+            os.killpg(job.process.pid, signal.SIGTERM)
+            try:
+                await asyncio.wait_for(job.process.wait(), KILL_GRACE)
+            except asyncio.TimeoutError:
+                os.killpg(job.process.pid, signal.SIGKILL)
+                await job.process.wait()
+        except ProcessLookupError:
+            pass
+
+    def kill(self, job_id):
+        """Cancel a running job; returns the job, or None if it isn't running."""
+        job = self.jobs.get(job_id)
+        if job is None or not job.running:
+            return None
+        job.task.cancel()
+        return job
+
+    def output(self, job):
+        """Everything still on disk for a job, oldest first."""
+        data = b''
+        for path in (f'{job.path}.1', job.path):
+            try:
+                with open(path, 'rb') as f:
+                    data += f.read()
+            except FileNotFoundError:
+                pass
+        return data
+
+    def tail(self, job, limit=1500):
+        with open(job.path, 'rb') if os.path.exists(job.path) else io.BytesIO() as f:
+            f.seek(0, os.SEEK_END)
+            f.seek(max(0, f.tell() - limit * 4))
+            text = f.read().decode(errors='replace')
+        if len(text) < limit and os.path.exists(f'{job.path}.1'):
+            text = self.output(job).decode(errors='replace')
+        return text[-limit:]
+
+    def _prune(self):
+        finished = [job for job in self.jobs.values() if not job.running]
+        for job in finished[:max(0, len(finished) - self.keep)]:
+            del self.jobs[job.id]
+            for path in (job.path, f'{job.path}.1'):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+    def shutdown(self):
+        """Kill every running job's process group; used before the bot exits or restarts."""
+        for job in self.running():
+            if job.process is not None and job.process.returncode is None:
+                try:
+                    os.killpg(job.process.pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+            if job.task is not None:
+                job.task.cancel()
@@ -0,0 +1,151 @@
+import ast
+import asyncio
+import glob
+import importlib
+import importlib.util
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+def enabled_cog_union(config_dir='./server_configs', include=None):
+    """Every cog name enabled by at least one guild config on disk.
+
+    `include`, if given, is called with each guild id to restrict the union
+    (cluster workers only care about guilds on their own shards).
+    """
+    cogs = set()
+    for path in glob.glob(os.path.join(config_dir, '*.json')):
+        guild_id = os.path.splitext(os.path.basename(path))[0]
+        if include and not (guild_id.isdigit() and include(int(guild_id))):
+            continue
+        try:
+            with open(path, 'r') as f:
+                cogs.update(json.load(f).get('cogs', []))
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning(f"Skipping unreadable guild config {path}: {e}")
+    return cogs
+
+
+def cog_imports(cog_name):
+    """Return (modules, cog_deps) imported at the top level of cogs/<cog_name>.py.
+
+    The file is found the way `load_extension` will import it, so this works
+    from any working directory.
+    """
+    try:
+        spec = importlib.util.find_spec(f'cogs.{cog_name}')
+    except ImportError as e:
+        spec = None
+        logger.warning(f"Could not find cogs.{cog_name}: {e}")
+    path = spec.origin if spec is not None and spec.origin else os.path.join('cogs', f'{cog_name}.py')
+    try:
+        with open(path, 'r') as f:
+            tree = ast.parse(f.read(), filename=path)
+    except (OSError, SyntaxError) as e:
+        logger.warning(f"Could not parse {path} for imports: {e}")
+        return set(), set()
+
+    modules, cog_deps = set(), set()
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            names = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module:
+            names = [node.module]
+        else:
+            continue
+        for name in names:
+            if name.startswith('cogs.'):
+                cog_deps.add(name.split('.')[1])
+            else:
+                modules.add(name)
+    cog_deps.discard(cog_name)
+    return modules, cog_deps
+
+
+def dependency_order(cogs, deps):
+    """Order cogs so that every cog comes after the cogs it imports."""
+    remaining = {cog: deps.get(cog, set()) & set(cogs) for cog in cogs}
+    ordered = []
+    while remaining:
+        ready = sorted(cog for cog, needs in remaining.items() if not needs)
+        if not ready:
+            logger.warning(f"Import cycle between cogs {sorted(remaining)}; loading them alphabetically.")
+            ready = sorted(remaining)
+        for cog in ready:
+            ordered.append(cog)
+            del remaining[cog]
+        for needs in remaining.values():
+            needs.difference_update(ready)
+    return ordered
+
+
+def _timed_import(module):
+    start = time.perf_counter()
+    try:
+        importlib.import_module(module)
+    except Exception as e:
+        logger.warning(f"Pre-import of {module} failed: {e}")
+    return time.perf_counter() - start
+
+
+async def preimport(modules, max_workers=4):
+    """Import modules concurrently in a thread pool; returns {module: seconds}."""
+    loop = asyncio.get_running_loop()
+    modules = sorted(modules)
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='preimport') as pool:
+        timings = await asyncio.gather(*(loop.run_in_executor(pool, _timed_import, m) for m in modules))
+    return dict(zip(modules, timings))
+
+
+async def load_startup_extensions(bot, available_cogs, lazy_cogs=(), include=None, max_workers=4):
+    """Load the base cog plus every cog enabled by any guild before the bot goes online.
+
+    Cogs listed in `lazy_cogs` are skipped here and loaded on first use by
+    `load_server_cogs`. Returns {cog: {"imports": s, "load": s}} for reporting.
+    """
+    wanted = {'general'} | {cog for cog in enabled_cog_union(include=include) if cog in available_cogs}
+    wanted -= set(lazy_cogs) - {'general'}
+    wanted = {cog for cog in wanted if f'cogs.{cog}' not in bot.extensions}
+    if not wanted:
+        return {}
+
+    imports, deps = {}, {}
+    for cog in wanted:
+        imports[cog], deps[cog] = cog_imports(cog)
+    module_times = await preimport(set().union(*imports.values()), max_workers=max_workers)
+
+    report = {}
+    for cog in dependency_order(wanted, deps):
+        start = time.perf_counter()
+        try:
+            await bot.load_extension(f'cogs.{cog}')
+        except Exception as e:
+            logger.error(f"Failed to load cog cogs.{cog} at startup: {e}")
+            continue
+        report[cog] = {
+            "imports": max((module_times.get(m, 0.0) for m in imports[cog]), default=0.0),
+            "load": time.perf_counter() - start,
+        }
+
+    for cog, timing in sorted(report.items(), key=lambda item: -(item[1]["imports"] + item[1]["load"])):
+        logger.info(f"Startup load cogs.{cog}: imports {timing['imports'] * 1000:.1f}ms, load {timing['load'] * 1000:.1f}ms")
+    return report
+
+
+def watch_extensions(bot, callback):
+    """Call `callback(action, name)` right after each successful extension load, unload or reload."""
+    for action in ('load', 'unload', 'reload'):
+        original = getattr(bot, f'{action}_extension')
+
+        def make_wrapper(action, original):
+            async def wrapper(name, *, package=None):
+                await original(name, package=package)
+                callback(action, name)
+            return wrapper
+
+        setattr(bot, f'{action}_extension', make_wrapper(action, original))
@@ -0,0 +1,110 @@
+import asyncio
+import collections
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+
+from discord.ext import commands
+
+logger = logging.getLogger(__name__)
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class LoopMonitor:
+    """Samples event-loop lag and captures the stack of callbacks that block the loop.
+
+    A sampler task sleeps for `interval` and measures how late it wakes up. A
+    watchdog thread notices when that wake-up is overdue by more than `threshold`
+    and snapshots the loop thread's stack while it is still blocked.
+    """
+
+    def __init__(self, interval=0.5, threshold=0.25, history=1200, max_events=50):
+        self.interval = interval
+        self.threshold = threshold
+        self.samples = collections.deque(maxlen=history)
+        self.slow_callbacks = collections.deque(maxlen=max_events)
+        self._expected = None
+        self._loop_thread = None
+        self._task = None
+        self._stall = None
+        self._stopped = threading.Event()
+
+    def start(self):
+        if self._task and not self._task.done():
+            return
+        self._loop_thread = threading.get_ident()
+        self._stopped.clear()
+        self._task = asyncio.create_task(self._sample())
+        threading.Thread(target=self._watch, name='loop-watchdog', daemon=True).start()
+        logger.info(f"Loop monitor started (interval {self.interval}s, threshold {self.threshold * 1000:.0f}ms)")
+
+    def stop(self):
+        self._stopped.set()
+        if self._task:
+            self._task.cancel()
+
+    async def _sample(self):
+        while True:
+            start = time.monotonic()
+            self._expected = start + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.monotonic() - self._expected)
+            self.samples.append(lag)
+            stall, self._stall = self._stall, None
+            if stall:
+                stall["duration"] = lag
+                self.slow_callbacks.append(stall)
+                logger.warning(f"Event loop blocked for {lag * 1000:.0f}ms in {stall['command'] or stall['location']}")
+
+    def _watch(self):
+        while not self._stopped.wait(self.threshold / 2):
+            expected = self._expected
+            if expected is None or self._stall is not None:
+                continue
+            if time.monotonic() - expected > self.threshold:
+                frame = sys._current_frames().get(self._loop_thread)
+                if frame is not None:
+                    self._stall = self._describe(frame)
+
+    def _describe(self, frame):
+        stack = traceback.extract_stack(frame)
+        command = cog = None
+        location = f"{stack[-1].filename}:{stack[-1].lineno}" if stack else "unknown"
+        # Walk outwards from the blocking frame to find the command being run.
+        while frame is not None:
+            ctx = frame.f_locals.get('ctx')
+            if command is None and isinstance(ctx, commands.Context) and ctx.command:
+                command = ctx.command.qualified_name
+                cog = ctx.command.cog_name
+            filename = frame.f_code.co_filename
+            if cog is None and f'{os.sep}cogs{os.sep}' in filename:
+                cog = os.path.splitext(os.path.basename(filename))[0]
+            frame = frame.f_back
+        return {
+            "at": time.time(),
+            "duration": None,
+            "command": command,
+            "cog": cog,
+            "location": location,
+            "stack": "".join(traceback.format_list([f for f in stack if f'{os.sep}asyncio{os.sep}' not in f.filename][-8:])),
+        }
+
+    def summary(self):
+        samples = list(self.samples)
+        return {
+            "samples": len(samples),
+            "mean_ms": round(sum(samples) / len(samples) * 1000, 2) if samples else 0.0,
+            "p99_ms": round(percentile(samples, 99) * 1000, 2),
+            "max_ms": round(max(samples, default=0.0) * 1000, 2),
+            "slow_callbacks": len(self.slow_callbacks),
+        }
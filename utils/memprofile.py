@@ -0,0 +1,105 @@
+import collections
+import logging
+import os
+import tracemalloc
+
+logger = logging.getLogger(__name__)
+
+# Snapshots are large; keep only the most recent few.
+MAX_SNAPSHOTS = 5
+
+_NOISE = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+    tracemalloc.Filter(False, '<unknown>'),
+)
+
+
+def _cog_for(traceback):
+    """Name of the innermost cog module on an allocation traceback, if any."""
+    for frame in reversed(traceback):
+        if f'{os.sep}cogs{os.sep}' in frame.filename or frame.filename.startswith(f'cogs{os.sep}'):
+            return os.path.splitext(os.path.basename(frame.filename))[0]
+    return None
+
+
+def _fmt_size(size):
+    sign = '-' if size < 0 else '+'
+    size = abs(size)
+    for unit in ('B', 'KiB', 'MiB'):
+        if size < 1024:
+            return f"{sign}{size:.0f}{unit}" if unit == 'B' else f"{sign}{size:.1f}{unit}"
+        size /= 1024
+    return f"{sign}{size:.1f}GiB"
+
+
+class MemoryProfiler:
+    """Labeled tracemalloc snapshots that can be diffed by line, file or cog."""
+
+    def __init__(self):
+        self.snapshots = collections.OrderedDict()
+
+    @property
+    def running(self):
+        return tracemalloc.is_tracing()
+
+    def start(self, frames=10):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+            logger.info(f"tracemalloc started with {frames} frames")
+
+    def stop(self):
+        self.snapshots.clear()
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+            logger.info("tracemalloc stopped")
+
+    def snapshot(self, label):
+        if not tracemalloc.is_tracing():
+            raise RuntimeError("tracemalloc is not running. Use `memory start` first.")
+        self.snapshots.pop(label, None)
+        self.snapshots[label] = tracemalloc.take_snapshot().filter_traces(_NOISE)
+        while len(self.snapshots) > MAX_SNAPSHOTS:
+            self.snapshots.popitem(last=False)
+        current, peak = tracemalloc.get_traced_memory()
+        return current, peak
+
+    def diff(self, old, new, group='lineno', limit=10):
+        """Return the top `limit` (key, size_diff, count_diff) rows between two snapshots."""
+        try:
+            before, after = self.snapshots[old], self.snapshots[new]
+        except KeyError as e:
+            raise KeyError(f"No snapshot labeled {e.args[0]!r}.") from None
+
+        if group in ('lineno', 'filename'):
+            stats = after.compare_to(before, group)
+            key = (lambda frame: frame.filename) if group == 'filename' else str
+            return [(key(stat.traceback[0]), stat.size_diff, stat.count_diff) for stat in stats[:limit]]
+        if group != 'cog':
+            raise ValueError("Group must be one of: lineno, filename, cog.")
+
+        totals = collections.defaultdict(lambda: [0, 0])
+        for stat in after.compare_to(before, 'traceback'):
+            entry = totals[_cog_for(stat.traceback) or '(not a cog)']
+            entry[0] += stat.size_diff
+            entry[1] += stat.count_diff
+        rows = sorted(totals.items(), key=lambda item: -abs(item[1][0]))
+        return [(cog, size, count) for cog, (size, count) in rows[:limit]]
+
+    def format_diff(self, rows):
+        return "\n".join(f"{_fmt_size(size):>10} {count:+7d}  {key}" for key, size, count in rows) or "No differences."
+
+
+def cache_summary(bot):
+    """Sizes of the discord.py caches that grow with uptime and guild size."""
+    return {
+        "guilds": len(bot.guilds),
+        "members": sum(len(guild.members) for guild in bot.guilds),
+        "users": len(bot.users),
+        "cached_messages": len(bot.cached_messages),
+        "private_channels": len(bot.private_channels),
+        "emojis": len(bot.emojis),
+        "pending_wait_for": sum(len(listeners) for listeners in bot._listeners.values()),
+        "extensions": len(bot.extensions),
+    }
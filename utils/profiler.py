@@ -0,0 +1,183 @@
+import contextlib
+import functools
+import importlib.abc
+import logging
+import os
+import sys
+import threading
+import time
+import weakref
+
+logger = logging.getLogger(__name__)
+
+
+def process_start_time():
+    """Wall-clock time the interpreter process started, falling back to now."""
+    try:
+        with open('/proc/self/stat', 'r') as f:
+            # Field 22 is the start time in clock ticks after boot; the comm field may contain spaces.
+            fields = f.read().rsplit(')', 1)[1].split()
+        start_ticks = int(fields[19])
+        with open('/proc/uptime', 'r') as f:
+            uptime = float(f.read().split()[0])
+        return time.time() - uptime + start_ticks / os.sysconf('SC_CLK_TCK')
+    except (OSError, ValueError, IndexError):
+        return time.time()
+
+
+class _TimedLoader:
+    """Proxy around a module loader that times exec_module like `-X importtime`."""
+
+    def __init__(self, loader, finder):
+        self._loader = loader
+        self._finder = finder
+
+    def __getattr__(self, name):
+        return getattr(self._loader, name)
+
+    def create_module(self, spec):
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module):
+        self._finder.enter()
+        try:
+            self._loader.exec_module(module)
+        finally:
+            self._finder.exit(module.__name__)
+            # Hand the module back its own loader, so a later reload isn't timed into a finished capture.
+            if getattr(module, '__loader__', None) is self:
+                module.__loader__ = self._loader
+            spec = getattr(module, '__spec__', None)
+            if spec is not None and spec.loader is self:
+                spec.loader = self._loader
+
+
+class _ImportTimer(importlib.abc.MetaPathFinder):
+    """Meta path hook recording self/cumulative import time for each new module."""
+
+    def __init__(self):
+        self.thread = threading.get_ident()
+        self.records = []
+        self._stack = []
+        self._finding = False
+
+    def find_spec(self, fullname, path=None, target=None):
+        if self._finding or threading.get_ident() != self.thread:
+            return None
+        self._finding = True
+        try:
+            for finder in sys.meta_path:
+                if finder is self or not hasattr(finder, 'find_spec'):
+                    continue
+                spec = finder.find_spec(fullname, path, target)
+                if spec is not None:
+                    if spec.loader is not None and hasattr(spec.loader, 'exec_module'):
+                        spec.loader = _TimedLoader(spec.loader, self)
+                    return spec
+            return None
+        finally:
+            self._finding = False
+
+    def enter(self):
+        self._stack.append([time.perf_counter(), 0.0])
+
+    def exit(self, name):
+        start, children = self._stack.pop()
+        cumulative = time.perf_counter() - start
+        if self._stack:
+            self._stack[-1][1] += cumulative
+        self.records.append((name, cumulative - children, cumulative, len(self._stack)))
+
+
+class StartupProfiler:
+    """Collects extension import timings, startup milestones and hot-path timings."""
+
+    def __init__(self):
+        self.process_start = process_start_time()
+        self.milestones = {}
+        self.extensions = {}
+        self.timings = {}
+        self._timer = None
+        self._instrumented = weakref.WeakSet()
+
+    def mark(self, name):
+        """Record the first time a milestone is reached, in seconds since process start."""
+        if name not in self.milestones:
+            self.milestones[name] = time.time() - self.process_start
+            logger.info(f"Startup milestone '{name}' reached after {self.milestones[name]:.2f}s")
+
+    @contextlib.contextmanager
+    def capture(self, extension):
+        """Time an extension load and every module it imports for the first time.
+
+        A load nested inside another (an extension loading one from its
+        `setup`) shares the outer import hook and reports its own slice of it.
+        """
+        outer = self._timer
+        timer = outer or _ImportTimer()
+        first_record = len(timer.records)
+        if outer is None:
+            self._timer = timer
+            sys.meta_path.insert(0, timer)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            total = time.perf_counter() - start
+            if outer is None:
+                sys.meta_path.remove(timer)
+                self._timer = None
+            self.extensions[extension] = {
+                "total": total,
+                "loaded_at": time.time() - self.process_start,
+                "imports": timer.records[first_record:],
+            }
+
+    def record(self, name, elapsed):
+        count, total, worst = self.timings.get(name, (0, 0.0, 0.0))
+        self.timings[name] = (count + 1, total + elapsed, max(worst, elapsed))
+
+    def timed(self, name):
+        """Decorator recording call count, total and worst latency of a coroutine."""
+        def decorator(func):
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    self.record(name, time.perf_counter() - start)
+            return wrapper
+        return decorator
+
+    def instrument(self, bot):
+        """Route every `bot.load_extension` call through `capture`; repeated calls for a bot do nothing."""
+        if bot in self._instrumented:
+            return
+        self._instrumented.add(bot)
+        original = bot.load_extension
+
+        async def load_extension(name, *, package=None):
+            with self.capture(name):
+                await original(name, package=package)
+
+        bot.load_extension = load_extension
+
+    def report(self, limit=10):
+        lines = ["Milestones (since process start):"]
+        for name, elapsed in sorted(self.milestones.items(), key=lambda item: item[1]):
+            lines.append(f"  {name}: {elapsed:.2f}s")
+
+        lines.append("Extension loads (slowest first):")
+        for name, data in sorted(self.extensions.items(), key=lambda item: -item[1]["total"])[:limit]:
+            lines.append(f"  {name}: {data['total'] * 1000:.1f}ms ({len(data['imports'])} new modules)")
+            heaviest = sorted(data["imports"], key=lambda record: -record[2])
+            for module, self_time, cumulative, depth in heaviest[:3]:
+                if module != name:
+                    lines.append(f"    {module}: self {self_time * 1e6:.0f}us | cumulative {cumulative * 1e6:.0f}us")
+
+        if self.timings:
+            lines.append("Hot paths:")
+            for name, (count, total, worst) in sorted(self.timings.items(), key=lambda item: -item[1][1]):
+                lines.append(f"  {name}: {count} calls, avg {total / count * 1000:.2f}ms, max {worst * 1000:.2f}ms")
+        return "\n".join(lines)
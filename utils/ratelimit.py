@@ -0,0 +1,106 @@
+import collections
+import logging
+import time
+
+from discord.ext import commands
+
+from utils.catalog import cog_key
+
+logger = logging.getLogger(__name__)
+
+# (invocations, per seconds) applied when neither the registry nor config.json says otherwise.
+DEFAULT_LIMITS = {"user": (5, 10.0), "guild": (30, 10.0)}
+
+
+class RateLimited(commands.CheckFailure):
+    def __init__(self, scope, retry_after):
+        self.scope = scope
+        self.retry_after = retry_after
+        super().__init__(f"Rate limited ({scope}); retry in {retry_after:.1f}s.")
+
+
+class TokenBucket:
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated')
+
+    def __init__(self, count, per, now):
+        self.capacity = float(count)
+        self.rate = count / per
+        self.tokens = self.capacity
+        self.updated = now
+
+    def refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def retry_after(self):
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def idle(self, now):
+        """True once the bucket would be full again, i.e. it holds no state worth keeping."""
+        return self.tokens + (now - self.updated) * self.rate >= self.capacity
+
+
+class RateLimiter:
+    """Token buckets per (scope, user/guild id, command), configured per cog in the command registry.
+
+    A cog opts into its own limits with a "rate_limit" entry in functions.json, e.g.
+    {"user": [2, 10], "guild": [10, 10], "commands": {"function_generator": {"user": [1, 60]}}}.
+    A limit of null disables that scope. Buckets live in an LRU map capped at
+    `max_buckets`; idle buckets are dropped lazily as new ones are created.
+    """
+
+    def __init__(self, registry, defaults=None, max_buckets=10000):
+        self.registry = registry
+        self.defaults = {**DEFAULT_LIMITS, **(defaults or {})}
+        self.max_buckets = max_buckets
+        self.buckets = collections.OrderedDict()
+        self.rejected = 0
+
+    def limits_for(self, command):
+        config = self.registry.setting(cog_key(command), "rate_limit", {}) or {}
+        overrides = config.get("commands", {}).get(command.qualified_name, {})
+        limits = {}
+        for scope in self.defaults:
+            limit = overrides.get(scope, config.get(scope, self.defaults[scope]))
+            if limit:
+                limits[scope] = limit
+        return limits
+
+    def _bucket(self, key, limit, now):
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = self.buckets[key] = TokenBucket(*limit, now)
+            self._expire(now)
+        else:
+            self.buckets.move_to_end(key)
+            bucket.refill(now)
+        return bucket
+
+    def _expire(self, now):
+        # Drop a few idle buckets from the cold end, then enforce the hard cap. A bucket touched at `now`
+        # belongs to the check in progress: it looks idle before its token is taken, but must stay.
+        for _ in range(4):
+            key, oldest = next(iter(self.buckets.items()))
+            if not oldest.idle(now) or oldest.updated == now:
+                break
+            del self.buckets[key]
+        while len(self.buckets) > self.max_buckets:
+            self.buckets.popitem(last=False)
+
+    def check(self, ctx):
+        """Consume a token from every applicable bucket, or raise RateLimited without consuming any."""
+        now = time.monotonic()
+        ids = {"user": ctx.author.id, "guild": ctx.guild.id if ctx.guild else None}
+        buckets = []
+        for scope, limit in self.limits_for(ctx.command).items():
+            if ids.get(scope) is None:
+                continue
+            bucket = self._bucket((scope, ids[scope], ctx.command.qualified_name), limit, now)
+            retry_after = bucket.retry_after()
+            if retry_after:
+                self.rejected += 1
+                raise RateLimited(scope, retry_after)
+            buckets.append(bucket)
+        for bucket in buckets:
+            bucket.tokens -= 1
+        return True
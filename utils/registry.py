@@ -0,0 +1,203 @@
+import asyncio
+import copy
+import fcntl
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+FLUSH_DELAY = 2.0
+
+
+class CommandRegistry:
+    """Single in-memory source of truth for functions.json.
+
+    Cogs no longer rewrite the file themselves: their commands are registered
+    here when the extension loads, and the snapshot is written back in one
+    batch, only when its content actually changed. Per-cog settings stored
+    alongside "commands" (for example "rate_limit") are preserved.
+
+    Several cluster workers share the file, so a flush never writes this
+    process's whole snapshot: under a lock it re-reads the file and applies only
+    what this process changed (its registrations and renames) on top of it.
+    """
+
+    def __init__(self, path='functions.json'):
+        self.path = path
+        self.data = {"cogs": {}, "bot_commands": {}}
+        # Commands as registered by this process, before renames; None holds bot.py's own commands.
+        self._registered = {}
+        # Renames made here and not yet written: (cog name or None, original name, new name).
+        self._renames = []
+        self._dirty = False
+        self._flush_handle = None
+        self.load()
+
+    def _read(self):
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            logger.warning(f"{self.path} not found, starting with an empty registry.")
+            data = {}
+        except json.JSONDecodeError:
+            logger.error(f"{self.path} is invalid JSON, starting with an empty registry.")
+            data = {}
+        data.setdefault("cogs", {})
+        data.setdefault("bot_commands", {})
+        return data
+
+    def load(self):
+        """Re-read the file, e.g. after another worker changed it, keeping this process's own changes."""
+        self.data = self._merge(self._read())
+
+    # Registration
+
+    def register_bot_commands(self, commands):
+        self._registered[None] = dict(commands)
+        self.data["bot_commands"] = self._apply_renames(self.data.get("bot_renames", {}), commands)
+        self._changed()
+
+    def register_cog(self, cog_name, commands):
+        self._registered[cog_name] = dict(commands)
+        entry = self.data["cogs"].setdefault(cog_name, {})
+        entry["commands"] = self._apply_renames(entry.get("renamed", {}), commands)
+        self._changed()
+
+    def sync_extension(self, bot, extension):
+        """Register the commands of every cog defined by `extension` (e.g. 'cogs.time')."""
+        cog_name = extension.rsplit('.', 1)[-1]
+        commands = {}
+        for cog in bot.cogs.values():
+            if type(cog).__module__ == extension:
+                commands.update({c.name: c.short_doc for c in cog.get_commands() if not c.hidden})
+        if commands:
+            self.register_cog(cog_name, commands)
+
+    def on_extension_change(self, bot):
+        def callback(action, name):
+            if action != 'unload':
+                self.sync_extension(bot, name)
+        return callback
+
+    @staticmethod
+    def _apply_renames(renames, commands):
+        return {renames.get(name, name): description for name, description in commands.items()}
+
+    @staticmethod
+    def _rename_in(data, cog_name, original, new_name):
+        if cog_name is None:
+            section = data["bot_commands"]
+            renames = data.setdefault("bot_renames", {})
+        else:
+            entry = data["cogs"].setdefault(cog_name, {})
+            section = entry.setdefault("commands", {})
+            renames = entry.setdefault("renamed", {})
+        current = renames.get(original, original)
+        if current in section:
+            section[new_name] = section.pop(current)
+        renames[original] = new_name
+
+    def _merge(self, data):
+        """`data` from the file with this process's renames and registrations applied on top."""
+        data = copy.deepcopy(data)
+        for cog_name, original, new_name in self._renames:
+            self._rename_in(data, cog_name, original, new_name)
+        for cog_name, commands in self._registered.items():
+            if cog_name is None:
+                data["bot_commands"] = self._apply_renames(data.get("bot_renames", {}), commands)
+            else:
+                entry = data["cogs"].setdefault(cog_name, {})
+                entry["commands"] = self._apply_renames(entry.get("renamed", {}), commands)
+        return data
+
+    # Queries
+
+    def available_cogs(self):
+        return set(self.data["cogs"])
+
+    def cog_settings(self, cog_name):
+        return self.data["cogs"].get(cog_name, {})
+
+    def setting(self, cog_name, key, default=None):
+        """A per-cog setting from functions.json; bot-level commands read "bot_settings"."""
+        if cog_name is None:
+            return self.data.get("bot_settings", {}).get(key, default)
+        return self.cog_settings(cog_name).get(key, default)
+
+    def find(self, command_name):
+        """Return ('bot', None) or ('cog', cog_name) for a registered command, else None."""
+        if command_name in self.data["bot_commands"]:
+            return 'bot', None
+        for cog_name, entry in self.data["cogs"].items():
+            if command_name in entry.get("commands", {}):
+                return 'cog', cog_name
+        return None
+
+    def all_commands(self):
+        names = set(self.data["bot_commands"])
+        for entry in self.data["cogs"].values():
+            names.update(entry.get("commands", {}))
+        return names
+
+    def rename(self, old_name, new_name):
+        """Rename a registered command; the rename survives the cog re-registering itself."""
+        found = self.find(old_name)
+        if found is None:
+            raise KeyError(old_name)
+        kind, cog_name = found
+        if kind == 'bot':
+            renames = self.data.get("bot_renames", {})
+        else:
+            renames = self.data["cogs"][cog_name].get("renamed", {})
+        original = next((k for k, v in renames.items() if v == old_name), old_name)
+        self._rename_in(self.data, cog_name, original, new_name)
+        self._renames.append((cog_name, original, new_name))
+        self._changed()
+        return cog_name
+
+    # Persistence
+
+    @staticmethod
+    def _snapshot(data):
+        return json.dumps(data, indent=4, sort_keys=True)
+
+    def _changed(self):
+        self._dirty = True
+        self.schedule_flush()
+
+    def schedule_flush(self, delay=FLUSH_DELAY):
+        """Coalesce registrations made in quick succession into one write."""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.flush()
+            return
+        if self._flush_handle is None:
+            self._flush_handle = loop.call_later(delay, self.flush)
+
+    def flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if not self._dirty:
+            return
+        tmp_path = f'{self.path}.tmp'
+        try:
+            with open(f'{self.path}.lock', 'w') as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                current = self._read()
+                merged = self._merge(current)
+                snapshot = self._snapshot(merged)
+                if snapshot != self._snapshot(current):
+                    with open(tmp_path, 'w') as f:
+                        f.write(snapshot)
+                    os.replace(tmp_path, self.path)
+                    logger.info(f"Wrote command registry snapshot to {self.path}")
+        except OSError as e:
+            logger.error(f"Failed to write {self.path}: {e}")
+            return
+        self.data = merged
+        self._renames.clear()
+        self._dirty = False
@@ -0,0 +1,232 @@
+import asyncio
+import heapq
+import logging
+import sqlite3
+import time
+
+logger = logging.getLogger(__name__)
+
+REMINDERS_PATH = 'reminders.db'
+# Reminders due within this many seconds are held in memory; the rest stay on disk.
+LOAD_WINDOW = 300.0
+# Reminders due this close together are delivered (and deleted) as one batch.
+BATCH_SLACK = 0.5
+# A reminder whose delivery failed is tried again this many seconds later, up to MAX_ATTEMPTS deliveries in all.
+RETRY_DELAY = 60.0
+MAX_ATTEMPTS = 5
+# After a database error the scheduler waits this long before trying again.
+ERROR_DELAY = 5.0
+
+
+class Reminder:
+    __slots__ = ('id', 'due', 'user_id', 'guild_id', 'channel_id', 'message', 'mention', 'attempts')
+
+    def __init__(self, id, due, user_id, guild_id, channel_id, message, mention, attempts=0):
+        self.id = id
+        self.due = due
+        self.user_id = user_id
+        self.guild_id = guild_id
+        self.channel_id = channel_id
+        self.message = message
+        self.mention = bool(mention)
+        self.attempts = attempts
+
+
+class ReminderStore:
+    """SQLite table of pending reminders, indexed by due time and by user."""
+
+    COLUMNS = 'id, due, user_id, guild_id, channel_id, message, mention, attempts'
+
+    def __init__(self, path=REMINDERS_PATH):
+        self.db = sqlite3.connect(path)
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS reminders (
+                id INTEGER PRIMARY KEY,
+                due REAL NOT NULL,
+                user_id INTEGER NOT NULL,
+                guild_id INTEGER,
+                channel_id INTEGER,
+                message TEXT NOT NULL,
+                mention INTEGER NOT NULL DEFAULT 1,
+                attempts INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE INDEX IF NOT EXISTS reminders_due ON reminders (due);
+            CREATE INDEX IF NOT EXISTS reminders_user ON reminders (user_id, due);
+        """)
+        columns = {row[1] for row in self.db.execute('PRAGMA table_info(reminders)')}
+        if 'attempts' not in columns:
+            # Databases written before failed deliveries were counted.
+            with self.db:
+                self.db.execute('ALTER TABLE reminders ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0')
+
+    def add(self, due, user_id, guild_id, channel_id, message, mention=True):
+        with self.db:
+            cursor = self.db.execute(
+                'INSERT INTO reminders (due, user_id, guild_id, channel_id, message, mention) VALUES (?, ?, ?, ?, ?, ?)',
+                (due, user_id, guild_id, channel_id, message, int(mention)))
+        return Reminder(cursor.lastrowid, due, user_id, guild_id, channel_id, message, mention)
+
+    def window(self, after, until):
+        """Reminders due in (after, until]."""
+        rows = self.db.execute(f'SELECT {self.COLUMNS} FROM reminders WHERE due > ? AND due <= ? ORDER BY due',
+                               (after, until))
+        return [Reminder(*row) for row in rows]
+
+    def for_user(self, user_id, limit=10):
+        rows = self.db.execute(f'SELECT {self.COLUMNS} FROM reminders WHERE user_id = ? ORDER BY due LIMIT ?',
+                               (user_id, limit))
+        return [Reminder(*row) for row in rows]
+
+    def count_for_user(self, user_id):
+        return self.db.execute('SELECT COUNT(*) FROM reminders WHERE user_id = ?', (user_id,)).fetchone()[0]
+
+    def remove(self, reminder_id, user_id=None):
+        """Delete one reminder (only if it belongs to `user_id`, when given); returns whether it existed."""
+        with self.db:
+            if user_id is None:
+                cursor = self.db.execute('DELETE FROM reminders WHERE id = ?', (reminder_id,))
+            else:
+                cursor = self.db.execute('DELETE FROM reminders WHERE id = ? AND user_id = ?', (reminder_id, user_id))
+        return cursor.rowcount > 0
+
+    def reschedule_many(self, reminders):
+        """Store the new due time and attempt count of each reminder."""
+        with self.db:
+            self.db.executemany('UPDATE reminders SET due = ?, attempts = ? WHERE id = ?',
+                                [(r.due, r.attempts, r.id) for r in reminders])
+
+    def remove_many(self, reminder_ids):
+        with self.db:
+            self.db.executemany('DELETE FROM reminders WHERE id = ?', [(i,) for i in reminder_ids])
+
+    def close(self):
+        self.db.close()
+
+
+class ReminderScheduler:
+    """One background task delivering reminders from a min-heap.
+
+    Only reminders due within the next `window` seconds are read into the heap,
+    so tens of thousands of pending reminders cost a few index lookups rather
+    than a sleeping task each. Everything that is due when the task wakes is
+    handed to `deliver` as one batch. `deliver` returns the reminders that
+    failed and should be retried; those are moved `retry_delay` seconds ahead
+    and the rest are deleted in one transaction. If `deliver` raises, the
+    whole batch is retried. A reminder that failed `max_attempts` times is
+    dropped. Database errors are logged and the loop carries on.
+    """
+
+    def __init__(self, store, deliver, owns=None, window=LOAD_WINDOW, slack=BATCH_SLACK, retry_delay=RETRY_DELAY,
+                 max_attempts=MAX_ATTEMPTS, error_delay=ERROR_DELAY):
+        self.store = store
+        self.deliver = deliver
+        self.owns = owns or (lambda reminder: True)
+        self.window = window
+        self.slack = slack
+        self.retry_delay = retry_delay
+        self.max_attempts = max_attempts
+        self.error_delay = error_delay
+        self.heap = []
+        self.pending = {}
+        self.loaded_until = float('-inf')
+        self.delivered = 0
+        self.retried = 0
+        self.dropped = 0
+        self._wake = asyncio.Event()
+        self._task = None
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def add(self, due, user_id, guild_id, channel_id, message, mention=True):
+        reminder = self.store.add(due, user_id, guild_id, channel_id, message, mention)
+        if due <= self.loaded_until:
+            self._push(reminder)
+            self._wake.set()
+        return reminder
+
+    def cancel(self, reminder_id, user_id=None):
+        if not self.store.remove(reminder_id, user_id):
+            return False
+        # The heap entry is skipped when it surfaces.
+        self.pending.pop(reminder_id, None)
+        return True
+
+    def _push(self, reminder):
+        self.pending[reminder.id] = reminder
+        heapq.heappush(self.heap, (reminder.due, reminder.id))
+
+    def _load(self, until):
+        for reminder in self.store.window(self.loaded_until, until):
+            if self.owns(reminder):
+                self._push(reminder)
+        self.loaded_until = until
+
+    def _pop_due(self, now):
+        batch = []
+        while self.heap and self.heap[0][0] <= now:
+            _, reminder_id = heapq.heappop(self.heap)
+            reminder = self.pending.pop(reminder_id, None)
+            if reminder is not None:
+                batch.append(reminder)
+        return batch
+
+    async def _deliver(self, batch):
+        try:
+            failed = await self.deliver(batch) or []
+        except Exception as e:
+            logger.error(f"Failed to deliver {len(batch)} reminder(s): {e}")
+            failed = batch
+        failed_ids = {reminder.id for reminder in failed}
+        finished = [reminder.id for reminder in batch if reminder.id not in failed_ids]
+        self.delivered += len(finished)
+        retry = []
+        retry_at = time.time() + self.retry_delay
+        for reminder in failed:
+            reminder.attempts += 1
+            if reminder.attempts >= self.max_attempts:
+                logger.error(f"Dropping reminder {reminder.id} for user {reminder.user_id} "
+                             f"after {reminder.attempts} failed deliveries")
+                self.dropped += 1
+                finished.append(reminder.id)
+                continue
+            self.retried += 1
+            reminder.due = retry_at
+            retry.append(reminder)
+            # Queued in memory first, so a database error below can't lose the retry.
+            if reminder.due <= self.loaded_until:
+                self._push(reminder)
+        self.store.remove_many(finished)
+        if retry:
+            self.store.reschedule_many(retry)
+
+    async def _tick(self):
+        now = time.time()
+        if now + self.window / 2 >= self.loaded_until:
+            self._load(now + self.window)
+        batch = self._pop_due(now + self.slack)
+        if batch:
+            await self._deliver(batch)
+            return
+        next_due = self.heap[0][0] if self.heap else float('inf')
+        timeout = min(next_due, self.loaded_until - self.window / 2) - now
+        self._wake.clear()
+        try:
+            await asyncio.wait_for(self._wake.wait(), timeout=max(timeout, 0))
+        except asyncio.TimeoutError:
+            pass
+
+    async def _run(self):
+        while True:
+            try:
+                await self._tick()
+            except Exception as e:
+                # A locked or full database must not end the only task that delivers reminders.
+                logger.error(f"Reminder scheduler failed, retrying in {self.error_delay:.0f}s: {e}")
+                await asyncio.sleep(self.error_delay)
@@ -0,0 +1,279 @@
+import asyncio
+import collections
+import contextvars
+import logging
+import re
+import time
+
+import aiohttp
+import discord
+from discord.ext import commands
+
+from utils.ratelimit import TokenBucket
+from utils.tracing import span
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = 0
+BULK = 1
+
+MESSAGE_LIMIT = 2000
+# Assumed until Discord's X-RateLimit headers for a channel say otherwise: 5 messages per 5 seconds
+# per channel, 50 requests per second globally (which only a global 429 ever reports).
+CHANNEL_LIMIT = (5, 5.0)
+GLOBAL_LIMIT = (50, 1.0)
+CHANNEL_MESSAGES = re.compile(r'/channels/(\d+)/messages$')
+
+
+class _Outgoing:
+    __slots__ = ('destination', 'content', 'kwargs', 'future', 'origin')
+
+    def __init__(self, destination, content, kwargs, future, origin):
+        self.destination = destination
+        self.content = content
+        self.kwargs = kwargs
+        self.future = future
+        # The command context the message was queued for, if any; only its own bulk messages merge.
+        self.origin = origin
+
+    @property
+    def mergeable(self):
+        return not self.kwargs and isinstance(self.content, str)
+
+
+class ChannelLimit:
+    """One channel's message bucket, as last reported by Discord's X-RateLimit headers.
+
+    Until a response for the channel has been seen, `limit` messages per
+    `period` seconds are assumed.
+    """
+
+    __slots__ = ('limit', 'remaining', 'reset_at', 'period')
+
+    def __init__(self, limit, period):
+        self.limit = limit
+        self.remaining = limit
+        self.reset_at = None
+        self.period = period
+
+    def retry_after(self, now):
+        if self.reset_at is not None and now >= self.reset_at:
+            self.remaining = self.limit
+            self.reset_at = None
+        return 0.0 if self.remaining > 0 else self.reset_at - now
+
+    def take(self, now):
+        self.remaining -= 1
+        if self.reset_at is None:
+            self.reset_at = now + self.period
+
+    def update(self, status, headers, now):
+        if 'X-RateLimit-Limit' in headers:
+            self.limit = int(headers['X-RateLimit-Limit'])
+        if 'X-RateLimit-Remaining' in headers:
+            self.remaining = int(headers['X-RateLimit-Remaining'])
+        if status == 429:
+            self.remaining = 0
+        reset_after = headers.get('X-RateLimit-Reset-After') or (headers.get('Retry-After') if status == 429 else None)
+        if reset_after is not None:
+            self.reset_at = now + float(reset_after)
+        elif self.remaining <= 0 and self.reset_at is None:
+            self.reset_at = now + self.period
+
+    def idle(self, now):
+        return self.reset_at is None or now >= self.reset_at
+
+
+def _live_interaction(destination):
+    return (isinstance(destination, commands.Context) and destination.interaction is not None
+            and not destination.interaction.is_expired())
+
+
+def resolve_destination(destination):
+    """Where a queued message really goes: a command context's channel, or a user's DM channel once known."""
+    if isinstance(destination, commands.Context):
+        return destination.channel
+    if isinstance(destination, discord.abc.User):
+        return destination.dm_channel or destination
+    return destination
+
+
+def destination_key(destination):
+    """Queue key for a destination: DMs by recipient, everything else by channel.
+
+    A user, their DM channel and a command context in that DM all share one
+    queue, whether or not the DM channel is known yet, so their messages keep
+    their order.
+    """
+    if isinstance(destination, commands.Context):
+        if destination.guild is None and isinstance(destination.channel, discord.DMChannel):
+            return ('user', destination.author.id)
+        return ('channel', destination.channel.id)
+    if isinstance(destination, discord.abc.User):
+        return ('user', destination.id)
+    if isinstance(destination, discord.DMChannel) and destination.recipient is not None:
+        return ('user', destination.recipient.id)
+    return ('channel', destination.id)
+
+
+class QueuedContext(commands.Context):
+    """Command context whose sends go through the bot's OutboundScheduler.
+
+    Replies to a live slash interaction are answered directly, since they must
+    use the interaction's own response and followups.
+    """
+
+    async def send(self, content=None, *, ephemeral=False, **kwargs):
+        if _live_interaction(self):
+            return await super().send(content, ephemeral=ephemeral, **kwargs)
+        return await self.bot.sender.send(self, content, **kwargs)
+
+
+class OutboundScheduler:
+    """Per-destination send queues that pace sends to Discord's limits.
+
+    Interactive replies are always drained before bulk output queued for the same
+    destination, and each one is sent as its own message. Only adjacent
+    plain-text `priority=BULK` messages queued through the same command context
+    are joined into one message of up to 2000 characters; every caller whose
+    text went into it gets that message, so no one else's text can be edited or
+    deleted through it. Pass `trace_config()` to the client as `http_trace` so
+    channel buckets follow Discord's rate limit headers, and call `install(bot)`
+    so command replies are queued here too.
+    """
+
+    def __init__(self, channel_limit=CHANNEL_LIMIT, global_limit=GLOBAL_LIMIT):
+        now = time.monotonic()
+        self.channel_limit = tuple(channel_limit)
+        self.queues = {}
+        self.buckets = {}
+        self.global_bucket = TokenBucket(*global_limit, now)
+        self.global_blocked_until = 0.0
+        self.workers = {}
+        # DM channel id -> ('user', recipient id), so rate limit headers for a DM reach its queue's bucket.
+        self.dm_keys = {}
+        self.sent = 0
+        self.merged = 0
+
+    def install(self, bot):
+        """Build every command context as a QueuedContext, so plain `ctx.send` replies are queued."""
+        original = bot.get_context
+
+        async def get_context(origin, /, *, cls=QueuedContext):
+            return await original(origin, cls=cls)
+
+        bot.get_context = get_context
+
+    def trace_config(self):
+        """aiohttp TraceConfig that feeds message-create responses' rate limit headers back into the buckets."""
+        async def on_request_end(session, context, params):
+            self.observe(params.method, params.url.path, params.response.status, params.response.headers)
+
+        config = aiohttp.TraceConfig()
+        config.on_request_end.append(on_request_end)
+        return config
+
+    def observe(self, method, path, status, headers):
+        now = time.monotonic()
+        if status == 429 and headers.get('X-RateLimit-Global'):
+            self.global_blocked_until = now + float(headers.get('Retry-After', 1))
+            return
+        match = CHANNEL_MESSAGES.search(path)
+        if method != 'POST' or match is None:
+            return
+        channel_id = int(match[1])
+        bucket = self.buckets.get(self.dm_keys.get(channel_id, ('channel', channel_id)))
+        if bucket is not None:
+            bucket.update(status, headers, now)
+
+    def post(self, destination, content=None, *, priority=INTERACTIVE, **kwargs):
+        """Queue a message without waiting for it; failures are logged instead of raised."""
+        if _live_interaction(destination):
+            future = asyncio.ensure_future(destination.send(content, **kwargs))
+        else:
+            future = self._enqueue(destination, content, priority, kwargs)
+        future.add_done_callback(self._log_failure)
+        return future
+
+    async def send(self, destination, content=None, *, priority=INTERACTIVE, **kwargs):
+        """Queue a message and wait until it (or the merged message containing it) is sent."""
+        with span("sender.send"):
+            if _live_interaction(destination):
+                return await destination.send(content, **kwargs)
+            return await self._enqueue(destination, content, priority, kwargs)
+
+    def _enqueue(self, destination, content, priority, kwargs):
+        key = destination_key(destination)
+        origin = destination if isinstance(destination, commands.Context) else None
+        destination = resolve_destination(destination)
+        if key[0] == 'user' and isinstance(destination, discord.DMChannel):
+            self.dm_keys[destination.id] = key
+        future = asyncio.get_running_loop().create_future()
+        queues = self.queues.setdefault(key, (collections.deque(), collections.deque()))
+        queues[priority].append(_Outgoing(destination, content, kwargs, future, origin))
+        worker = self.workers.get(key)
+        if worker is None or worker.done():
+            # Run the worker outside the caller's context: it sends for every caller, not just this trace.
+            self.workers[key] = asyncio.create_task(self._drain(key), context=contextvars.Context())
+        return future
+
+    @staticmethod
+    def _log_failure(future):
+        if not future.cancelled() and future.exception() is not None:
+            logger.error(f"Queued send failed: {future.exception()}")
+
+    def _next_batch(self, queues):
+        if queues[INTERACTIVE]:
+            return [queues[INTERACTIVE].popleft()]
+        queue = queues[BULK]
+        first = queue.popleft()
+        batch = [first]
+        if first.mergeable and first.origin is not None:
+            length = len(first.content)
+            while (queue and queue[0].mergeable and queue[0].origin is first.origin
+                   and length + 1 + len(queue[0].content) <= MESSAGE_LIMIT):
+                length += 1 + len(queue[0].content)
+                batch.append(queue.popleft())
+        return batch
+
+    async def _wait_for_token(self, bucket):
+        while True:
+            now = time.monotonic()
+            self.global_bucket.refill(now)
+            delay = max(bucket.retry_after(now), self.global_bucket.retry_after(), self.global_blocked_until - now)
+            if delay <= 0:
+                bucket.take(now)
+                self.global_bucket.tokens -= 1
+                return
+            await asyncio.sleep(delay)
+
+    async def _drain(self, key):
+        queues = self.queues[key]
+        bucket = self.buckets.setdefault(key, ChannelLimit(*self.channel_limit))
+        while queues[INTERACTIVE] or queues[BULK]:
+            # Take the token first so anything queued while we wait can still be merged.
+            await self._wait_for_token(bucket)
+            batch = self._next_batch(queues)
+            first = batch[0]
+            content = "\n".join(item.content for item in batch) if len(batch) > 1 else first.content
+            try:
+                message = await first.destination.send(content, **first.kwargs)
+            except Exception as e:
+                for item in batch:
+                    if not item.future.done():
+                        item.future.set_exception(e)
+                continue
+            self.sent += 1
+            self.merged += len(batch) - 1
+            if key[0] == 'user' and getattr(message, 'channel', None) is not None:
+                self.dm_keys[message.channel.id] = key
+            for item in batch:
+                if not item.future.done():
+                    item.future.set_result(message)
+        del self.queues[key]
+        self.workers.pop(key, None)
+        if len(self.buckets) > 1000:
+            now = time.monotonic()
+            for idle_key in [k for k, b in self.buckets.items() if k not in self.queues and b.idle(now)]:
+                del self.buckets[idle_key]
+            self.dm_keys = {channel_id: k for channel_id, k in self.dm_keys.items() if k in self.buckets}
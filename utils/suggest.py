@@ -0,0 +1,138 @@
+import logging
+
+from utils.catalog import cog_key
+
+logger = logging.getLogger(__name__)
+
+
+def edit_distance(a, b):
+    """Optimal string alignment distance (Levenshtein plus adjacent transpositions)."""
+    if a == b:
+        return 0
+    if len(a) < len(b):
+        a, b = b, a
+    previous2 = None
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            cost = 0 if ca == cb else 1
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if previous2 is not None and i > 1 and j > 1 and ca == b[j - 2] and a[i - 2] == cb:
+                value = min(value, previous2[j - 2] + 1)
+            current.append(value)
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+class _Node:
+    __slots__ = ('word', 'children')
+
+    def __init__(self, word):
+        self.word = word
+        self.children = {}
+
+
+class BKTree:
+    """Metric tree over command names; removed words are tombstoned until the next rebuild."""
+
+    def __init__(self):
+        self.root = None
+        self.words = set()
+        self.removed = set()
+
+    def add(self, word):
+        self.removed.discard(word)
+        if word in self.words:
+            return
+        self.words.add(word)
+        if self.root is None:
+            self.root = _Node(word)
+            return
+        node = self.root
+        while True:
+            distance = edit_distance(word, node.word)
+            child = node.children.get(distance)
+            if child is None:
+                node.children[distance] = _Node(word)
+                return
+            node = child
+
+    def remove(self, word):
+        if word in self.words:
+            self.removed.add(word)
+            # Rebuild once tombstones make up half the tree.
+            if len(self.removed) * 2 > len(self.words):
+                live = self.words - self.removed
+                self.root, self.words, self.removed = None, set(), set()
+                for live_word in sorted(live):
+                    self.add(live_word)
+
+    def search(self, word, max_distance):
+        """Return [(distance, match)] for every live word within max_distance."""
+        results = []
+        stack = [self.root] if self.root else []
+        while stack:
+            node = stack.pop()
+            distance = edit_distance(word, node.word)
+            if distance <= max_distance and node.word not in self.removed:
+                results.append((distance, node.word))
+            low, high = distance - max_distance, distance + max_distance
+            stack.extend(child for d, child in node.children.items() if low <= d <= high)
+        return results
+
+
+class SuggestionIndex:
+    """'Did you mean' lookups over command names and aliases, scoped by cog."""
+
+    def __init__(self, bot):
+        self.bot = bot
+        self.tree = BKTree()
+        self.owners = {}
+        self.by_extension = {}
+
+    def _add_command(self, command, extension):
+        for name in (command.name, *command.aliases):
+            self.tree.add(name)
+            self.owners[name] = (command.name, cog_key(command))
+            self.by_extension.setdefault(extension, set()).add(name)
+
+    def add_bot_commands(self):
+        for command in self.bot.commands:
+            if command.cog is None and not command.hidden:
+                self._add_command(command, None)
+
+    def add_extension(self, extension):
+        for cog in self.bot.cogs.values():
+            if type(cog).__module__ == extension:
+                for command in cog.get_commands():
+                    if not command.hidden:
+                        self._add_command(command, extension)
+
+    def remove_extension(self, extension):
+        for name in self.by_extension.pop(extension, ()):
+            self.tree.remove(name)
+            self.owners.pop(name, None)
+
+    def on_extension_change(self, action, name):
+        if action in ('unload', 'reload'):
+            self.remove_extension(name)
+        if action in ('load', 'reload'):
+            self.add_extension(name)
+
+    def suggest(self, word, server_cogs=None, limit=3):
+        """Closest command names to `word`, restricted to bot-level, general and `server_cogs` commands."""
+        word = word.lower()
+        max_distance = 1 if len(word) <= 4 else 2
+        allowed = None if server_cogs is None else {None, 'general', *server_cogs}
+        seen, suggestions = set(), []
+        for distance, match in sorted(self.tree.search(word, max_distance)):
+            command_name, cog = self.owners[match]
+            if allowed is not None and cog not in allowed:
+                continue
+            if command_name not in seen:
+                seen.add(command_name)
+                suggestions.append(command_name)
+            if len(suggestions) >= limit:
+                break
+        return suggestions
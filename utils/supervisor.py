@@ -0,0 +1,164 @@
+import asyncio
+import logging
+import random
+import time
+
+import discord
+from discord.ext.commands.bot import BotBase
+
+logger = logging.getLogger(__name__)
+
+# Gateway close codes that will never succeed on retry (bad token, sharding or intents misconfiguration).
+FATAL_CLOSE_CODES = {4004, 4010, 4011, 4012, 4013, 4014}
+
+
+def is_fatal(error):
+    """Return True if retrying after this error is pointless."""
+    if isinstance(error, (discord.LoginFailure, discord.PrivilegedIntentsRequired)):
+        return True
+    if isinstance(error, discord.ConnectionClosed) and error.code in FATAL_CLOSE_CODES:
+        return True
+    return False
+
+
+async def close_connection(bot):
+    """Close the gateway and HTTP session, keeping loaded extensions for the next attempt.
+
+    commands.Bot.close would also unload every extension and remove every cog.
+    """
+    if isinstance(bot, BotBase):
+        await super(BotBase, bot).close()
+    else:
+        await bot.close()
+
+
+class Backoff:
+    """Exponential backoff with equal jitter, capped at `cap` seconds."""
+
+    def __init__(self, base=2.0, cap=300.0):
+        self.base = base
+        self.cap = cap
+        self.attempts = 0
+
+    def delay(self):
+        ceiling = min(self.cap, self.base * (2 ** self.attempts))
+        self.attempts += 1
+        return ceiling / 2 + random.uniform(0, ceiling / 2)
+
+    def reset(self):
+        self.attempts = 0
+
+
+class ConnectionStats:
+    """Counters for gateway connections, exposed through the `stats` command."""
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.starts = 0
+        self.identifies = 0
+        self.resumes = 0
+        self.disconnects = 0
+        self.transient_failures = 0
+        self.downtime = 0.0
+        self.last_error = None
+        self._down_since = None
+
+    def mark_down(self):
+        if self._down_since is None:
+            self._down_since = time.monotonic()
+
+    def mark_disconnected(self):
+        self.disconnects += 1
+        self.mark_down()
+
+    def mark_connected(self, resumed):
+        if resumed:
+            self.resumes += 1
+        else:
+            self.identifies += 1
+        if self._down_since is not None:
+            self.downtime += time.monotonic() - self._down_since
+            self._down_since = None
+
+    @property
+    def reconnects(self):
+        return self.resumes + max(self.identifies - 1, 0)
+
+    def total_downtime(self):
+        if self._down_since is None:
+            return self.downtime
+        return self.downtime + time.monotonic() - self._down_since
+
+    def as_dict(self):
+        return {
+            "uptime": round(time.time() - self.started_at, 1),
+            "starts": self.starts,
+            "identifies": self.identifies,
+            "resumes": self.resumes,
+            "reconnects": self.reconnects,
+            "disconnects": self.disconnects,
+            "transient_failures": self.transient_failures,
+            "downtime": round(self.total_downtime(), 1),
+            "last_error": self.last_error,
+        }
+
+
+def attach_stats(bot):
+    """Create `bot.connection_stats` and hook the gateway lifecycle events into it."""
+    stats = ConnectionStats()
+    bot.connection_stats = stats
+
+    async def on_disconnect():
+        stats.mark_disconnected()
+
+    async def on_ready():
+        stats.mark_connected(resumed=False)
+
+    async def on_resumed():
+        stats.mark_connected(resumed=True)
+        logger.info("Gateway session resumed.")
+
+    bot.add_listener(on_disconnect)
+    bot.add_listener(on_ready)
+    bot.add_listener(on_resumed)
+    return stats
+
+
+async def run_forever(bot, token, backoff=None):
+    """Keep the bot connected, restarting with jittered backoff on transient failures.
+
+    discord.py already resumes dropped sessions inside `bot.connect()`; we only get
+    here once it gives up, so every retry below starts a fresh IDENTIFY.
+    """
+    backoff = backoff or Backoff()
+    stats = getattr(bot, 'connection_stats', None) or attach_stats(bot)
+
+    while True:
+        stats.starts += 1
+        started = time.monotonic()
+        try:
+            await bot.start(token)
+        except Exception as e:
+            stats.last_error = f"{type(e).__name__}: {e}"
+            if is_fatal(e):
+                logger.critical(f"Fatal error, not retrying: {stats.last_error}")
+                if not bot.is_closed():
+                    await bot.close()
+                raise
+
+            stats.transient_failures += 1
+            stats.mark_down()
+            # A long healthy session earns a fresh backoff schedule.
+            if time.monotonic() - started > backoff.cap:
+                backoff.reset()
+            delay = backoff.delay()
+            logger.error(f"Connection failed ({stats.last_error}); retrying in {delay:.1f}s (attempt {backoff.attempts}).")
+            if not bot.is_closed():
+                await close_connection(bot)
+            await asyncio.sleep(delay)
+            bot.clear()
+            continue
+
+        if bot.is_closed():
+            logger.info("Bot closed, stopping supervisor.")
+            return
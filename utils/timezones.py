@@ -0,0 +1,128 @@
+import bisect
+import fcntl
+import json
+import logging
+import os
+import zoneinfo
+
+from utils.suggest import BKTree
+
+logger = logging.getLogger(__name__)
+
+USER_ZONES_PATH = 'user_time_zones.json'
+
+
+def _normalize(text):
+    return text.strip().lower().replace(' ', '_')
+
+
+def zone_label(name):
+    """Display label for an IANA name: 'America/New_York' -> 'New York'."""
+    return name.rsplit('/', 1)[-1].replace('_', ' ')
+
+
+class ZoneIndex:
+    """Prefix and fuzzy lookups over IANA zone names.
+
+    Every zone is indexed under its full name and under its city
+    ('america/new_york' and 'new_york'), so prefix completion works for both.
+    Queries with no prefix match fall back to a BK-tree over city names, built
+    on the first such query.
+    """
+
+    def __init__(self, names=None):
+        self.names = sorted(zoneinfo.available_timezones() if names is None else names)
+        # Full names win over cities, so 'utc' is 'UTC' rather than 'Etc/UTC'.
+        self.by_key = {name.lower(): name for name in self.names}
+        for name in self.names:
+            self.by_key.setdefault(name.lower().rsplit('/', 1)[-1], name)
+        self.keys = sorted(self.by_key)
+        self._tree = None
+
+    @property
+    def tree(self):
+        if self._tree is None:
+            self._tree = BKTree()
+            for key in self.keys:
+                if '/' not in key:
+                    self._tree.add(key)
+        return self._tree
+
+    def resolve(self, text):
+        """Exact zone name for a full name or city (any case, spaces or underscores), else None."""
+        return self.by_key.get(_normalize(text))
+
+    def complete(self, text, limit=25):
+        """Zone names for autocomplete: prefix matches, or close misspellings when nothing matches."""
+        query = _normalize(text)
+        if not query:
+            return self.names[:limit]
+        results = []
+        i = bisect.bisect_left(self.keys, query)
+        while i < len(self.keys) and self.keys[i].startswith(query) and len(results) < limit:
+            name = self.by_key[self.keys[i]]
+            if name not in results:
+                results.append(name)
+            i += 1
+        if not results:
+            max_distance = 1 if len(query) <= 4 else 2
+            for _, key in sorted(self.tree.search(query, max_distance)):
+                name = self.by_key[key]
+                if name not in results:
+                    results.append(name)
+                if len(results) >= limit:
+                    break
+        return results
+
+
+class UserZoneStore:
+    """Per-user zone lists, held in memory and stored as one comma-joined string per user.
+
+    Reads never touch the disk. Cluster workers share the file: writes re-read
+    and update it under a lock, and the writer tells the other workers about the
+    change (see `apply`) so their copies stay current.
+    """
+
+    def __init__(self, path=USER_ZONES_PATH):
+        self.path = path
+        self.zones = self._read()
+
+    def _read(self):
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return {}
+        except json.JSONDecodeError:
+            logger.error(f"Invalid JSON in {self.path}. Ignoring saved user zones.")
+            return {}
+        return {int(user_id): tuple(value.split(',')) for user_id, value in data.items() if value}
+
+    def get(self, user_id):
+        return self.zones.get(user_id)
+
+    def apply(self, user_id, names):
+        """Update the in-memory copy only, for a change another worker already saved."""
+        if names:
+            self.zones[user_id] = tuple(names)
+        else:
+            self.zones.pop(user_id, None)
+
+    def set(self, user_id, names):
+        self.apply(user_id, names)
+        tmp_path = f'{self.path}.tmp'
+        try:
+            with open(f'{self.path}.lock', 'w') as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                # Re-read under the lock so entries saved by other cluster workers aren't lost.
+                data = self._read()
+                if names:
+                    data[user_id] = tuple(names)
+                else:
+                    data.pop(user_id, None)
+                with open(tmp_path, 'w') as f:
+                    json.dump({str(k): ','.join(v) for k, v in data.items()}, f, separators=(',', ':'))
+                os.replace(tmp_path, self.path)
+                self.zones = data
+        except OSError as e:
+            logger.error(f"Failed to write {self.path}: {e}")
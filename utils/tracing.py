@@ -0,0 +1,188 @@
+import collections
+import contextlib
+import contextvars
+import functools
+import json
+import logging
+import logging.handlers
+import os
+import time
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+TRACES_PATH = 'traces.jsonl'
+MAX_SPANS = 200
+
+current_trace = contextvars.ContextVar('current_trace', default=None)
+
+
+class Trace:
+    __slots__ = ('id', 'command', 'guild_id', 'user_id', 'wall', 'started', 'duration', 'status', 'spans', 'dropped')
+
+    def __init__(self, command, guild_id, user_id):
+        self.id = os.urandom(6).hex()
+        self.command = command
+        self.guild_id = guild_id
+        self.user_id = user_id
+        self.wall = time.time()
+        self.started = time.perf_counter()
+        self.duration = None
+        self.status = None
+        self.spans = []
+        self.dropped = 0
+
+    def add(self, name, start, duration):
+        if len(self.spans) >= MAX_SPANS:
+            self.dropped += 1
+            return
+        self.spans.append((name, start - self.started, duration))
+
+    def as_dict(self):
+        # Compact on purpose: one short JSON line per trace, times in milliseconds.
+        data = {
+            "id": self.id,
+            "ts": round(self.wall, 3),
+            "cmd": self.command,
+            "guild": self.guild_id,
+            "user": self.user_id,
+            "ms": round(self.duration * 1000, 2),
+            "status": self.status,
+            "spans": [[name, round(start * 1000, 2), round(duration * 1000, 2)] for name, start, duration in self.spans],
+        }
+        if self.dropped:
+            data["dropped"] = self.dropped
+        return data
+
+
+@contextlib.contextmanager
+def span(name):
+    """Time the enclosed block as a span of the current command's trace, if there is one."""
+    trace = current_trace.get()
+    if trace is None or trace.duration is not None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add(name, start, time.perf_counter() - start)
+
+
+def traced(name):
+    """Decorator recording every call of a coroutine as a span named `name`."""
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with span(name):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def aiohttp_trace_config():
+    """TraceConfig for aiohttp sessions made by cogs; each request becomes an "http ..." span."""
+    async def on_request_start(session, context, params):
+        context.start = time.perf_counter()
+        context.trace = current_trace.get()
+
+    async def on_request_done(session, context, params):
+        trace = context.trace
+        if trace is not None and trace.duration is None:
+            trace.add(f"http {params.method} {params.url.host}{params.url.path}", context.start,
+                      time.perf_counter() - context.start)
+
+    config = aiohttp.TraceConfig()
+    config.on_request_start.append(on_request_start)
+    config.on_request_end.append(on_request_done)
+    config.on_request_exception.append(on_request_done)
+    return config
+
+
+class Tracer:
+    """Per-invocation traces: opened in before_invoke, closed in after_invoke or on_command_error.
+
+    The trace is carried in a contextvar, so anything awaited by the command
+    (config loads, extension loads, Discord REST calls, aiohttp requests made
+    with `aiohttp_trace_config`, sends) can add spans without being handed it.
+    Finished traces are kept in memory for the `traces` command and appended
+    to a size-rotated JSON-lines file.
+    """
+
+    def __init__(self, path=TRACES_PATH, max_bytes=5 * 1024 * 1024, backups=3, keep=500, min_ms=0):
+        self.recent = collections.deque(maxlen=keep)
+        self.min_ms = min_ms
+        # A private logger, so traces never reach the root handlers or the service log.
+        self.export = logging.Logger('odin.traces')
+        handler = logging.handlers.RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups, delay=True)
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        self.export.addHandler(handler)
+
+    def start(self, ctx):
+        # Before-invoke hooks run for a group and again for its subcommand; open one trace.
+        if getattr(ctx, '_trace', None) is not None:
+            return ctx._trace
+        trace = Trace(ctx.command.qualified_name if ctx.command else None,
+                      ctx.guild.id if ctx.guild else None, ctx.author.id)
+        current_trace.set(trace)
+        ctx._trace = trace
+        return trace
+
+    def finish(self, ctx, status='ok'):
+        """Close the invocation's trace and export it; safe to call more than once."""
+        trace = getattr(ctx, '_trace', None)
+        if trace is None:
+            return None
+        ctx._trace = None
+        trace.duration = time.perf_counter() - trace.started
+        trace.status = status
+        if current_trace.get() is trace:
+            current_trace.set(None)
+        self.recent.append(trace)
+        if trace.duration * 1000 >= self.min_ms:
+            try:
+                self.export.info(json.dumps(trace.as_dict(), separators=(',', ':')))
+            except Exception as e:
+                logger.error(f"Failed to export trace {trace.id}: {e}")
+        return trace
+
+    def slowest(self, count=5, guild_id=None):
+        """Slowest recent traces, optionally only those from one guild."""
+        traces = self.recent if guild_id is None else [t for t in self.recent if t.guild_id == guild_id]
+        return sorted(traces, key=lambda t: -t.duration)[:count]
+
+    def instrument(self, bot):
+        """Add spans for extension loads and every Discord REST call the bot makes."""
+        for method in ('load_extension', 'unload_extension', 'reload_extension'):
+            original = getattr(bot, method)
+
+            async def wrapper(name, *, package=None, _original=original, _method=method):
+                with span(f"{_method} {name}"):
+                    await _original(name, package=package)
+
+            setattr(bot, method, wrapper)
+
+        original_request = bot.http.request
+
+        async def request(route, **kwargs):
+            with span(f"discord {route.method} {route.path}"):
+                return await original_request(route, **kwargs)
+
+        bot.http.request = request
+
+    @staticmethod
+    def format(trace, limit=8):
+        where = f"guild {trace.guild_id}" if trace.guild_id else "DM"
+        lines = [f"{trace.id} {trace.command} {trace.duration * 1000:.1f}ms ({trace.status}, {where})"]
+        for name, start, duration in sorted(trace.spans, key=lambda s: -s[2])[:limit]:
+            lines.append(f"  {duration * 1000:8.1f}ms at +{start * 1000:.1f}ms  {name}")
+        if len(trace.spans) > limit:
+            lines.append(f"  ... {len(trace.spans) - limit} more spans")
+        # Spans nest and overlap, so count the time covered by any span once.
+        covered, end = 0.0, 0.0
+        for _, start, duration in sorted(trace.spans, key=lambda s: s[1]):
+            covered += max(0.0, start + duration - max(start, end))
+            end = max(end, start + duration)
+        lines.append(f"  {max(trace.duration - covered, 0) * 1000:8.1f}ms outside spans (command code)")
+        return "\n".join(lines)